@@ -1,51 +1,269 @@
 # This function finds query patterns that are worth worrying about:
 # '''
-# - slow on average
+# - slow on average, or in the tail (p50 / p95 / p99 / max)
 # - executed often enough
 # - ranked by how bad they are
 
+# Rankings read query_stats_rollups (minute / hour rows kept up to date by
+# rollup_services.run_rollups and the aggregator), so their cost grows with
+# the number of fingerprints × buckets, not with the number of executions.
+
+# In buffered capture mode rollups only exist once the maintenance job
+# (scripts/run_maintenance.py → run_rollups) has folded the executions in,
+# and it trails the newest ones by ROLLUP_SAFETY_LAG. Raw executions past
+# its high-water mark are added to the rankings as they are, so fresh
+# executions (and a store where maintenance never ran) still rank.
+
+# Executions may be sampled: counts and sums are weighted by sample_weight
+# (= 1 / rate) when rolled up, so they stay statistically correct.
+
+# executemany() batches are their own class: they are left out of the
+# rankings above and ranked by per-row latency in get_batch_query_candidates.
+
+# Percentiles never sort raw executions: they are read from the mergeable
+# latency histograms in the rollups, summed over the window.
+
 # In short:
 # “Show me the worst-performing queries that actually matter.”
 # '''
 
-from sqlalchemy import func
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func, select, union_all
 from app.db.session import get_session
-from app.models import Query, QueryExecution
-from app.analysis.slow_query import SLOW_QUERY_MS, MIN_EXECUTIONS
+from app.models import JobCheckpoint, Query, QueryExecution, QueryStatsRollup
+from app.analysis.histogram import LatencyHistogram
+from app.services.rollup_services import HOUR, MINUTE, ROLLUP_JOB
+from app.analysis.slow_query import (
+    SLOW_QUERY_MS,
+    SLOW_BATCH_ROW_MS,
+    MIN_EXECUTIONS,
+    PERCENTILES,
+    SLOW_QUERY_PERCENTILE_MS,
+)
 
 
-def get_slow_query_candidates(limit: int = 10):
+CANDIDATE_METRICS = ("avg", "p50", "p95", "p99", "max")
+MINUTE_ROLLUP_MAX_WINDOW = timedelta(hours=6)  # longer windows read hour rows
+
+
+def get_slow_query_candidates(
+    limit: int = 10,
+    metric: str = "avg",
+    window: Optional[timedelta] = None,
+) -> List[Tuple[Query, float, float]]:
     """
-    Returns queries that are slow *on average* and
+    Returns queries that are slow by `metric` and
     have executed often enough to matter.
+
+    Args:
+        limit (int): Maximum number of candidates.
+        metric (str): "avg", "p50", "p95", "p99" or "max".
+        window (Optional[timedelta]): Only consider executions this recent;
+            None means all history. Windows up to MINUTE_ROLLUP_MAX_WINDOW
+            read minute rollups, longer ones hour rollups (whole hours);
+            executions not rolled up yet are read raw.
+    Returns:
+        List[Tuple[Query, float, float]]: (Query, metric value in ms, exec_count),
+        worst first.
     """
+    if metric not in CANDIDATE_METRICS:
+        raise ValueError(f"Unknown candidate metric: {metric!r}")
+
+    # Short windows need minute precision; long ones only need hours
+    if window is not None and window <= MINUTE_ROLLUP_MAX_WINDOW:
+        bucket_seconds = MINUTE
+    else:
+        bucket_seconds = HOUR
+
+    in_window = [QueryStatsRollup.bucket_seconds == bucket_seconds]
+    # Single-statement executions the rollup job has not reached yet
+    not_rolled_up = [QueryExecution.batch_size == 1]
+    if window is not None:
+        since = datetime.now(timezone.utc) - window
+        in_window.append(QueryStatsRollup.bucket_start >= since)
+        not_rolled_up.append(QueryExecution.executed_at >= since)
 
     session = get_session()
     try:
-        results = (
-            session.query(  # sqlalchemy query object
+        rolled_up = (
+            session.query(JobCheckpoint.position)
+            .filter(JobCheckpoint.name == ROLLUP_JOB)
+            .scalar()
+        ) or 0
+        not_rolled_up.append(QueryExecution.id > rolled_up)
+
+        if metric == "avg":
+            return _average_candidates(session, limit, in_window, not_rolled_up)
+        return _percentile_candidates(
+            session, limit, metric, in_window, not_rolled_up
+        )
+
+    finally:
+        session.close()
+
+
+def _window_stats(in_window: list, not_rolled_up: list):
+    """Rollup rows and not-yet-rolled-up executions as one set of partial sums."""
+    return union_all(
+        select(
+            QueryStatsRollup.query_id,
+            QueryStatsRollup.exec_count.label("exec_count"),
+            QueryStatsRollup.sum_ms.label("sum_ms"),
+            QueryStatsRollup.max_ms.label("max_ms"),
+        ).where(*in_window),
+        select(
+            QueryExecution.query_id,
+            QueryExecution.sample_weight,
+            QueryExecution.duration_ms * QueryExecution.sample_weight,
+            QueryExecution.duration_ms,
+        ).where(*not_rolled_up),
+    ).subquery()
+
+
+def _average_candidates(session, limit: int, in_window: list, not_rolled_up: list):
+    stats = _window_stats(in_window, not_rolled_up)
+    exec_count = func.sum(stats.c.exec_count)
+    weighted_avg = func.sum(stats.c.sum_ms) / exec_count
+
+    results = (
+        session.query(  # sqlalchemy query object
+            Query,
+            weighted_avg.label("avg_duration"),
+            exec_count.label("exec_count"),
+        )
+        .join(stats, Query.id == stats.c.query_id)  # join rollups + fresh rows
+        .group_by(Query.id)  # group by Query id
+        .having(weighted_avg >= SLOW_QUERY_MS)  # avg duration above threshold
+        .having(exec_count >= MIN_EXECUTIONS)  # exec count above threshold
+        .order_by(weighted_avg.desc())  #    order by avg duration desc
+        .limit(limit)  # limit results
+        .all()  # execute query and list results
+    )
+
+    return results  # list of tuples (Query, avg_duration, exec_count)
+
+
+def _percentile_candidates(
+    session, limit: int, metric: str, in_window: list, not_rolled_up: list
+):
+    threshold = SLOW_QUERY_PERCENTILE_MS[metric]
+    stats = _window_stats(in_window, not_rolled_up)
+
+    # Pre-filter in SQL: any percentile is <= max, so queries whose max
+    # is under the threshold can never qualify
+    eligible = (
+        select(stats.c.query_id)
+        .group_by(stats.c.query_id)
+        .having(func.sum(stats.c.exec_count) >= MIN_EXECUTIONS)
+        .having(func.max(stats.c.max_ms) >= threshold)
+        .scalar_subquery()
+    )
+    rows = session.query(
+        QueryStatsRollup.query_id,
+        QueryStatsRollup.exec_count,
+        QueryStatsRollup.max_ms,
+        QueryStatsRollup.histogram,
+    ).filter(*in_window, QueryStatsRollup.query_id.in_(eligible))
+    fresh = session.query(
+        QueryExecution.query_id,
+        QueryExecution.sample_weight,
+        QueryExecution.duration_ms,
+    ).filter(*not_rolled_up, QueryExecution.query_id.in_(eligible))
+
+    # Merge per-bucket histograms (and fresh executions) into one per query
+    merged = {}
+    for query_id, bucket_count, bucket_max, histogram in rows:
+        histogram = LatencyHistogram.from_dict(histogram)
+        entry = merged.get(query_id)
+        if entry is None:
+            merged[query_id] = [histogram, bucket_count, bucket_max]
+        else:
+            entry[0].merge(histogram)
+            entry[1] += bucket_count
+            entry[2] = max(entry[2], bucket_max)
+
+    for query_id, weight, duration_ms in fresh:
+        entry = merged.get(query_id)
+        if entry is None:
+            entry = merged[query_id] = [LatencyHistogram(), 0.0, 0.0]
+        entry[0].add(duration_ms, weight)
+        entry[1] += weight
+        entry[2] = max(entry[2], duration_ms)
+
+    scored = []
+    for query_id, (histogram, total_count, total_max) in merged.items():
+        if metric == "max":
+            value = total_max
+        else:
+            value = histogram.quantile(PERCENTILES[metric])
+        if value is not None and value >= threshold:
+            scored.append((query_id, value, total_count))
+
+    scored.sort(key=lambda item: item[1], reverse=True)
+    scored = scored[:limit]
+
+    queries = {
+        query.id: query
+        for query in session.query(Query).filter(
+            Query.id.in_([query_id for query_id, _, _ in scored])
+        )
+    }
+
+    return [
+        (queries[query_id], value, total_count)
+        for query_id, value, total_count in scored
+        if query_id in queries
+    ]
+
+
+def get_batch_query_candidates(
+    limit: int = 10, window: Optional[timedelta] = None
+) -> List[Tuple[Query, float, float, float]]:
+    """
+    Returns executemany() batch statements ranked by per-row latency.
+
+    Args:
+        limit (int): Maximum number of candidates.
+        window (Optional[timedelta]): Only consider executions this recent;
+            None means all history.
+    Returns:
+        List[Tuple[Query, float, float, float]]:
+        (Query, per-row latency in ms, rows processed, exec_count), worst first.
+    """
+    weighted_count = func.sum(QueryExecution.sample_weight)
+    weighted_rows = func.sum(QueryExecution.batch_size * QueryExecution.sample_weight)
+    per_row_avg = (
+        func.sum(QueryExecution.duration_ms * QueryExecution.sample_weight)
+        / weighted_rows
+    )
+
+    session = get_session()
+    try:
+        query = (
+            session.query(
                 Query,
-                func.avg(QueryExecution.duration_ms).label("avg_duration"),
-                func.count(QueryExecution.id).label("exec_count"),
+                per_row_avg.label("per_row_ms"),
+                weighted_rows.label("rows_processed"),
+                weighted_count.label("exec_count"),
             )
-            .join(
-                QueryExecution, Query.id == QueryExecution.query_id
-            )  # join QueryExecution table
-            .group_by(Query.id)  # group by Query id
-            .having(
-                func.avg(QueryExecution.duration_ms) >= SLOW_QUERY_MS
-            )  # avg duration above threshold
-            .having(
-                func.count(QueryExecution.id) >= MIN_EXECUTIONS
-            )  # exec count above threshold
-            .order_by(
-                func.avg(QueryExecution.duration_ms).desc()
-            )  #    order by avg duration desc
-            .limit(limit)  # limit results
-            .all()  # execute query and list results
+            .join(QueryExecution, Query.id == QueryExecution.query_id)
+            .filter(QueryExecution.batch_size > 1)
         )
 
-        return results  # list of tuples (Query, avg_duration, exec_count)
+        if window is not None:
+            since = datetime.now(timezone.utc) - window
+            query = query.filter(QueryExecution.executed_at >= since)
+
+        return (
+            query.group_by(Query.id)
+            .having(per_row_avg >= SLOW_BATCH_ROW_MS)
+            .having(weighted_count >= MIN_EXECUTIONS)
+            .order_by(per_row_avg.desc())
+            .limit(limit)
+            .all()
+        )
 
     finally:
         session.close()
@@ -4,12 +4,32 @@ and stores Postgres's Execution plan + timings.
 So you can analyze why the query is slow.
 """
 
-from sqlalchemy import text
+import logging
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Optional
 
-from app.db.session import engine
+from sqlalchemy import select, text
+from sqlalchemy.dialects.postgresql import distinct_on
+
+from app.analysis.plan_diff import record_plan_diff
+from app.analysis.plan_features import extract_plan_features
+from app.analysis.plan_shape import plan_shape_hash
+from app.db.session import analysis_engine
 from app.db.session import get_session
-from app.models import QueryAnalysis
+from app.instrumentation.classifier import DML, SELECT, classify_statement
+from app.instrumentation.param_samples import PARAM_SAMPLE_MAX_AGE
+from app.models import QueryAnalysis, QueryParamSample
+
+logger = logging.getLogger(__name__)
+
 
+ANALYSIS_STATEMENT_TIMEOUT_MS = 30_000  # cap on any single EXPLAIN ANALYZE
+
+# A stored analysis stays current this long if the plan shape is unchanged:
+# within it, a plain EXPLAIN decides whether the ANALYZE is worth running.
+# Past it, the query is analyzed again anyway (data and timings drift).
+PLAN_SHAPE_TTL = timedelta(hours=24)
 
 EXPLAIN_TEMPLATE = """
 EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON)
@@ -19,90 +39,303 @@ EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON)
 # BUFFERS: include buffe/memory/disk usage statistics
 # FORMAT JSON: return the plan as JSON for easier parsing
 
+# Plan only — for statements that must not actually run (INSERT/UPDATE/DELETE)
+EXPLAIN_PLAN_ONLY_TEMPLATE = """
+EXPLAIN (FORMAT JSON)
+{sql}
+"""
+
+# Parameterized statement without captured values: plan it for any values
+# ($1, $2, ... placeholders). Postgres 16+; can't be combined with ANALYZE.
+EXPLAIN_GENERIC_PLAN_TEMPLATE = """
+EXPLAIN (GENERIC_PLAN, FORMAT JSON)
+{sql}
+"""
+GENERIC_PLAN_MIN_SERVER_VERSION = (16,)
+
+# psycopg2 placeholders, %(name)s and %s; %% is a literal percent sign
+_DRIVER_PLACEHOLDER = re.compile(r"%%|%\((\w+)\)s|%s")
+
 
-def run_explain_analyze(query_id: int, sql_stmt: str):
+def run_explain_analyze(
+    query_id: int,
+    sql_stmt: str,
+    statement_timeout_ms: int = ANALYSIS_STATEMENT_TIMEOUT_MS,
+    plan_shape_ttl: Optional[timedelta] = PLAN_SHAPE_TTL,
+):
     """
     Run EXPLAIN ANALYZE on a given SQL statement and persist the Plan.
 
+    Only read-only SELECTs are run with ANALYZE. DML gets a plan-only
+    EXPLAIN (ANALYZE would really modify data) and DDL / utility
+    statements are skipped.
+
+    When bind-parameter samples were captured for the query, its slowest
+    usable sample is explained instead of `sql_stmt`. A parameterized
+    statement without one gets a GENERIC_PLAN (Postgres 16+).
+
+    Nothing is run or stored when the query's latest analysis is younger
+    than `plan_shape_ttl` and its plan still has the same shape (None
+    always analyzes).
+
+    To analyze many statements at once, use explain_runner.run_explain_batch.
+
     Args:
         query_id (int): The ID of the query to analyze.
         sql_stmt (str): The SQL statement to analyze.
+        statement_timeout_ms (int): Give up on the EXPLAIN after this long.
+        plan_shape_ttl (Optional[timedelta]): How long an analysis stays current.
     """
+    recent_shape = None
+    if plan_shape_ttl:
+        recent_shape = recent_plan_shapes([query_id], plan_shape_ttl).get(query_id)
 
-    explain_sql_stmt = EXPLAIN_TEMPLATE.format(sql=sql_stmt)
-
-    with engine.connect() as conn:
-        result = conn.execute(text(explain_sql_stmt))
-        plan = (
-            result.scalar()
-        )  # Get the first column of the first row i.e` the JSON plan`
+    sample = worst_param_samples([query_id]).get(query_id)
+    parameters = None
+    if sample is not None:
+        sql_stmt, parameters = sample.statement, sample.parameters
 
-    session = get_session()
-    try:
-        analysis = QueryAnalysis(
-            query_id=query_id,
-            plan_json=plan,
-            planning_time_ms=plan[0].get("Planning Time"),
-            execution_time_ms=plan[0].get("Execution Time"),
-            seq_scan_detected=_detect_seq_scan(plan),
-            index_scan_detected=_detect_index_scan(plan),
-        )
-        session.add(analysis)
-        session.commit()
+    with analysis_engine.connect() as conn:
+        if recent_shape and plan_unchanged(
+            conn, sql_stmt, recent_shape, statement_timeout_ms, parameters
+        ):
+            logger.info(
+                "Skipping EXPLAIN ANALYZE for query_id=%s (plan unchanged)", query_id
+            )
+            return
 
-    finally:
-        session.close()
+        plan = explain_statement(conn, sql_stmt, statement_timeout_ms, parameters)
 
+    if plan is None:
+        logger.info("Skipping EXPLAIN for query_id=%s (not explainable)", query_id)
+        return
 
-# --------------------------------------------------------
-# Helper functions to analyze the plan JSON
-# --------------------------------------------------------
+    store_analysis(
+        query_id,
+        plan,
+        param_sample_id=sample.id if sample is not None else None,
+        generic_plan=parameters is None and has_bind_placeholders(sql_stmt),
+    )
 
 
-def _detect_seq_scan(plan_json) -> bool:
+def explain_statement(
+    conn,
+    sql_stmt: str,
+    statement_timeout_ms: Optional[int] = None,
+    parameters=None,
+) -> Optional[list]:
     """
-    Detect if a sequential scan is present in the execution plan.
+    EXPLAIN one statement on `conn` and return the JSON plan.
+
+    The statement_timeout is set for this transaction only (SET LOCAL).
 
     Args:
-        plan_json (list): The JSON execution plan.
+        parameters: Bind values for a statement with driver placeholders
+            (a captured sample). Without them, such a statement gets a
+            GENERIC_PLAN.
     Returns:
-        bool: True if a sequential scan is detected, False otherwise.
+        Optional[list]: The plan, or None for statements that are not
+        explained (DDL / utility, or parameterized before Postgres 16).
     """
-    plan = plan_json[0]["Plan"]
-    return _search_plan(plan, "Seq Scan")
+    kind = classify_statement(sql_stmt).kind
+    if kind == SELECT:
+        template = EXPLAIN_TEMPLATE
+    elif kind == DML:
+        template = EXPLAIN_PLAN_ONLY_TEMPLATE
+    else:
+        return None
 
+    _set_statement_timeout(conn, statement_timeout_ms)
+    return _run_explain(conn, template, sql_stmt, parameters)
 
-def _detect_index_scan(plan_json) -> bool:
+
+def plan_unchanged(
+    conn,
+    sql_stmt: str,
+    recent_shape: str,
+    statement_timeout_ms: Optional[int] = None,
+    parameters=None,
+) -> bool:
     """
-    Detect if an index scan is present in the execution plan.
+    Plan the statement (plain EXPLAIN, nothing is run) and compare its
+    shape with `recent_shape`.
 
-    Args:
-        plan_json (list): The JSON execution plan.
     Returns:
-        bool: True if an index scan is detected, False otherwise.
+        bool: True if the planner would still run the statement the way
+        the analysis with `recent_shape` saw it.
     """
-    plan = plan_json[0]["Plan"]
-    return _search_plan(plan, "Index Scan")
+    _set_statement_timeout(conn, statement_timeout_ms)
+    plan = _run_explain(conn, EXPLAIN_PLAN_ONLY_TEMPLATE, sql_stmt, parameters)
+    return plan is not None and plan_shape_hash(plan) == recent_shape
 
 
-def _search_plan(node: dict, keyword: str) -> bool:
+def worst_param_samples(
+    query_ids: Iterable[int], max_age: timedelta = PARAM_SAMPLE_MAX_AGE
+) -> Dict[int, object]:
     """
-    Recursively search the execution plan for a specific node type.
+    Each query's slowest captured bind-parameter sample younger than
+    `max_age`, leaving out samples with redacted values.
 
-    Args:
-        node (dict): The current node in the execution plan.
-        keyword (str): The node type to search for.
     Returns:
-        bool: True if the node type is found, False otherwise.
+        Dict[int, Row]: query_id → (id, statement, parameters); queries
+        without a usable sample are missing.
+    """
+    query_ids = list(query_ids)
+    if not query_ids:
+        return {}
+
+    session = get_session()
+    try:
+        worst = session.execute(
+            select(
+                QueryParamSample.query_id,
+                QueryParamSample.id,
+                QueryParamSample.statement,
+                QueryParamSample.parameters,
+            )
+            .where(
+                QueryParamSample.query_id.in_(query_ids),
+                QueryParamSample.redacted.is_(False),
+                QueryParamSample.captured_at >= datetime.now(timezone.utc) - max_age,
+            )
+            .order_by(QueryParamSample.query_id, QueryParamSample.duration_ms.desc())
+            .ext(distinct_on(QueryParamSample.query_id))
+        ).all()
+        return {row.query_id: row for row in worst}
+
+    finally:
+        session.close()
+
+
+def has_bind_placeholders(sql_stmt: str) -> bool:
+    """True if the statement has driver placeholders (%(name)s / %s)."""
+    matches = _DRIVER_PLACEHOLDER.finditer(sql_stmt)
+    return any(match.group() != "%%" for match in matches)
+
+
+def numbered_placeholders(sql_stmt: str) -> str:
+    """
+    Rewrite driver placeholders as Postgres $n parameters.
+
+    Each distinct %(name)s gets one number; each %s the next one.
+    """
+    numbers: Dict[str, int] = {}
+
+    def renumber(match) -> str:
+        if match.group() == "%%":
+            return "%"
+        key = match.group(1) or f"#{len(numbers)}"  # every %s is a new one
+        if key not in numbers:
+            numbers[key] = len(numbers) + 1
+        return f"${numbers[key]}"
+
+    return _DRIVER_PLACEHOLDER.sub(renumber, sql_stmt)
+
+
+def recent_plan_shapes(
+    query_ids: Iterable[int], ttl: timedelta = PLAN_SHAPE_TTL
+) -> Dict[int, str]:
+    """
+    Plan shape of each query's latest analysis, if younger than `ttl`.
+
+    Queries without one (never analyzed, analysis too old, or stored before
+    shapes were recorded) are missing from the result.
+    """
+    query_ids = list(query_ids)
+    if not query_ids:
+        return {}
+
+    session = get_session()
+    try:
+        latest = session.execute(
+            select(QueryAnalysis.query_id, QueryAnalysis.plan_shape_hash)
+            .where(
+                QueryAnalysis.query_id.in_(query_ids),
+                QueryAnalysis.executed_at >= datetime.now(timezone.utc) - ttl,
+            )
+            .order_by(QueryAnalysis.query_id, QueryAnalysis.executed_at.desc())
+            .ext(distinct_on(QueryAnalysis.query_id))
+        ).all()
+        return {
+            row.query_id: row.plan_shape_hash for row in latest if row.plan_shape_hash
+        }
+
+    finally:
+        session.close()
+
+
+def store_analysis(
+    query_id: int,
+    plan: list,
+    param_sample_id: Optional[int] = None,
+    generic_plan: bool = False,
+) -> None:
     """
-    if keyword in node.get("Node Type", ""):
-        return True
+    Persist one EXPLAIN result as a QueryAnalysis row, together with its
+    diff against the query's previous analysis (app/analysis/plan_diff.py).
+    """
+    session = get_session()
+    try:
+        analysis = QueryAnalysis(
+            query_id=query_id,
+            plan_json=plan,
+            planning_time_ms=plan[0].get("Planning Time"),
+            execution_time_ms=plan[0].get("Execution Time"),
+            plan_shape_hash=plan_shape_hash(plan),
+            param_sample_id=param_sample_id,
+            generic_plan=generic_plan,
+            **extract_plan_features(plan)._asdict(),
+        )
+        session.add(analysis)
+        session.flush()
+
+        # A diff that fails must not cost the analysis itself
+        try:
+            with session.begin_nested():
+                record_plan_diff(session, analysis)
+        except Exception:
+            logger.exception("Plan diff failed for query_id=%s", query_id)
+
+        session.commit()
 
-    for subplan in node.get("Plans", []):
-        if _search_plan(subplan, keyword):
-            return True
+    except Exception:
+        session.rollback()
+        raise
 
-    return False
+    finally:
+        session.close()
+
+
+def _run_explain(conn, template: str, sql_stmt: str, parameters=None) -> Optional[list]:
+    if parameters is not None:
+        # A captured sample: the driver binds the values to its placeholders.
+        # Positional values are stored as a JSON list; the driver wants a tuple.
+        if isinstance(parameters, list):
+            parameters = tuple(parameters)
+        result = conn.exec_driver_sql(template.format(sql=sql_stmt), parameters)
+    elif has_bind_placeholders(sql_stmt):
+        if conn.dialect.server_version_info < GENERIC_PLAN_MIN_SERVER_VERSION:
+            return None  # no values to run it with, and no generic plans
+        # Sent without parameters, so the driver leaves the $n alone
+        result = conn.exec_driver_sql(
+            EXPLAIN_GENERIC_PLAN_TEMPLATE.format(sql=numbered_placeholders(sql_stmt))
+        )
+    else:
+        result = conn.execute(text(template.format(sql=sql_stmt)))
+    return result.scalar()  # first column of the first row i.e` the JSON plan`
+
+
+def _set_statement_timeout(conn, statement_timeout_ms: Optional[int]) -> None:
+    # For the current transaction only
+    if statement_timeout_ms:
+        timeout_ms = int(statement_timeout_ms)
+        conn.exec_driver_sql(f"SET LOCAL statement_timeout = {timeout_ms}")
+
+
+# --------------------------------------------------------
+# Plan features (seq / index scans, spills, estimate errors, ...) are
+# extracted in app/analysis/plan_features.py
+# --------------------------------------------------------
 
 
 # Example plan_json structure: nested plan with both scans
@@ -0,0 +1,253 @@
+"""
+Parallel EXPLAIN runner with bounded concurrency and time limits.
+
+EXPLAIN ANALYZE really runs the statement, and the statements worth
+analyzing are slow by definition — one after another, 50 of them can
+outlast a maintenance window. run_explain_batch() analyzes them on a
+thread pool over the dedicated analysis pool (app/db/session.py):
+
+- at most `workers` EXPLAINs run at once, never more than the pool's
+  ANALYSIS_WORKERS connections
+- each runs under a statement_timeout (SET LOCAL), never longer than
+  what is left of the batch's wall-clock budget
+- when the budget is spent, statements not yet started are dropped and
+  the ones still running are cancelled server-side (pg_cancel_backend,
+  over an unpooled connection: a busy pool can't delay it)
+
+Queries with captured bind-parameter samples are analyzed with their
+slowest usable sample; parameterized statements without one get a
+GENERIC_PLAN (see explain.explain_statement).
+
+Statements analyzed within the last plan_shape_ttl are first planned
+with a plain EXPLAIN; if the plan's shape is the one already stored, the
+ANALYZE is not run (status "unchanged").
+
+Every statement ends up in the returned summary as finished, unchanged,
+skipped (not explainable), timed_out, cancelled, failed or not_started.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import timedelta
+from typing import Dict, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import text
+
+from app.analysis.explain import (
+    ANALYSIS_STATEMENT_TIMEOUT_MS,
+    PLAN_SHAPE_TTL,
+    explain_statement,
+    has_bind_placeholders,
+    plan_unchanged,
+    recent_plan_shapes,
+    store_analysis,
+    worst_param_samples,
+)
+from app.db.session import ANALYSIS_WORKERS, analysis_cancel_engine, analysis_engine
+from app.instrumentation.classifier import DML, SELECT, classify_statement
+
+logger = logging.getLogger(__name__)
+
+
+ANALYSIS_BUDGET_S = 600.0  # wall clock for a whole batch
+CANCEL_GRACE_S = 10.0  # wait this long for cancelled statements to return
+
+FINISHED = "finished"
+UNCHANGED = "unchanged"  # same plan shape as the latest analysis: not re-run
+SKIPPED = "skipped"  # DDL / utility, or no values for it (pre-PG 16)
+TIMED_OUT = "timed_out"  # hit its statement_timeout
+CANCELLED = "cancelled"  # still running when the budget ran out
+FAILED = "failed"
+NOT_STARTED = "not_started"  # budget ran out before a worker was free
+
+_QUERY_CANCELED = "57014"  # SQLSTATE for statement_timeout and pg_cancel_backend
+
+
+class AnalysisOutcome(NamedTuple):
+    query_id: int
+    status: str
+    elapsed_ms: float = 0.0
+    error: Optional[str] = None
+
+
+class AnalysisSummary(NamedTuple):
+    outcomes: List[AnalysisOutcome]
+    elapsed_s: float
+
+    def with_status(self, status: str) -> List[AnalysisOutcome]:
+        return [outcome for outcome in self.outcomes if outcome.status == status]
+
+    def counts(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for outcome in self.outcomes:
+            counts[outcome.status] = counts.get(outcome.status, 0) + 1
+        return counts
+
+
+class _Batch:
+    """Shared state between the workers and the coordinating thread."""
+
+    def __init__(
+        self, deadline: float, recent_shapes: Dict[int, str], samples: Dict[int, object]
+    ):
+        self.deadline = deadline
+        self.recent_shapes = recent_shapes
+        self.samples = samples  # query_id → worst usable param sample
+        self.expired = False
+        self.running: Dict[int, int] = {}  # query_id → backend pid
+        self.cancelled: Set[int] = set()
+        self.lock = threading.Lock()
+
+    def cancel_running(self) -> None:
+        with self.lock:
+            self.expired = True
+            running = dict(self.running)
+            self.cancelled.update(running)
+
+        if not running:
+            return
+
+        with analysis_cancel_engine.connect() as conn:
+            for query_id, pid in running.items():
+                conn.execute(text("SELECT pg_cancel_backend(:pid)"), {"pid": pid})
+                logger.warning(
+                    "Cancelled EXPLAIN of query_id=%s (backend %s): budget spent",
+                    query_id,
+                    pid,
+                )
+
+
+def run_explain_batch(
+    statements: Sequence[Tuple[int, str]],
+    workers: int = ANALYSIS_WORKERS,
+    statement_timeout_ms: int = ANALYSIS_STATEMENT_TIMEOUT_MS,
+    budget_s: float = ANALYSIS_BUDGET_S,
+    plan_shape_ttl: Optional[timedelta] = PLAN_SHAPE_TTL,
+) -> AnalysisSummary:
+    """
+    EXPLAIN (ANALYZE) many statements concurrently and store the plans.
+
+    Args:
+        statements: (query_id, sql) pairs, most important first — they
+            start in this order.
+        workers (int): Concurrent EXPLAINs (connections of the analysis
+            pool), at most ANALYSIS_WORKERS.
+        statement_timeout_ms (int): Limit for each EXPLAIN.
+        budget_s (float): Wall-clock limit for the whole batch.
+        plan_shape_ttl (Optional[timedelta]): Skip the ANALYZE of statements
+            analyzed this recently whose plan shape is unchanged; None
+            analyzes everything.
+    Returns:
+        AnalysisSummary: One outcome per statement, in input order.
+    """
+    started = time.monotonic()
+    recent_shapes = {}
+    if plan_shape_ttl:
+        recent_shapes = recent_plan_shapes(
+            [query_id for query_id, _ in statements], plan_shape_ttl
+        )
+    samples = worst_param_samples(query_id for query_id, _ in statements)
+    batch = _Batch(
+        deadline=started + budget_s, recent_shapes=recent_shapes, samples=samples
+    )
+
+    # More threads than pooled connections would only queue on the pool
+    workers = max(1, min(workers, ANALYSIS_WORKERS))
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="explain")
+    futures = [
+        pool.submit(_analyze, batch, query_id, sql, statement_timeout_ms)
+        for query_id, sql in statements
+    ]
+
+    _, not_done = wait(futures, timeout=budget_s)
+    if not_done:
+        for future in not_done:
+            future.cancel()  # only succeeds for those not started yet
+        batch.cancel_running()
+        wait(not_done, timeout=CANCEL_GRACE_S)
+
+    pool.shutdown(wait=False, cancel_futures=True)
+
+    outcomes = []
+    for future, (query_id, _) in zip(futures, statements):
+        if future.cancelled():
+            outcomes.append(AnalysisOutcome(query_id, NOT_STARTED))
+        elif future.done():
+            outcomes.append(future.result())
+        else:
+            outcomes.append(
+                AnalysisOutcome(query_id, CANCELLED, error="did not stop after cancel")
+            )
+
+    summary = AnalysisSummary(outcomes, time.monotonic() - started)
+    logger.info(
+        "EXPLAIN batch of %d in %.1f s: %s",
+        len(outcomes),
+        summary.elapsed_s,
+        summary.counts(),
+    )
+    return summary
+
+
+def _analyze(
+    batch: _Batch, query_id: int, sql: str, statement_timeout_ms: int
+) -> AnalysisOutcome:
+    if classify_statement(sql).kind not in (SELECT, DML):
+        return AnalysisOutcome(query_id, SKIPPED)  # don't hold a connection for it
+
+    remaining_ms = (batch.deadline - time.monotonic()) * 1000
+    if batch.expired or remaining_ms <= 0:
+        return AnalysisOutcome(query_id, NOT_STARTED)
+
+    sample = batch.samples.get(query_id)
+    parameters = None
+    if sample is not None:
+        sql, parameters = sample.statement, sample.parameters
+
+    started = time.perf_counter()
+    try:
+        with analysis_engine.connect() as conn:
+            pid = conn.exec_driver_sql("SELECT pg_backend_pid()").scalar()
+            with batch.lock:
+                if batch.expired:
+                    return AnalysisOutcome(query_id, NOT_STARTED)
+                batch.running[query_id] = pid
+            timeout_ms = max(1, int(min(statement_timeout_ms, remaining_ms)))
+            recent_shape = batch.recent_shapes.get(query_id)
+            try:
+                if recent_shape and plan_unchanged(
+                    conn, sql, recent_shape, timeout_ms, parameters
+                ):
+                    plan = None
+                    status = UNCHANGED
+                else:
+                    plan = explain_statement(conn, sql, timeout_ms, parameters)
+                    status = FINISHED if plan is not None else SKIPPED
+            finally:
+                with batch.lock:
+                    batch.running.pop(query_id, None)
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if plan is not None:
+            store_analysis(
+                query_id,
+                plan,
+                param_sample_id=sample.id if sample is not None else None,
+                generic_plan=parameters is None and has_bind_placeholders(sql),
+            )
+        return AnalysisOutcome(query_id, status, elapsed_ms)
+
+    except Exception as exc:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if query_id in batch.cancelled:
+            status = CANCELLED
+        elif getattr(getattr(exc, "orig", None), "pgcode", None) == _QUERY_CANCELED:
+            status = TIMED_OUT
+        else:
+            status = FAILED
+            logger.exception("EXPLAIN failed for query_id=%s", query_id)
+
+        lines = str(getattr(exc, "orig", exc)).strip().splitlines()
+        return AnalysisOutcome(query_id, status, elapsed_ms, lines[0] if lines else "")
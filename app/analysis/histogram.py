@@ -0,0 +1,104 @@
+"""
+Mergeable, log-bucketed latency histogram.
+
+Bucket i covers (gamma^(i-1), gamma^i] milliseconds, with
+gamma = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY).
+Any quantile read back is within RELATIVE_ACCURACY of the true value
+(the DDSketch construction), and two histograms merge by adding counts
+bucket by bucket — so per-process, per-minute histograms can be summed
+into hourly or all-time ones without touching raw executions.
+
+Serialized form is a flat JSON object {"<bucket index>": count}, plus
+"z" for values at or below MIN_TRACKED_MS. Flat maps can be merged
+directly in SQL (see rollup_services).
+"""
+
+import math
+from typing import Dict, Optional
+
+
+RELATIVE_ACCURACY = 0.02  # 2% relative error on any quantile
+MIN_TRACKED_MS = 0.001  # values at or below this land in the zero bucket
+
+ZERO_BUCKET = "z"
+
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+LOG_GAMMA = math.log(GAMMA)
+
+
+class LatencyHistogram:
+    """Log-bucketed histogram of latencies in milliseconds."""
+
+    __slots__ = ("buckets", "zero_count", "count")
+
+    def __init__(self):
+        self.buckets: Dict[int, float] = {}
+        self.zero_count = 0.0
+        self.count = 0.0
+
+    def add(self, value_ms: float, weight: float = 1.0) -> None:
+        """Record one value (weight > 1 for sampled executions)."""
+        self.count += weight
+
+        if value_ms <= MIN_TRACKED_MS:
+            self.zero_count += weight
+            return
+
+        index = math.ceil(math.log(value_ms) / LOG_GAMMA)
+        self.buckets[index] = self.buckets.get(index, 0.0) + weight
+
+    def add_bucket(self, key: str, weight: float) -> None:
+        """Add pre-bucketed counts (a serialized key, e.g. computed in SQL)."""
+        self.count += weight
+        if key == ZERO_BUCKET:
+            self.zero_count += weight
+        else:
+            index = int(key)
+            self.buckets[index] = self.buckets.get(index, 0.0) + weight
+
+    def merge(self, other: "LatencyHistogram") -> "LatencyHistogram":
+        """Add another histogram's counts into this one (in place)."""
+        for index, bucket_count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0.0) + bucket_count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        return self
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Approximate q-quantile (0 <= q <= 1) in milliseconds.
+
+        Returns:
+            Optional[float]: None if the histogram is empty.
+        """
+        if self.count <= 0:
+            return None
+
+        rank = q * self.count
+        seen = self.zero_count
+        if seen >= rank and self.zero_count > 0:
+            return 0.0
+
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                # Midpoint (in relative terms) of bucket index
+                return 2 * GAMMA**index / (GAMMA + 1)
+
+        return 2 * GAMMA ** max(self.buckets) / (GAMMA + 1)
+
+    # -----------------------------------------------------------------
+    # Serialization
+    # -----------------------------------------------------------------
+    def to_dict(self) -> Dict[str, float]:
+        data = {str(index): count for index, count in self.buckets.items()}
+        if self.zero_count:
+            data[ZERO_BUCKET] = self.zero_count
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, float]]) -> "LatencyHistogram":
+        histogram = cls()
+        for key, bucket_count in (data or {}).items():
+            histogram.add_bucket(key, float(bucket_count))
+        return histogram
@@ -0,0 +1,119 @@
+"""
+Offline analytics over exported executions (see export_services).
+
+The Parquet files are memory-mapped rather than read into Python objects:
+columns come back as NumPy arrays, so tens of millions of executions can
+be analyzed on a laptop without touching Postgres.
+
+    columns = load_executions("/data/executions", since=date(2026, 1, 1))
+    slow = columns["duration_ms"] > 500
+    np.bincount(columns["query_id"][slow])
+
+Requires the optional `pyarrow` and `numpy` packages.
+"""
+
+import os
+from datetime import date
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependencies: pip install numpy pyarrow
+    np = pa = pq = None
+
+from app.services.export_services import day_path
+
+
+EXECUTION_COLUMNS = (
+    "query_id",
+    "executed_at",  # datetime64[us], UTC
+    "duration_ms",
+    "rows_returned",  # -1 = unknown
+    "rows_affected",  # -1 = unknown
+    "sample_weight",
+    "batch_size",
+)
+
+
+def _require_dependencies() -> None:
+    if pq is None:
+        raise ImportError("Offline analytics require numpy and pyarrow")
+
+
+def exported_days(root: str) -> List[date]:
+    """Days that have an export under `root`, oldest first."""
+    days = []
+    for name in os.listdir(root) if os.path.isdir(root) else []:
+        if name.startswith("date="):
+            day = date.fromisoformat(name[len("date=") :])
+            if os.path.exists(day_path(root, day)):
+                days.append(day)
+    return sorted(days)
+
+
+def iter_execution_days(
+    root: str,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    columns: Sequence[str] = EXECUTION_COLUMNS,
+) -> Iterator[Tuple[date, Dict[str, "np.ndarray"]]]:
+    """
+    Yield (day, {column: array}) for each exported day in [since, until).
+
+    One day at a time keeps memory bounded by the largest day. Arrays are
+    views over the memory-mapped file wherever Arrow allows it.
+    """
+    _require_dependencies()
+
+    for day in exported_days(root):
+        if since is not None and day < since:
+            continue
+        if until is not None and day >= until:
+            break
+
+        table = pq.read_table(
+            day_path(root, day), columns=list(columns), memory_map=True
+        )
+        yield day, {name: _to_numpy(table.column(name)) for name in columns}
+
+
+def load_executions(
+    root: str,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    columns: Sequence[str] = EXECUTION_COLUMNS,
+) -> Dict[str, "np.ndarray"]:
+    """
+    Load exported executions for [since, until) as one array per column.
+
+    Returns:
+        Dict[str, np.ndarray]: Column name → values, in executed_at order
+        within each day and days in order. Empty arrays if nothing matched.
+    """
+    _require_dependencies()
+
+    parts: Dict[str, list] = {name: [] for name in columns}
+    for _, day_columns in iter_execution_days(root, since, until, columns):
+        for name in columns:
+            parts[name].append(day_columns[name])
+
+    return {
+        name: np.concatenate(arrays) if arrays else np.array([])
+        for name, arrays in parts.items()
+    }
+
+
+def _to_numpy(column: "pa.ChunkedArray") -> "np.ndarray":
+    if pa.types.is_timestamp(column.type):
+        column = column.cast(pa.timestamp("us"))  # drop tz; values are UTC
+    if column.num_chunks == 1:
+        return column.chunk(0).to_numpy(zero_copy_only=False)
+    return column.to_numpy()
+
+
+def epoch_seconds(executed_at: "np.ndarray") -> "np.ndarray":
+    """datetime64[us] → float seconds since the epoch (for fits / binning)."""
+    return executed_at.astype("int64") / 1e6
+
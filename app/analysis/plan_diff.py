@@ -0,0 +1,302 @@
+"""
+Plan diff: what changed between two analyses of the same query.
+
+diff_plans() aligns the nodes of two plans and reports what moved:
+
+1. scans are matched by relation (alias): a different node type is a
+   scan method change, flagged when an index scan became a Seq Scan
+2. joins are matched by the set of relations they join: a different node
+   type is a join strategy change (Nested Loop → Hash Join ...), swapped
+   inputs a join order change
+3. other nodes are matched by node type and the relations below them,
+   then by position in the tree; a different node type at the same
+   position is a node change (HashAggregate → GroupAggregate ...)
+4. nodes left over were added or removed
+
+Matched nodes whose exclusive time moved by PLAN_DIFF_MIN_DELTA_MS or
+more are reported too, with their actual rows. Structural changes come
+first, then the largest time deltas, PLAN_DIFF_MAX_CHANGES in total.
+
+record_plan_diff() stores the diff of a new analysis against the
+previous one as a QueryPlanDiff row; store_analysis() calls it for every
+analysis it stores.
+"""
+
+import logging
+from collections import defaultdict
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import select
+
+from app.analysis.plan_features import exclusive_time_ms
+from app.analysis.plan_shape import plan_shape_hash
+from app.models import QueryAnalysis, QueryPlanDiff
+
+logger = logging.getLogger(__name__)
+
+
+PLAN_DIFF_MAX_CHANGES = 20  # changes kept per diff
+PLAN_DIFF_MIN_DELTA_MS = 1.0  # smaller per-node time changes are noise
+
+JOIN_NODE_TYPES = frozenset({"Nested Loop", "Hash Join", "Merge Join"})
+INDEX_SCAN_NODE_TYPES = frozenset({"Index Scan", "Index Only Scan", "Bitmap Heap Scan"})
+
+# Change kinds, structural ones first
+SCAN_METHOD = "scan_method"
+JOIN_STRATEGY = "join_strategy"
+JOIN_ORDER = "join_order"
+NODE_TYPE = "node_type"
+ADDED = "added"
+REMOVED = "removed"
+TIMING = "timing"
+
+_STRUCTURAL = (SCAN_METHOD, JOIN_STRATEGY, JOIN_ORDER, NODE_TYPE, ADDED, REMOVED)
+
+
+class PlanChange(NamedTuple):
+    kind: str
+    relations: List[str]  # the node's relation, or all relations below it
+    before: Optional[str]  # node type; None for added nodes
+    after: Optional[str]  # node type; None for removed nodes
+    time_before_ms: Optional[float]  # exclusive time (ANALYZE only)
+    time_after_ms: Optional[float]
+    rows_before: Optional[float]  # actual rows over all loops (ANALYZE only)
+    rows_after: Optional[float]
+
+
+class PlanDiff(NamedTuple):
+    shape_changed: bool
+    join_strategy_changed: bool
+    index_to_seq_scan: bool
+    execution_time_delta_ms: Optional[float]
+    changes: List[PlanChange]
+
+    def summary(self, limit: int = 3) -> str:
+        """One line naming the first `limit` changes."""
+        parts = []
+        for change in self.changes[:limit]:
+            where = ", ".join(change.relations) or "plan"
+            if change.kind == TIMING:
+                delta = (change.time_after_ms or 0) - (change.time_before_ms or 0)
+                parts.append(f"{where}: {change.after} {delta:+.1f} ms")
+            elif change.kind == JOIN_ORDER:
+                parts.append(f"{where}: {change.after} inputs swapped")
+            else:
+                before, after = change.before or "∅", change.after or "∅"
+                parts.append(f"{where}: {before} → {after}")
+        if len(self.changes) > limit:
+            parts.append(f"+{len(self.changes) - limit} more")
+        return "; ".join(parts) or "no changes"
+
+
+class _Node(NamedTuple):
+    position: Tuple[int, ...]  # child indexes from the root
+    node_type: str
+    relation: Optional[str]  # for scans: alias, else relation name
+    relations: FrozenSet[str]  # every scanned relation at or below the node
+    inputs: Tuple[FrozenSet[str], ...]  # relations below each child, in order
+    time_ms: Optional[float]
+    rows: Optional[float]
+
+
+def diff_plans(before_json, after_json) -> PlanDiff:
+    """
+    Align two EXPLAIN (FORMAT JSON) plans and list what changed.
+
+    Args:
+        before_json (list): The earlier plan.
+        after_json (list): The later plan.
+    Returns:
+        PlanDiff: Flags and the changes, most significant first.
+    """
+    before, after = _flatten(before_json), _flatten(after_json)
+    unmatched_before, unmatched_after = set(range(len(before))), set(range(len(after)))
+    pairs: List[Tuple[int, int]] = []
+
+    def match(key) -> None:
+        # Pair unmatched nodes with equal keys, in tree order
+        waiting: Dict[object, List[int]] = defaultdict(list)
+        for i in sorted(unmatched_before):
+            k = key(before[i])
+            if k is not None:
+                waiting[k].append(i)
+        for j in sorted(unmatched_after):
+            k = key(after[j])
+            if k is not None and waiting.get(k):
+                i = waiting[k].pop(0)
+                unmatched_before.discard(i)
+                unmatched_after.discard(j)
+                pairs.append((i, j))
+
+    match(lambda node: node.relation)
+    match(lambda node: node.relations if node.node_type in JOIN_NODE_TYPES else None)
+    match(lambda node: (node.node_type, node.relations))
+    match(lambda node: node.position)
+
+    changes = []
+    for i, j in pairs:
+        changes.extend(_compare(before[i], after[j]))
+    changes.extend(_change(REMOVED, before[i], None) for i in sorted(unmatched_before))
+    changes.extend(_change(ADDED, None, after[j]) for j in sorted(unmatched_after))
+
+    changes.sort(key=_significance)
+
+    time_delta_ms = None
+    before_ms = before_json[0].get("Execution Time")
+    after_ms = after_json[0].get("Execution Time")
+    if before_ms is not None and after_ms is not None:
+        time_delta_ms = after_ms - before_ms
+
+    return PlanDiff(
+        shape_changed=plan_shape_hash(before_json) != plan_shape_hash(after_json),
+        join_strategy_changed=any(c.kind == JOIN_STRATEGY for c in changes),
+        index_to_seq_scan=any(
+            c.kind == SCAN_METHOD
+            and c.before in INDEX_SCAN_NODE_TYPES
+            and c.after == "Seq Scan"
+            for c in changes
+        ),
+        execution_time_delta_ms=time_delta_ms,
+        changes=changes[:PLAN_DIFF_MAX_CHANGES],
+    )
+
+
+def record_plan_diff(session, analysis: QueryAnalysis) -> Optional[QueryPlanDiff]:
+    """
+    Diff a just-stored analysis against the query's previous one.
+
+    `analysis` must be flushed (it needs its id). The caller commits.
+
+    Returns:
+        Optional[QueryPlanDiff]: The added row, or None for a query's
+        first analysis.
+    """
+    previous = session.execute(
+        select(QueryAnalysis)
+        .where(
+            QueryAnalysis.query_id == analysis.query_id,
+            QueryAnalysis.id != analysis.id,
+        )
+        .order_by(QueryAnalysis.executed_at.desc(), QueryAnalysis.id.desc())
+        .limit(1)
+    ).scalar()
+    if previous is None:
+        return None
+
+    diff = diff_plans(previous.plan_json, analysis.plan_json)
+    plan_diff = QueryPlanDiff(
+        query_id=analysis.query_id,
+        before_analysis_id=previous.id,
+        after_analysis_id=analysis.id,
+        shape_changed=diff.shape_changed,
+        join_strategy_changed=diff.join_strategy_changed,
+        index_to_seq_scan=diff.index_to_seq_scan,
+        execution_time_delta_ms=diff.execution_time_delta_ms,
+        summary=diff.summary(),
+        changes=[change._asdict() for change in diff.changes],
+    )
+    session.add(plan_diff)
+
+    if diff.shape_changed:
+        logger.info(
+            "Plan of query_id=%s changed (%s ms): %s",
+            analysis.query_id,
+            "?" if diff.execution_time_delta_ms is None
+            else f"{diff.execution_time_delta_ms:+.1f}",
+            plan_diff.summary,
+        )
+    return plan_diff
+
+
+# --------------------------------------------------------
+# Helpers
+# --------------------------------------------------------
+
+
+def _flatten(plan_json) -> List[_Node]:
+    """The plan's nodes in pre-order, with the relations below each."""
+    raw: List[Tuple[dict, Tuple[int, ...], Optional[int]]] = []
+    stack = [(plan_json[0]["Plan"], (), None)]
+    while stack:
+        node, position, parent = stack.pop()
+        index = len(raw)
+        raw.append((node, position, parent))
+        children = node.get("Plans", [])
+        for k in range(len(children) - 1, -1, -1):
+            stack.append((children[k], position + (k,), index))
+
+    # Relations below each node: children come after their parent in
+    # pre-order, so one backwards pass folds them upwards
+    relations: List[set] = [set() for _ in raw]
+    child_indexes: List[List[int]] = [[] for _ in raw]
+    for index in range(len(raw) - 1, -1, -1):
+        node, _, parent = raw[index]
+        relation = _scan_relation(node)
+        if relation:
+            relations[index].add(relation)
+        if parent is not None:
+            relations[parent] |= relations[index]
+            child_indexes[parent].insert(0, index)
+
+    flat = []
+    for index, (node, position, _) in enumerate(raw):
+        rows = None
+        if "Actual Rows" in node:
+            rows = node["Actual Rows"] * node.get("Actual Loops", 1)
+        flat.append(
+            _Node(
+                position=position,
+                node_type=node.get("Node Type", ""),
+                relation=_scan_relation(node),
+                relations=frozenset(relations[index]),
+                inputs=tuple(frozenset(relations[c]) for c in child_indexes[index]),
+                time_ms=exclusive_time_ms(node),
+                rows=rows,
+            )
+        )
+    return flat
+
+
+def _scan_relation(node: dict) -> Optional[str]:
+    # Nodes that read a relation name it; Bitmap Index Scans only name the
+    # index and belong to their Bitmap Heap Scan
+    return node.get("Alias") or node.get("Relation Name")
+
+
+def _compare(old: _Node, new: _Node) -> List[PlanChange]:
+    if old.node_type != new.node_type:
+        if old.relation and old.relation == new.relation:
+            kind = SCAN_METHOD
+        elif old.node_type in JOIN_NODE_TYPES and new.node_type in JOIN_NODE_TYPES:
+            kind = JOIN_STRATEGY
+        else:
+            kind = NODE_TYPE
+        return [_change(kind, old, new)]
+
+    if old.node_type in JOIN_NODE_TYPES and old.inputs != new.inputs:
+        return [_change(JOIN_ORDER, old, new)]
+
+    if old.time_ms is not None and new.time_ms is not None:
+        if abs(new.time_ms - old.time_ms) >= PLAN_DIFF_MIN_DELTA_MS:
+            return [_change(TIMING, old, new)]
+    return []
+
+
+def _change(kind: str, old: Optional[_Node], new: Optional[_Node]) -> PlanChange:
+    node = new or old
+    return PlanChange(
+        kind=kind,
+        relations=[node.relation] if node.relation else sorted(node.relations),
+        before=old.node_type if old else None,
+        after=new.node_type if new else None,
+        time_before_ms=old.time_ms if old else None,
+        time_after_ms=new.time_ms if new else None,
+        rows_before=old.rows if old else None,
+        rows_after=new.rows if new else None,
+    )
+
+
+def _significance(change: PlanChange):
+    delta = abs((change.time_after_ms or 0.0) - (change.time_before_ms or 0.0))
+    structural = change.kind in _STRUCTURAL
+    return (not structural, _STRUCTURAL.index(change.kind) if structural else 0, -delta)
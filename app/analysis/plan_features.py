@@ -0,0 +1,147 @@
+"""
+Plan features: one pass over a plan tree, flattened into columns.
+
+extract_plan_features() walks the plan iteratively, visiting each node
+once, and returns what reports and filters ask about. store_analysis()
+writes the result into query_analysis columns, so questions like "which
+analyses spilled to disk" or "where was the row estimate off by 100x"
+become indexed predicates instead of plan_json parsing at read time:
+
+    WHERE sort_spilled OR hash_spilled       -- ix_query_analysis_spilled
+    WHERE max_estimate_error >= 100          -- ix_query_analysis_max_estimate_error
+    WHERE seq_scan_relations @> '{orders}'   -- ix_query_analysis_seq_scan_relations
+
+Fields that need ANALYZE (actual rows, timings, buffers, spills) are None
+or False for plan-only EXPLAINs (DML).
+"""
+
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional
+
+
+class PlanFeatures(NamedTuple):
+    # Field names are the query_analysis column names
+    node_type_counts: Dict[str, int]
+    seq_scan_relations: List[str]  # sorted, distinct
+    seq_scan_detected: bool
+    index_scan_detected: bool
+    plan_depth: int  # nodes on the longest root-to-leaf path
+    max_estimate_error: Optional[float]  # worst actual/estimated rows ratio, >= 1
+    shared_hit_blocks: Optional[int]
+    shared_read_blocks: Optional[int]
+    temp_blocks: Optional[int]  # read + written
+    sort_spilled: bool
+    hash_spilled: bool
+    slowest_node_type: Optional[str]
+    slowest_node_ms: Optional[float]  # exclusive time: children's time removed
+
+
+def extract_plan_features(plan_json) -> PlanFeatures:
+    """
+    Extract PlanFeatures from an EXPLAIN (FORMAT JSON) result in one pass.
+
+    Args:
+        plan_json (list): The JSON execution plan.
+    Returns:
+        PlanFeatures: The flattened features.
+    """
+    root = plan_json[0]["Plan"]
+
+    node_types = Counter()
+    seq_relations = set()
+    depth = 0
+    max_error = None
+    sort_spilled = hash_spilled = False
+    slowest_type, slowest_ms = None, None
+
+    stack = [(root, 1)]
+    while stack:
+        node, level = stack.pop()
+        node_type = node.get("Node Type", "")
+        children = node.get("Plans", [])
+
+        node_types[node_type] += 1
+        depth = max(depth, level)
+        if node_type == "Seq Scan" and node.get("Relation Name"):
+            seq_relations.add(node["Relation Name"])
+
+        error = _estimate_error(node)
+        if error is not None and (max_error is None or error > max_error):
+            max_error = error
+
+        sort_spilled = sort_spilled or _sort_spilled(node)
+        hash_spilled = hash_spilled or _hash_spilled(node)
+
+        own_ms = exclusive_time_ms(node)
+        if own_ms is not None and (slowest_ms is None or own_ms > slowest_ms):
+            slowest_type, slowest_ms = node_type, own_ms
+
+        stack.extend((child, level + 1) for child in children)
+
+    # Buffer counts are cumulative: the root's include every node below it
+    temp = None
+    if "Temp Read Blocks" in root:
+        temp = root["Temp Read Blocks"] + root.get("Temp Written Blocks", 0)
+
+    return PlanFeatures(
+        node_type_counts=dict(node_types),
+        seq_scan_relations=sorted(seq_relations),
+        seq_scan_detected=any("Seq Scan" in name for name in node_types),
+        index_scan_detected=any("Index Scan" in name for name in node_types),
+        plan_depth=depth,
+        max_estimate_error=max_error,
+        shared_hit_blocks=root.get("Shared Hit Blocks"),
+        shared_read_blocks=root.get("Shared Read Blocks"),
+        temp_blocks=temp,
+        sort_spilled=sort_spilled,
+        hash_spilled=hash_spilled,
+        slowest_node_type=slowest_type,
+        slowest_node_ms=slowest_ms,
+    )
+
+
+# --------------------------------------------------------
+# Per-node helpers
+# --------------------------------------------------------
+
+
+def _estimate_error(node: dict) -> Optional[float]:
+    # Both row counts are per loop; never-executed nodes say nothing
+    if "Actual Rows" not in node or not node.get("Actual Loops"):
+        return None
+    actual = max(node["Actual Rows"], 1)
+    planned = max(node.get("Plan Rows", 0), 1)
+    return max(actual / planned, planned / actual)
+
+
+def node_time_ms(node: dict) -> Optional[float]:
+    """Time in a node over all its loops, children included (ANALYZE only)."""
+    # Actual Total Time is per loop
+    if "Actual Total Time" not in node:
+        return None
+    return node["Actual Total Time"] * node.get("Actual Loops", 1)
+
+
+def exclusive_time_ms(node: dict) -> Optional[float]:
+    """Time in a node itself: node_time_ms() minus its children's."""
+    total = node_time_ms(node)
+    if total is None:
+        return None
+    children = sum(node_time_ms(child) or 0.0 for child in node.get("Plans", []))
+    return max(total - children, 0.0)
+
+
+def _sort_spilled(node: dict) -> bool:
+    # Parallel sorts report the workers' sorts separately
+    sorts = [node] + node.get("Workers", [])
+    return any(sort.get("Sort Space Type") == "Disk" for sort in sorts)
+
+
+def _hash_spilled(node: dict) -> bool:
+    # Hash (join): more than one batch means batches went to temp files.
+    # HashAggregate (PG 13+): batches / disk usage when over work_mem.
+    return (
+        node.get("Hash Batches", 1) > 1
+        or node.get("HashAgg Batches", 1) > 1
+        or node.get("Disk Usage", 0) > 0
+    )
@@ -0,0 +1,64 @@
+"""
+Plan shape: what the planner decided, without what it cost.
+
+Two plans have the same shape when they use the same node types, on the
+same relations and indexes, joined in the same order and the same way.
+Costs, row estimates, timings and buffers are left out, so
+
+- a plain EXPLAIN (milliseconds: planning only) and
+- an EXPLAIN ANALYZE of the same plan (as long as the query runs)
+
+hash to the same value. The analysis runner uses that to skip the
+ANALYZE when the cheap EXPLAIN shows the plan hasn't changed since the
+last stored analysis (see PLAN_SHAPE_TTL in app/analysis/explain.py).
+"""
+
+import hashlib
+import json
+from typing import List, Tuple
+
+
+# Plan node fields that make up the shape. Everything else — costs, rows,
+# widths, Actual *, buffers, conditions (they carry the example's literals)
+# — is ignored. All of these are present with and without ANALYZE.
+SHAPE_KEYS = (
+    "Node Type",
+    "Parent Relationship",
+    "Subplan Name",
+    "Join Type",
+    "Strategy",
+    "Partial Mode",
+    "Operation",
+    "Scan Direction",
+    "Schema",
+    "Relation Name",
+    "Alias",
+    "Index Name",
+    "CTE Name",
+    "Function Name",
+    "Workers Planned",
+)
+
+
+def plan_shape(plan_json) -> List[Tuple[int, list]]:
+    """
+    The plan's nodes in pre-order as (depth, [shape values]).
+
+    Pre-order with depths pins down the tree, including which side of a
+    join each input is on, i.e. the join order.
+    """
+    shape = []
+    stack = [(plan_json[0]["Plan"], 0)]
+    while stack:
+        node, depth = stack.pop()
+        shape.append((depth, [node.get(key) for key in SHAPE_KEYS]))
+        # Reversed so the first child is visited first
+        for child in reversed(node.get("Plans", [])):
+            stack.append((child, depth + 1))
+    return shape
+
+
+def plan_shape_hash(plan_json) -> str:
+    """md5 hex digest of plan_shape(): equal for plans of the same shape."""
+    canonical = json.dumps(plan_shape(plan_json), separators=(",", ":"))
+    return hashlib.md5(canonical.encode("utf-8")).hexdigest()
@@ -0,0 +1,177 @@
+"""
+Vectorized latency regression (change-point) detection.
+
+Loads the hourly latency series of every fingerprint from
+query_stats_rollups in one query, as a (fingerprints × hours) NumPy
+matrix, and finds the single most likely step up in each row at once.
+
+For every row and every split point t, with cumulative sums over the
+log of the hourly mean latency (missing hours masked out):
+
+    score(t) = (mean_after - mean_before) / sqrt(var * (1/n_before + 1/n_after))
+
+i.e. a two-sample t-statistic with pooled residual variance. The best
+split per row is flagged when the score and the before → after latency
+ratio pass the thresholds in slow_query.py. Cost is O(fingerprints ×
+hours) array operations, no Python loop over fingerprints.
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import List, NamedTuple
+
+import numpy as np
+from sqlalchemy import text
+
+from app.analysis.slow_query import (
+    REGRESSION_MIN_RATIO,
+    REGRESSION_MIN_SCORE,
+    SLOW_QUERY_MS,
+)
+
+
+REGRESSION_LOOKBACK = timedelta(days=7)  # history searched for a step
+REGRESSION_MIN_SEGMENT_HOURS = 3  # hours with data required on each side
+REGRESSION_MIN_AFTER_MS = SLOW_QUERY_MS  # ignore steps that stay fast
+
+_MIN_LATENCY_MS = 0.001  # log() floor
+_VARIANCE_FLOOR = 1e-4  # perfectly flat series would give infinite scores
+
+HOUR_SECONDS = 3600
+
+
+class HourlySeries(NamedTuple):
+    query_ids: np.ndarray  # (n,)
+    hour_starts: np.ndarray  # (t,) epoch seconds
+    sum_ms: np.ndarray  # (n, t) weighted duration sums, 0 where no data
+    counts: np.ndarray  # (n, t) weighted execution counts, 0 where no data
+
+
+class Regression(NamedTuple):
+    query_id: int
+    changed_at: datetime
+    before_ms: float
+    after_ms: float
+    score: float
+
+
+_HOURLY_SQL = text(
+    f"""
+    SELECT query_id,
+           extract(epoch FROM bucket_start)::bigint AS hour_start,
+           exec_count,
+           sum_ms
+    FROM query_stats_rollups
+    WHERE bucket_seconds = {HOUR_SECONDS} AND bucket_start >= :since
+    """
+)
+
+
+def load_hourly_series(session, lookback: timedelta = REGRESSION_LOOKBACK):
+    """
+    Load every fingerprint's hourly latency series in one query.
+
+    Returns:
+        HourlySeries: Dense matrices, one row per fingerprint.
+    """
+    now = datetime.now(timezone.utc)
+    since = now - lookback
+    rows = session.execute(_HOURLY_SQL, {"since": since}).all()
+
+    first_hour = int(since.timestamp()) // HOUR_SECONDS * HOUR_SECONDS
+    hours = (int(now.timestamp()) - first_hour) // HOUR_SECONDS + 1
+    hour_starts = first_hour + HOUR_SECONDS * np.arange(hours, dtype=np.int64)
+
+    if not rows:
+        empty = np.zeros((0, hours))
+        return HourlySeries(np.zeros(0, dtype=np.int64), hour_starts, empty, empty)
+
+    data = np.array(rows, dtype=np.float64)
+    query_ids, row_index = np.unique(data[:, 0].astype(np.int64), return_inverse=True)
+    col_index = ((data[:, 1] - first_hour) // HOUR_SECONDS).astype(np.int64)
+    in_range = (col_index >= 0) & (col_index < hours)
+
+    sum_ms = np.zeros((len(query_ids), hours))
+    counts = np.zeros((len(query_ids), hours))
+    np.add.at(counts, (row_index[in_range], col_index[in_range]), data[in_range, 2])
+    np.add.at(sum_ms, (row_index[in_range], col_index[in_range]), data[in_range, 3])
+
+    return HourlySeries(query_ids, hour_starts, sum_ms, counts)
+
+
+def detect_regressions(
+    series: HourlySeries,
+    min_segment: int = REGRESSION_MIN_SEGMENT_HOURS,
+    min_score: float = REGRESSION_MIN_SCORE,
+    min_ratio: float = REGRESSION_MIN_RATIO,
+    min_after_ms: float = REGRESSION_MIN_AFTER_MS,
+) -> List[Regression]:
+    """
+    Find the most likely latency step up in every series, all rows at once.
+
+    Returns:
+        List[Regression]: Flagged steps, most significant first.
+    """
+    if series.counts.shape[0] == 0 or series.counts.shape[1] < 2 * min_segment:
+        return []
+
+    present = series.counts > 0
+    hourly_ms = np.divide(
+        series.sum_ms, series.counts, out=np.zeros_like(series.sum_ms), where=present
+    )
+    x = np.where(present, np.log(np.maximum(hourly_ms, _MIN_LATENCY_MS)), 0.0)
+
+    # Cumulative sums; split t puts columns [0, t] before, [t + 1, end] after
+    n_cum = np.cumsum(present, axis=1, dtype=np.float64)
+    s_cum = np.cumsum(x, axis=1)
+    q_cum = np.cumsum(x * x, axis=1)
+    n_all, s_all, q_all = n_cum[:, -1:], s_cum[:, -1:], q_cum[:, -1:]
+
+    n_before, s_before, q_before = n_cum[:, :-1], s_cum[:, :-1], q_cum[:, :-1]
+    n_after, s_after, q_after = n_all - n_before, s_all - s_before, q_all - q_before
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_before = s_before / n_before
+        mean_after = s_after / n_after
+        residual = (q_before - s_before * mean_before) + (q_after - s_after * mean_after)
+        variance = np.maximum(residual / np.maximum(n_all - 2, 1), _VARIANCE_FLOOR)
+        scores = (mean_after - mean_before) / np.sqrt(
+            variance * (1 / n_before + 1 / n_after)
+        )
+
+    # The change starts at a real data point, with enough data on both sides
+    valid = (n_before >= min_segment) & (n_after >= min_segment) & present[:, 1:]
+    scores = np.where(valid & np.isfinite(scores), scores, -np.inf)
+
+    rows = np.arange(scores.shape[0])
+    best = np.argmax(scores, axis=1)
+    best_score = scores[rows, best]
+
+    # Before / after latency in ms, weighted by executions (not log scale)
+    sum_cum = np.cumsum(series.sum_ms, axis=1)
+    count_cum = np.cumsum(series.counts, axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        before_ms = sum_cum[rows, best] / count_cum[rows, best]
+        after_ms = (sum_cum[:, -1] - sum_cum[rows, best]) / (
+            count_cum[:, -1] - count_cum[rows, best]
+        )
+
+    flagged = (
+        (best_score >= min_score)
+        & (after_ms >= min_ratio * before_ms)
+        & (after_ms >= min_after_ms)
+    )
+
+    regressions = [
+        Regression(
+            query_id=int(series.query_ids[i]),
+            changed_at=datetime.fromtimestamp(
+                int(series.hour_starts[best[i] + 1]), tz=timezone.utc
+            ),
+            before_ms=float(before_ms[i]),
+            after_ms=float(after_ms[i]),
+            score=float(best_score[i]),
+        )
+        for i in np.flatnonzero(flagged)
+    ]
+    regressions.sort(key=lambda regression: regression.score, reverse=True)
+    return regressions
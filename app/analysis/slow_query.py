@@ -5,3 +5,26 @@ SLOW_QUERY_MS = (
 )
 VERY_SLOW_QUERY_MS = 2000  # 2 seconds - anything above this is very slow
 MIN_EXECUTIONS = 1  # at least 5 executions - avoid noise from one-off slow queries
+
+# Percentile thresholds: a query is a candidate when the chosen metric
+# (see candidates.get_slow_query_candidates) is at or above its threshold.
+# Tail percentiles catch queries that are fine on average but bad for
+# one request in twenty / a hundred.
+SLOW_QUERY_PERCENTILE_MS = {
+    "p50": SLOW_QUERY_MS,
+    "p95": 1000,  # 1 in 20 executions slower than 1 second
+    "p99": 2000,  # 1 in 100 executions slower than 2 seconds
+    "max": VERY_SLOW_QUERY_MS,
+}
+
+# Quantile read from the latency histogram for each percentile metric
+PERCENTILES = {"p50": 0.50, "p95": 0.95, "p99": 0.99}
+
+# Batch (executemany) statements are ranked separately, by per-row latency
+# (duration_ms / batch_size), so bulk loads don't drown out OLTP queries.
+SLOW_BATCH_ROW_MS = 1  # per-row cost above which a batch is worth a look
+
+# Regression detection (app/analysis/regression.py): a step in a query's
+# hourly latency is flagged when it is both large and clear.
+REGRESSION_MIN_RATIO = 1.5  # after / before average latency
+REGRESSION_MIN_SCORE = 5.0  # t-statistic of the step on log latency
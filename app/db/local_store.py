@@ -0,0 +1,135 @@
+"""
+Embedded local capture store (PROFILER_BACKEND=sqlite).
+
+For services that can't afford a network round trip per profiler write,
+captures go to a SQLite file on the same host instead of the central
+Postgres store:
+
+- WAL journal + synchronous=NORMAL: a write is an append to the WAL
+  file, and readers (the shipper) never block the writer
+- the same `queries` / `query_executions` columns as the central store,
+  so the writer, the fingerprint cache and the ORM models work unchanged
+- md5() and greatest() are registered as SQL functions, so the
+  fingerprint index and the counter UPDATE are the same SQL as on Postgres
+
+The shipper (app/services/shipper_services.py) moves rows to the central
+store and truncates what it has sent. Rollups, analyses and everything
+else live only in the central store.
+"""
+
+import hashlib
+import uuid
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    Text,
+    create_engine,
+    event,
+    func,
+    insert,
+    select,
+)
+
+from app.models import Query
+
+
+LOCAL_BUSY_TIMEOUT_MS = 5000  # wait this long for the shipper's write lock
+
+local_metadata = MetaData()
+
+# Same table as app/models/query.py, including the md5 fingerprint index
+local_queries = Query.__table__.to_metadata(local_metadata)
+
+# Same columns as app/models/execution.py. The central table's composite
+# (id, executed_at) key exists for partitioning; locally `id` alone is the
+# key, and AUTOINCREMENT guarantees ids are never reused after a truncate,
+# so the shipper's high-water mark stays valid.
+local_executions = Table(
+    "query_executions",
+    local_metadata,
+    Column("id", Integer, primary_key=True),
+    Column(
+        "query_id",
+        Integer,
+        ForeignKey("queries.id", ondelete="CASCADE"),
+        nullable=False,
+    ),
+    Column("executed_at", DateTime(timezone=True), nullable=False),
+    Column("duration_ms", Float, nullable=False),
+    Column("rows_returned", Integer, nullable=True),
+    Column("rows_affected", Integer, nullable=True),
+    Column("error", Text, nullable=True),
+    Column("sample_weight", Float, nullable=False, server_default="1"),
+    Column("batch_size", Integer, nullable=False, server_default="1"),
+    sqlite_autoincrement=True,
+)
+
+# One row: a random id naming this store in the central job_checkpoints,
+# so a recreated file never inherits the old file's shipping position
+local_store_info = Table(
+    "local_store",
+    local_metadata,
+    Column("store_id", String(36), primary_key=True),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+
+def _md5(value):
+    if value is None:
+        return None
+    return hashlib.md5(value.encode("utf-8")).hexdigest()
+
+
+def _greatest(*values):
+    # Postgres semantics: NULLs are ignored, NULL only if all are NULL
+    present = [value for value in values if value is not None]
+    return max(present) if present else None
+
+
+def _configure_connection(dbapi_connection, connection_record):
+    dbapi_connection.create_function("md5", 1, _md5, deterministic=True)
+    dbapi_connection.create_function("greatest", -1, _greatest, deterministic=True)
+
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.execute(f"PRAGMA busy_timeout={LOCAL_BUSY_TIMEOUT_MS}")
+    finally:
+        cursor.close()
+
+
+def create_local_engine(path: str):
+    """
+    Engine on the local SQLite capture store, creating the schema if needed.
+
+    Args:
+        path (str): SQLite database file.
+    """
+    local_engine = create_engine(
+        f"sqlite:///{path}",
+        echo=False,
+        future=True,
+        connect_args={"check_same_thread": False},  # used by the writer thread
+    )
+    event.listen(local_engine, "connect", _configure_connection)
+
+    with local_engine.begin() as conn:
+        local_metadata.create_all(conn)
+        if conn.execute(select(local_store_info.c.store_id)).first() is None:
+            conn.execute(insert(local_store_info).values(store_id=str(uuid.uuid4())))
+
+    return local_engine
+
+
+def local_store_id(session) -> str:
+    """The random id this store ships under."""
+    return session.execute(select(local_store_info.c.store_id)).scalar_one()
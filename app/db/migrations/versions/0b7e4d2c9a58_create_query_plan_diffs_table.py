@@ -0,0 +1,70 @@
+"""create query_plan_diffs table
+
+Revision ID: 0b7e4d2c9a58
+Revises: f2d8b6a4c913
+Create Date: 2026-10-18 18:47:03.551092
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0b7e4d2c9a58"
+down_revision: Union[str, Sequence[str], None] = "f2d8b6a4c913"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "query_plan_diffs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column(
+            "query_id",
+            sa.Integer(),
+            sa.ForeignKey("queries.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column(
+            "before_analysis_id",
+            sa.Integer(),
+            sa.ForeignKey("query_analysis.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column(
+            "after_analysis_id",
+            sa.Integer(),
+            sa.ForeignKey("query_analysis.id", ondelete="CASCADE"),
+            nullable=False,
+            unique=True,
+        ),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.func.now(),
+            nullable=False,
+        ),
+        sa.Column("shape_changed", sa.Boolean(), nullable=False),
+        sa.Column("join_strategy_changed", sa.Boolean(), nullable=False),
+        sa.Column("index_to_seq_scan", sa.Boolean(), nullable=False),
+        sa.Column("execution_time_delta_ms", sa.Float()),
+        sa.Column("summary", sa.Text(), nullable=False),
+        sa.Column("changes", sa.JSON(), nullable=False),
+    )
+
+    op.create_index(
+        "ix_query_plan_diffs_query_id_created_at",
+        "query_plan_diffs",
+        ["query_id", "created_at"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_query_plan_diffs_query_id_created_at", table_name="query_plan_diffs"
+    )
+    op.drop_table("query_plan_diffs")
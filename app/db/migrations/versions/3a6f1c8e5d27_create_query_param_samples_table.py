@@ -0,0 +1,69 @@
+"""create query_param_samples table
+
+Revision ID: 3a6f1c8e5d27
+Revises: 0b7e4d2c9a58
+Create Date: 2026-10-18 19:35:22.180447
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3a6f1c8e5d27"
+down_revision: Union[str, Sequence[str], None] = "0b7e4d2c9a58"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "query_param_samples",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column(
+            "query_id",
+            sa.Integer(),
+            sa.ForeignKey("queries.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("captured_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("duration_ms", sa.Float(), nullable=False),
+        sa.Column("statement", sa.Text(), nullable=False),
+        sa.Column("parameters", sa.JSON(), nullable=False),
+        sa.Column(
+            "redacted", sa.Boolean(), server_default=sa.false(), nullable=False
+        ),
+    )
+
+    op.create_index(
+        "ix_query_param_samples_query_id_duration",
+        "query_param_samples",
+        ["query_id", "duration_ms"],
+    )
+
+    op.add_column(
+        "query_analysis",
+        sa.Column(
+            "param_sample_id",
+            sa.Integer(),
+            sa.ForeignKey("query_param_samples.id", ondelete="SET NULL"),
+        ),
+    )
+    op.add_column(
+        "query_analysis",
+        sa.Column(
+            "generic_plan", sa.Boolean(), server_default=sa.false(), nullable=False
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("query_analysis", "generic_plan")
+    op.drop_column("query_analysis", "param_sample_id")
+    op.drop_index(
+        "ix_query_param_samples_query_id_duration", table_name="query_param_samples"
+    )
+    op.drop_table("query_param_samples")
@@ -0,0 +1,50 @@
+"""add queries fingerprint_hash
+
+Revision ID: 4c7e2a9d1f30
+Revises: 1ef50368fa0d
+Create Date: 2026-10-18 09:12:41.204518
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "4c7e2a9d1f30"
+down_revision: Union[str, Sequence[str], None] = "1ef50368fa0d"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Must stay in sync with app.instrumentation.profiler.fingerprint_hash()
+FINGERPRINT_HASH_SQL = "('x' || substr(md5(normalized_sql), 1, 16))::bit(64)::bigint"
+
+
+def upgrade() -> None:
+    # 1. Add as nullable so existing rows don't block the ALTER
+    op.add_column("queries", sa.Column("fingerprint_hash", sa.BigInteger()))
+
+    # 2. Backfill in one set-based statement
+    op.execute(f"UPDATE queries SET fingerprint_hash = {FINGERPRINT_HASH_SQL}")
+
+    op.alter_column("queries", "fingerprint_hash", nullable=False)
+
+    # 3. Replace the unique index on the full text with a fixed-width one
+    op.create_index(
+        "uq_queries_fingerprint_hash_md5",
+        "queries",
+        ["fingerprint_hash", sa.text("md5(normalized_sql)")],
+        unique=True,
+    )
+    op.drop_constraint("queries_normalized_sql_key", "queries", type_="unique")
+
+
+def downgrade() -> None:
+    op.create_unique_constraint(
+        "queries_normalized_sql_key", "queries", ["normalized_sql"]
+    )
+    op.drop_index("uq_queries_fingerprint_hash_md5", table_name="queries")
+    op.drop_column("queries", "fingerprint_hash")
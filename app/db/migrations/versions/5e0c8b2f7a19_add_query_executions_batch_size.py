@@ -0,0 +1,31 @@
+"""add query_executions batch_size
+
+Revision ID: 5e0c8b2f7a19
+Revises: d93b7f1e2a05
+Create Date: 2026-10-18 13:41:52.207614
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5e0c8b2f7a19"
+down_revision: Union[str, Sequence[str], None] = "d93b7f1e2a05"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Constant default: no table rewrite on Postgres 11+
+    op.add_column(
+        "query_executions",
+        sa.Column("batch_size", sa.Integer(), nullable=False, server_default="1"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("query_executions", "batch_size")
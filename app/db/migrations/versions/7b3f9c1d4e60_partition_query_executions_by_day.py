@@ -0,0 +1,181 @@
+"""partition query_executions by day
+
+Revision ID: 7b3f9c1d4e60
+Revises: 5e0c8b2f7a19
+Create Date: 2026-10-18 14:26:09.731845
+
+Rebuilds query_executions as a table range-partitioned on executed_at,
+one partition per UTC day (query_executions_pYYYYMMDD) plus a DEFAULT
+partition, and copies existing rows across. Future partitions are then
+created and expired by app/services/partition_services.py.
+
+The copy runs in this migration's transaction: on a large table, run it
+during a quiet period.
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "7b3f9c1d4e60"
+down_revision: Union[str, Sequence[str], None] = "5e0c8b2f7a19"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+PREMAKE_DAYS = 3  # daily partitions created ahead of today
+
+_COLUMNS = (
+    "id, query_id, executed_at, duration_ms, rows_returned, rows_affected, "
+    "error, sample_weight, batch_size"
+)
+
+
+def upgrade() -> None:
+    # Keep the old heap table aside (with its indexes renamed) while copying
+    op.rename_table("query_executions", "query_executions_legacy")
+    op.execute("ALTER INDEX query_executions_pkey RENAME TO query_executions_legacy_pkey")
+    op.execute(
+        "ALTER INDEX ix_query_executions_query_id_executed_at "
+        "RENAME TO ix_query_executions_legacy_query_id_executed_at"
+    )
+    op.execute(
+        "ALTER INDEX ix_query_executions_duration "
+        "RENAME TO ix_query_executions_legacy_duration"
+    )
+    op.execute("ALTER TABLE query_executions_legacy ALTER COLUMN id DROP DEFAULT")
+
+    op.create_table(
+        "query_executions",
+        sa.Column(
+            "id",
+            sa.BigInteger(),
+            server_default=sa.text("nextval('query_executions_id_seq')"),
+            nullable=False,
+        ),
+        sa.Column(
+            "query_id",
+            sa.Integer(),
+            sa.ForeignKey("queries.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column(
+            "executed_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.func.now(),
+            nullable=False,
+        ),
+        sa.Column("duration_ms", sa.Float(), nullable=False),
+        sa.Column("rows_returned", sa.Integer()),
+        sa.Column("rows_affected", sa.Integer()),
+        sa.Column("error", sa.Text()),
+        sa.Column("sample_weight", sa.Float(), nullable=False, server_default="1"),
+        sa.Column("batch_size", sa.Integer(), nullable=False, server_default="1"),
+        sa.PrimaryKeyConstraint("id", "executed_at", name="query_executions_pkey"),
+        postgresql_partition_by="RANGE (executed_at)",
+    )
+
+    # The existing SERIAL sequence keeps numbering ids, now as bigint
+    op.execute("ALTER SEQUENCE query_executions_id_seq AS bigint")
+    op.execute("ALTER SEQUENCE query_executions_id_seq OWNED BY query_executions.id")
+
+    # Indexes on the parent are created on every partition automatically
+    op.create_index(
+        "ix_query_executions_query_id_executed_at",
+        "query_executions",
+        ["query_id", "executed_at"],
+    )
+    op.create_index("ix_query_executions_duration", "query_executions", ["duration_ms"])
+
+    op.execute("CREATE TABLE query_executions_default PARTITION OF query_executions DEFAULT")
+
+    # One partition per day from the oldest execution to PREMAKE_DAYS ahead
+    op.execute(
+        f"""
+        DO $$
+        DECLARE
+            day date := coalesce(
+                (SELECT min(executed_at) AT TIME ZONE 'UTC' FROM query_executions_legacy)::date,
+                (now() AT TIME ZONE 'UTC')::date
+            );
+            last_day date := (now() AT TIME ZONE 'UTC')::date + {PREMAKE_DAYS};
+        BEGIN
+            WHILE day <= last_day LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF query_executions FOR VALUES FROM (%L) TO (%L)',
+                    'query_executions_p' || to_char(day, 'YYYYMMDD'),
+                    day::text || ' 00:00:00+00',
+                    (day + 1)::text || ' 00:00:00+00'
+                );
+                day := day + 1;
+            END LOOP;
+        END $$;
+        """
+    )
+
+    op.execute(
+        f"INSERT INTO query_executions ({_COLUMNS}) "
+        f"SELECT {_COLUMNS} FROM query_executions_legacy"
+    )
+    op.drop_table("query_executions_legacy")
+
+
+def downgrade() -> None:
+    op.rename_table("query_executions", "query_executions_partitioned")
+    op.execute(
+        "ALTER TABLE query_executions_partitioned "
+        "RENAME CONSTRAINT query_executions_pkey TO query_executions_partitioned_pkey"
+    )
+    op.drop_index(
+        "ix_query_executions_query_id_executed_at",
+        table_name="query_executions_partitioned",
+    )
+    op.drop_index("ix_query_executions_duration", table_name="query_executions_partitioned")
+    op.execute("ALTER TABLE query_executions_partitioned ALTER COLUMN id DROP DEFAULT")
+
+    op.create_table(
+        "query_executions",
+        sa.Column(
+            "id",
+            sa.BigInteger(),
+            server_default=sa.text("nextval('query_executions_id_seq')"),
+            primary_key=True,
+        ),
+        sa.Column(
+            "query_id",
+            sa.Integer(),
+            sa.ForeignKey("queries.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column(
+            "executed_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.func.now(),
+            nullable=False,
+        ),
+        sa.Column("duration_ms", sa.Float(), nullable=False),
+        sa.Column("rows_returned", sa.Integer()),
+        sa.Column("rows_affected", sa.Integer()),
+        sa.Column("error", sa.Text()),
+        sa.Column("sample_weight", sa.Float(), nullable=False, server_default="1"),
+        sa.Column("batch_size", sa.Integer(), nullable=False, server_default="1"),
+    )
+    op.execute("ALTER SEQUENCE query_executions_id_seq OWNED BY query_executions.id")
+
+    op.create_index(
+        "ix_query_executions_query_id_executed_at",
+        "query_executions",
+        ["query_id", "executed_at"],
+    )
+    op.create_index("ix_query_executions_duration", "query_executions", ["duration_ms"])
+
+    op.execute(
+        f"INSERT INTO query_executions ({_COLUMNS}) "
+        f"SELECT {_COLUMNS} FROM query_executions_partitioned"
+    )
+    # Dropping the parent drops every partition with it
+    op.drop_table("query_executions_partitioned")
@@ -0,0 +1,31 @@
+"""add query_executions sample_weight
+
+Revision ID: 8a1d5e3b6c42
+Revises: 4c7e2a9d1f30
+Create Date: 2026-10-18 10:02:17.553190
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "8a1d5e3b6c42"
+down_revision: Union[str, Sequence[str], None] = "4c7e2a9d1f30"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Constant default: no table rewrite on Postgres 11+
+    op.add_column(
+        "query_executions",
+        sa.Column("sample_weight", sa.Float(), nullable=False, server_default="1"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("query_executions", "sample_weight")
@@ -0,0 +1,39 @@
+"""create job_checkpoints table
+
+Revision ID: a4d2e6f81c37
+Revises: 7b3f9c1d4e60
+Create Date: 2026-10-18 15:08:44.120957
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a4d2e6f81c37"
+down_revision: Union[str, Sequence[str], None] = "7b3f9c1d4e60"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "job_checkpoints",
+        sa.Column("name", sa.Text(), primary_key=True),
+        sa.Column("position", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("pending_position", sa.BigInteger(), nullable=True),
+        sa.Column("pending_since", sa.DateTime(timezone=True), nullable=True),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.func.now(),
+            nullable=False,
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("job_checkpoints")
@@ -0,0 +1,49 @@
+"""create query_regressions table
+
+Revision ID: c81f4a7e2d96
+Revises: a4d2e6f81c37
+Create Date: 2026-10-18 16:12:30.448213
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c81f4a7e2d96"
+down_revision: Union[str, Sequence[str], None] = "a4d2e6f81c37"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "query_regressions",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column(
+            "query_id",
+            sa.Integer(),
+            sa.ForeignKey("queries.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column(
+            "detected_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.func.now(),
+            nullable=False,
+        ),
+        sa.Column("changed_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("before_ms", sa.Float(), nullable=False),
+        sa.Column("after_ms", sa.Float(), nullable=False),
+        sa.Column("score", sa.Float(), nullable=False),
+        sa.UniqueConstraint(
+            "query_id", "changed_at", name="uq_query_regressions_change"
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("query_regressions")
@@ -0,0 +1,61 @@
+"""create query_stats_rollups table
+
+Revision ID: d93b7f1e2a05
+Revises: 8a1d5e3b6c42
+Create Date: 2026-10-18 11:20:05.918342
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d93b7f1e2a05"
+down_revision: Union[str, Sequence[str], None] = "8a1d5e3b6c42"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "query_stats_rollups",
+        sa.Column("id", sa.BigInteger(), primary_key=True),
+        sa.Column(
+            "query_id",
+            sa.Integer(),
+            sa.ForeignKey("queries.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("bucket_start", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("bucket_seconds", sa.Integer(), nullable=False),
+        sa.Column("exec_count", sa.Float(), nullable=False),
+        sa.Column("sum_ms", sa.Float(), nullable=False),
+        sa.Column("sumsq_ms", sa.Float(), nullable=False),
+        sa.Column("min_ms", sa.Float(), nullable=False),
+        sa.Column("max_ms", sa.Float(), nullable=False),
+        sa.Column("rows_returned", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("histogram", postgresql.JSONB(), nullable=False),
+        sa.UniqueConstraint(
+            "query_id",
+            "bucket_seconds",
+            "bucket_start",
+            name="uq_query_stats_rollups_bucket",
+        ),
+    )
+
+    op.create_index(
+        "ix_query_stats_rollups_bucket_start",
+        "query_stats_rollups",
+        ["bucket_seconds", "bucket_start"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_query_stats_rollups_bucket_start", table_name="query_stats_rollups"
+    )
+    op.drop_table("query_stats_rollups")
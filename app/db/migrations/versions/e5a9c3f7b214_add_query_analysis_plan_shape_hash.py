@@ -0,0 +1,32 @@
+"""add query_analysis plan_shape_hash
+
+Revision ID: e5a9c3f7b214
+Revises: c81f4a7e2d96
+Create Date: 2026-10-18 17:20:14.902361
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e5a9c3f7b214"
+down_revision: Union[str, Sequence[str], None] = "c81f4a7e2d96"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Nullable, no backfill: existing analyses simply never match, so the
+    # first run after the upgrade re-analyzes every query once. Lookups use
+    # ix_query_analysis_query_id_executed_at.
+    op.add_column(
+        "query_analysis", sa.Column("plan_shape_hash", sa.String(length=32))
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("query_analysis", "plan_shape_hash")
@@ -0,0 +1,88 @@
+"""add query_analysis plan features
+
+Revision ID: f2d8b6a4c913
+Revises: e5a9c3f7b214
+Create Date: 2026-10-18 18:02:47.315820
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f2d8b6a4c913"
+down_revision: Union[str, Sequence[str], None] = "e5a9c3f7b214"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing rows stay NULL / false until scripts/backfill_plan_features.py
+    # has extracted their features from plan_json
+    op.add_column("query_analysis", sa.Column("node_type_counts", sa.JSON()))
+    op.add_column(
+        "query_analysis",
+        sa.Column("seq_scan_relations", postgresql.ARRAY(sa.Text())),
+    )
+    op.add_column("query_analysis", sa.Column("plan_depth", sa.Integer()))
+    op.add_column("query_analysis", sa.Column("max_estimate_error", sa.Float()))
+    op.add_column("query_analysis", sa.Column("shared_hit_blocks", sa.BigInteger()))
+    op.add_column("query_analysis", sa.Column("shared_read_blocks", sa.BigInteger()))
+    op.add_column("query_analysis", sa.Column("temp_blocks", sa.BigInteger()))
+    op.add_column(
+        "query_analysis",
+        sa.Column(
+            "sort_spilled", sa.Boolean(), server_default=sa.false(), nullable=False
+        ),
+    )
+    op.add_column(
+        "query_analysis",
+        sa.Column(
+            "hash_spilled", sa.Boolean(), server_default=sa.false(), nullable=False
+        ),
+    )
+    op.add_column("query_analysis", sa.Column("slowest_node_type", sa.Text()))
+    op.add_column("query_analysis", sa.Column("slowest_node_ms", sa.Float()))
+
+    op.create_index(
+        "ix_query_analysis_max_estimate_error",
+        "query_analysis",
+        ["max_estimate_error"],
+    )
+    op.create_index(
+        "ix_query_analysis_seq_scan_relations",
+        "query_analysis",
+        ["seq_scan_relations"],
+        postgresql_using="gin",
+    )
+    op.create_index(
+        "ix_query_analysis_spilled",
+        "query_analysis",
+        ["query_id", "executed_at"],
+        postgresql_where=sa.text("sort_spilled OR hash_spilled"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_query_analysis_spilled", table_name="query_analysis")
+    op.drop_index("ix_query_analysis_seq_scan_relations", table_name="query_analysis")
+    op.drop_index("ix_query_analysis_max_estimate_error", table_name="query_analysis")
+
+    for column in (
+        "slowest_node_ms",
+        "slowest_node_type",
+        "hash_spilled",
+        "sort_spilled",
+        "temp_blocks",
+        "shared_read_blocks",
+        "shared_hit_blocks",
+        "max_estimate_error",
+        "plan_depth",
+        "seq_scan_relations",
+        "node_type_counts",
+    ):
+        op.drop_column("query_analysis", column)
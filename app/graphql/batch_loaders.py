@@ -1,5 +1,5 @@
 # '''
-# These functions fetch all executions / analyses for multiple queries in ONE database call and group them by query_id.
+# These functions fetch all executions / analyses / rollup stats for multiple queries in ONE database call and group them by query_id.
 
 # This is exactly what you need to eliminate the N+1 problem.
 # '''
@@ -7,8 +7,12 @@
 from collections import defaultdict
 from typing import Dict, List
 
+from app.analysis.histogram import LatencyHistogram
+from app.analysis.slow_query import PERCENTILES
 from app.db.session import get_session
-from app.models import QueryExecution, QueryAnalysis
+from app.graphql.types import QueryStatsType
+from app.models import QueryExecution, QueryAnalysis, QueryStatsRollup
+from app.services.rollup_services import HOUR
 
 
 def load_executions_by_query_ids(
@@ -51,3 +55,43 @@ def load_analyses_by_query_ids(query_ids: List[int]) -> Dict[int, List[QueryAnal
         return grouped_analyses
     finally:
         session.close()
+
+
+def load_stats_by_query_ids(query_ids: List[int]) -> Dict[int, QueryStatsType]:
+    """Batch load all-time latency statistics from hourly rollups."""
+    session = get_session()
+    try:
+        rollups = (
+            session.query(
+                QueryStatsRollup.query_id,
+                QueryStatsRollup.exec_count,
+                QueryStatsRollup.sum_ms,
+                QueryStatsRollup.max_ms,
+                QueryStatsRollup.histogram,
+            )
+            .filter(QueryStatsRollup.query_id.in_(query_ids))
+            .filter(QueryStatsRollup.bucket_seconds == HOUR)
+            .all()
+        )
+
+        totals = defaultdict(lambda: [0.0, 0.0, 0.0, LatencyHistogram()])
+        for query_id, exec_count, sum_ms, max_ms, histogram in rollups:
+            total = totals[query_id]
+            total[0] += exec_count
+            total[1] += sum_ms
+            total[2] = max(total[2], max_ms)
+            total[3].merge(LatencyHistogram.from_dict(histogram))
+
+        return {
+            query_id: QueryStatsType(
+                exec_count=exec_count,
+                avg_ms=sum_ms / exec_count if exec_count else 0.0,
+                p50_ms=histogram.quantile(PERCENTILES["p50"]),
+                p95_ms=histogram.quantile(PERCENTILES["p95"]),
+                p99_ms=histogram.quantile(PERCENTILES["p99"]),
+                max_ms=max_ms,
+            )
+            for query_id, (exec_count, sum_ms, max_ms, histogram) in totals.items()
+        }
+    finally:
+        session.close()
@@ -3,20 +3,26 @@
 # This resolver fetches queries once, fetches executions and analyses in bulk, and then assembles GraphQL objects without triggering N+1 queries.
 
 # In short:
-# 3 SQL queries total
+# 4 SQL queries total
 # no per-row DB calls
 # fully deterministic behavior
 # '''
 
 import strawberry
-from typing import List
+from datetime import timedelta
+from typing import List, Optional
 
 from app.db.session import get_session
 from app.models import Query
-from app.graphql.types import QueryType
+from app.analysis.candidates import get_slow_query_candidates
+from app.graphql.types import QueryType, SlowQueryType, TopQueryType
+from app.instrumentation.heavy_hitters import heavy_hitters
+from app.instrumentation.profiler import fingerprint_hash, normalize_sql
+from app.services.query_services import find_query_by_fingerprint
 from app.graphql.batch_loaders import (
     load_analyses_by_query_ids,
     load_executions_by_query_ids,
+    load_stats_by_query_ids,
 )
 
 
@@ -37,23 +43,89 @@ class QueryRoot:
             if not queries:
                 return []
 
-            queries_ids = [qry.id for qry in queries]
-            executions_map = load_executions_by_query_ids(queries_ids)
-            analyses_map = load_analyses_by_query_ids(queries_ids)
-
-            return [
-                QueryType(
-                    id=qry.id,
-                    normalized_sql=qry.normalized_sql,
-                    raw_example_sql=qry.raw_example_sql,
-                    total_executions=qry.total_executions,
-                    first_seen_at=qry.first_seen_at,
-                    last_seen_at=qry.last_seen_at,
-                    executions=executions_map.get(qry.id, []),
-                    analyses=analyses_map.get(qry.id, []),
-                )
-                for qry in queries
-            ]
+            return _build_query_types(queries)
 
         finally:
             session.close()
+
+    @strawberry.field
+    def query_by_sql(self, sql: str) -> Optional[QueryType]:
+        """Normalize a raw SQL statement and fetch its fingerprint (by hash)."""
+        session = get_session()
+        try:
+            query = find_query_by_fingerprint(session, normalize_sql(sql))
+            if query is None:
+                return None
+
+            return _build_query_types([query])[0]
+
+        finally:
+            session.close()
+
+    @strawberry.field
+    def slow_queries(
+        self,
+        metric: str = "p95",
+        limit: int = 10,
+        window_minutes: Optional[int] = None,
+    ) -> List[SlowQueryType]:
+        """Rank query patterns by avg / p50 / p95 / p99 / max, read from rollups."""
+        window = timedelta(minutes=window_minutes) if window_minutes else None
+        candidates = get_slow_query_candidates(limit, metric=metric, window=window)
+        if not candidates:
+            return []
+
+        query_types = _build_query_types([query for query, _, _ in candidates])
+        return [
+            SlowQueryType(
+                query=query_type, metric=metric, value_ms=value_ms, exec_count=count
+            )
+            for query_type, (_, value_ms, count) in zip(query_types, candidates)
+        ]
+
+    @strawberry.field
+    def top_queries(
+        self, limit: int = 10, by: str = "total_ms"
+    ) -> List[TopQueryType]:
+        """Live top fingerprints from this process's tracker — no database query."""
+        return [
+            TopQueryType(
+                normalized_sql=hitter.normalized_sql,
+                fingerprint=_fingerprint_hex(fingerprint_hash(hitter.normalized_sql)),
+                raw_example_sql=hitter.raw_example_sql,
+                total_ms=hitter.total_ms,
+                count=hitter.count,
+                max_ms=hitter.max_ms,
+                avg_ms=hitter.avg_ms,
+                error_ms=hitter.error_ms,
+            )
+            for hitter in heavy_hitters.top(limit, by=by)
+        ]
+
+
+def _fingerprint_hex(fingerprint: int) -> str:
+    return f"{fingerprint & 0xFFFFFFFFFFFFFFFF:016x}"
+
+
+def _build_query_types(queries: List[Query]) -> List[QueryType]:
+    """Batch load executions and analyses, then assemble QueryType objects."""
+    queries_ids = [qry.id for qry in queries]
+    executions_map = load_executions_by_query_ids(queries_ids)
+    analyses_map = load_analyses_by_query_ids(queries_ids)
+    stats_map = load_stats_by_query_ids(queries_ids)
+
+    return [
+        QueryType(
+            id=qry.id,
+            normalized_sql=qry.normalized_sql,
+            fingerprint=_fingerprint_hex(qry.fingerprint_hash),
+            raw_example_sql=qry.raw_example_sql,
+            total_executions=qry.total_executions,
+            first_seen_at=qry.first_seen_at,
+            last_seen_at=qry.last_seen_at,
+            executions=executions_map.get(qry.id, []),
+            analyses=analyses_map.get(qry.id, []),
+            stats=stats_map.get(qry.id),
+        )
+        for qry in queries
+    ]
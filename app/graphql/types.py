@@ -19,6 +19,7 @@ class QueryExecutionType:
     rows_returned: Optional[int]
     rows_affected: Optional[int]
     error: Optional[int]
+    batch_size: int  # parameter sets in one executemany() call
 
 
 @strawberry.type  # GraphQL type for a single query analysis record
@@ -30,12 +31,32 @@ class QueryAnalysisType:
     execution_time_ms: Optional[str]
     seq_scan_detected: bool
     index_scan_detected: bool
+    plan_shape_hash: Optional[str]  # equal for analyses with the same plan shape
+    seq_scan_relations: Optional[List[str]]
+    max_estimate_error: Optional[float]  # worst actual vs estimated rows ratio
+    sort_spilled: bool
+    hash_spilled: bool
+    temp_blocks: Optional[int]
+    slowest_node_type: Optional[str]
+    slowest_node_ms: Optional[float]
+    generic_plan: bool  # planned without bind values (GENERIC_PLAN)
+
+
+@strawberry.type  # GraphQL type for latency statistics read from rollups
+class QueryStatsType:
+    exec_count: float  # sample-weighted
+    avg_ms: float
+    p50_ms: Optional[float]
+    p95_ms: Optional[float]
+    p99_ms: Optional[float]
+    max_ms: float
 
 
 @strawberry.type  # GraphQL type for a query pattern
 class QueryType:
     id: int
     normalized_sql: str
+    fingerprint: str  # 64-bit fingerprint_hash as 16 hex chars (GraphQL Int is 32-bit)
     raw_example_sql: str
     total_executions: int
     first_seen_at: datetime
@@ -44,3 +65,24 @@ class QueryType:
     # These fields represent relationships to other types
     executions: List[QueryExecutionType]
     analyses: List[QueryAnalysisType]
+    stats: Optional[QueryStatsType]  # all-time, from hourly rollups
+
+
+@strawberry.type  # GraphQL type for one slow query candidate
+class SlowQueryType:
+    query: QueryType
+    metric: str
+    value_ms: float
+    exec_count: float
+
+
+@strawberry.type  # GraphQL type for one live heavy hitter (in-process, no DB)
+class TopQueryType:
+    normalized_sql: str
+    fingerprint: str
+    raw_example_sql: str
+    total_ms: float  # over the sliding window; accurate to ± error_ms
+    count: int
+    max_ms: float
+    avg_ms: float
+    error_ms: float
@@ -0,0 +1,286 @@
+"""
+In-process aggregation mode for the capture listeners.
+
+For high-frequency fingerprints we need distributions, not one
+QueryExecution row per call. In "aggregate" capture mode the listener
+folds each execution into per-fingerprint, per-time-bucket statistics
+(count, sum, sum of squares, min, max, rows, latency histogram) and a
+background thread flushes finished buckets to query_stats_rollups —
+as minute rows, and folded into the matching hour rows in the same write.
+
+Write volume becomes (fingerprints × buckets) instead of (executions).
+"""
+
+import atexit
+import logging
+import math
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from app.analysis.histogram import LatencyHistogram
+from app.db.session import get_profiler_session
+from app.instrumentation.sampling import sampling_policy
+from app.instrumentation.counters import counter_deltas, merge_deltas
+from app.instrumentation.param_samples import param_samples
+from app.instrumentation.writer import (
+    ExecutionEvent,
+    apply_execution_counts,
+    execution_deltas,
+    insert_param_samples,
+    resolve_query_ids,
+)
+from app.services.rollup_services import HOUR, coarsen_rollups, merge_rollups
+
+logger = logging.getLogger(__name__)
+
+
+AGGREGATE_BUCKET_SECONDS = 60  # rollup granularity
+AGGREGATE_FLUSH_INTERVAL_S = 10.0  # how often finished buckets are written
+
+
+class FingerprintStats:
+    """Running statistics for one fingerprint in one time bucket."""
+
+    __slots__ = (
+        "raw_sql",
+        "executions",
+        "count",
+        "sum_ms",
+        "sumsq_ms",
+        "min_ms",
+        "max_ms",
+        "rows_returned",
+        "histogram",
+    )
+
+    def __init__(self, raw_sql: str):
+        self.raw_sql = raw_sql
+        self.executions = 0  # real executions recorded (unweighted)
+        self.count = 0.0  # sample-weighted
+        self.sum_ms = 0.0
+        self.sumsq_ms = 0.0
+        self.min_ms = math.inf
+        self.max_ms = 0.0
+        self.rows_returned = 0
+        self.histogram = LatencyHistogram()
+
+    def add(self, duration_ms: float, rows_returned: Optional[int], weight: float):
+        self.executions += 1
+        self.count += weight
+        self.sum_ms += duration_ms * weight
+        self.sumsq_ms += duration_ms * duration_ms * weight
+        if duration_ms < self.min_ms:
+            self.min_ms = duration_ms
+        if duration_ms > self.max_ms:
+            self.max_ms = duration_ms
+        if rows_returned:
+            self.rows_returned += int(rows_returned * weight)
+        self.histogram.add(duration_ms, weight)
+
+    def merge(self, other: "FingerprintStats") -> None:
+        """Fold another bucket's statistics for the same fingerprint into this one."""
+        self.executions += other.executions
+        self.count += other.count
+        self.sum_ms += other.sum_ms
+        self.sumsq_ms += other.sumsq_ms
+        self.min_ms = min(self.min_ms, other.min_ms)
+        self.max_ms = max(self.max_ms, other.max_ms)
+        self.rows_returned += other.rows_returned
+        self.histogram.merge(other.histogram)
+
+
+BucketKey = Tuple[str, int]  # (normalized_sql, bucket start as epoch seconds)
+
+
+class StatsAggregator:
+    """Thread-safe per-(fingerprint, bucket) aggregator with its own flusher."""
+
+    def __init__(
+        self,
+        bucket_seconds: int = AGGREGATE_BUCKET_SECONDS,
+        flush_interval_s: float = AGGREGATE_FLUSH_INTERVAL_S,
+    ):
+        self.bucket_seconds = bucket_seconds
+        self._flush_interval_s = flush_interval_s
+        self._stats: Dict[BucketKey, FingerprintStats] = {}
+        self._lock = threading.Lock()
+
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # -----------------------------------------------------------------
+    # Caller side
+    # -----------------------------------------------------------------
+    def record(self, event: ExecutionEvent) -> None:
+        bucket = int(event.executed_at.timestamp()) // self.bucket_seconds
+        key = (event.normalized_sql, bucket * self.bucket_seconds)
+
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = FingerprintStats(event.raw_sql)
+            stats.add(event.duration_ms, event.rows_returned, event.sample_weight)
+
+    # -----------------------------------------------------------------
+    # Flusher side
+    # -----------------------------------------------------------------
+    def drain(self, force: bool = False) -> Dict[BucketKey, FingerprintStats]:
+        """
+        Remove and return finished buckets (all buckets if force=True).
+        """
+        now = datetime.now(timezone.utc).timestamp()
+
+        with self._lock:
+            if force:
+                drained, self._stats = self._stats, {}
+                return drained
+
+            drained = {
+                key: stats
+                for key, stats in self._stats.items()
+                if key[1] + self.bucket_seconds <= now
+            }
+            for key in drained:
+                del self._stats[key]
+
+        return drained
+
+    def restore(self, drained: Dict[BucketKey, FingerprintStats]) -> None:
+        """Put back buckets from a drain whose flush failed, so none are lost."""
+        with self._lock:
+            for key, stats in drained.items():
+                current = self._stats.get(key)
+                if current is None:
+                    self._stats[key] = stats
+                else:
+                    current.merge(stats)
+
+    def flush(self, force: bool = False) -> int:
+        """
+        Write finished buckets to query_stats_rollups.
+
+        Returns:
+            int: Number of rollup rows written.
+        """
+        drained = self.drain(force)
+        unsampled = sampling_policy.drain_unsampled()
+        carried = counter_deltas.drain()
+        samples = param_samples.drain(force)
+        if not drained and not unsampled and not carried and not samples:
+            return 0
+
+        session = get_profiler_session()
+        try:
+            counts = Counter()
+            examples = {}
+            for (normalized_sql, _), stats in drained.items():
+                counts[normalized_sql] += stats.executions
+                examples.setdefault(normalized_sql, stats.raw_sql)
+
+            for normalized_sql, (skipped, raw_sql) in unsampled.items():
+                counts[normalized_sql] += skipped
+                examples.setdefault(normalized_sql, raw_sql)
+
+            for sample in samples:
+                examples.setdefault(sample.normalized_sql, sample.statement)
+
+            query_ids = resolve_query_ids(session, examples)
+            deltas = merge_deltas(execution_deltas(query_ids, counts), carried)
+            deferred = apply_execution_counts(session, deltas)
+            rows = _to_rollup_rows(drained, query_ids, self.bucket_seconds)
+            merge_rollups(session, rows)
+            merge_rollups(session, coarsen_rollups(rows, HOUR))
+            insert_param_samples(session, query_ids, samples)
+            session.commit()
+
+        except Exception:
+            session.rollback()
+            # Nothing was written; keep everything for the next flush
+            self.restore(drained)
+            sampling_policy.restore_unsampled(unsampled)
+            counter_deltas.restore(carried)
+            param_samples.restore(samples)
+            raise
+
+        finally:
+            session.close()
+
+        counter_deltas.restore(deferred)
+        return len(drained)
+
+    # -----------------------------------------------------------------
+    # Lifecycle
+    # -----------------------------------------------------------------
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+
+        self._thread = threading.Thread(
+            target=self._run, name="query-profiler-aggregator", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.stop)  # flush partial buckets on interpreter exit
+
+    def stop(self, timeout: float = 5.0) -> None:
+        if self._thread is None:
+            return
+
+        self._stop_event.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self._flush_interval_s):
+            self._safe_flush(force=False)
+        self._safe_flush(force=True)
+
+    def _safe_flush(self, force: bool) -> None:
+        try:
+            self.flush(force)
+        except Exception:
+            logger.exception("Profiler rollup flush failed")
+
+
+def _to_rollup_rows(
+    drained: Dict[BucketKey, FingerprintStats],
+    query_ids: Dict[str, int],
+    bucket_seconds: int,
+) -> List[Dict]:
+    return [
+        {
+            "query_id": query_ids[normalized_sql],
+            "bucket_start": datetime.fromtimestamp(bucket_start, tz=timezone.utc),
+            "bucket_seconds": bucket_seconds,
+            "exec_count": stats.count,
+            "sum_ms": stats.sum_ms,
+            "sumsq_ms": stats.sumsq_ms,
+            "min_ms": stats.min_ms,
+            "max_ms": stats.max_ms,
+            "rows_returned": stats.rows_returned,
+            "histogram": stats.histogram.to_dict(),
+        }
+        for (normalized_sql, bucket_start), stats in drained.items()
+    ]
+
+
+# -------------------------------------------------------------
+# Process-wide aggregator, started lazily on first capture
+# -------------------------------------------------------------
+_aggregator: Optional[StatsAggregator] = None
+_aggregator_lock = threading.Lock()
+
+
+def get_aggregator() -> StatsAggregator:
+    """Return the process-wide StatsAggregator, starting it if needed."""
+    global _aggregator
+
+    if _aggregator is None:
+        with _aggregator_lock:
+            if _aggregator is None:
+                aggregator = StatsAggregator()
+                aggregator.start()
+                _aggregator = aggregator
+
+    return _aggregator
@@ -0,0 +1,239 @@
+"""
+Cardinality governor: a budget on how fast new fingerprints may appear.
+
+One badly parameterized client — string-concatenated literals that
+normalize_sql can't strip, generated table names — produces a new
+normalized_sql for every call. Each one would become a `queries` row, a
+fingerprint-cache entry, a sampling counter and a GROUP BY group.
+
+The governor sits in the capture listener, right after normalization:
+
+- fingerprints it has already admitted, or that the fingerprint cache
+  knows, pass straight through (one dict lookup, no lock)
+- a new fingerprint spends one token from its source's bucket
+  (FINGERPRINT_BUDGET_PER_MINUTE, bursts up to FINGERPRINT_BURST)
+- with the bucket empty, the execution is recorded under an overflow
+  fingerprint for its shape instead — source, statement kind and primary
+  table (digit runs folded, so evt_2024_01 and evt_2024_02 share one) —
+  and the offending pattern is remembered for report()
+
+So `queries` grows by at most the budget plus one row per shape, and the
+overflow rows (normalized_sql starting with OVERFLOW_PREFIX) say where
+the cardinality comes from; their raw_example_sql is a real statement.
+
+A "source" is the `profiler_source` execution option when the
+application sets one (engine.execution_options(profiler_source="billing")),
+otherwise the database the engine points at.
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Set
+
+from app.instrumentation.classifier import StatementInfo
+
+logger = logging.getLogger(__name__)
+
+
+FINGERPRINT_BUDGET_PER_MINUTE = int(os.getenv("PROFILER_FINGERPRINT_BUDGET", "100"))
+FINGERPRINT_BURST = 1_000  # new fingerprints allowed at once (start-up, deploys)
+MAX_ADMITTED_FINGERPRINTS = 50_000  # remembered as known; oldest forgotten first
+MAX_OVERFLOW_BUCKETS = 200  # per source; beyond this, one bucket per kind
+OVERFLOW_EXAMPLES = 3  # offending fingerprints kept per bucket for the report
+OVERFLOW_DISTINCT_LIMIT = 10_000  # distinct fingerprints tracked per bucket
+
+OVERFLOW_PREFIX = "/* overflow */"
+SOURCE_OPTION = "profiler_source"
+
+_DIGITS = re.compile(r"\d+")
+
+
+class OverflowBucket:
+    """What was folded into one overflow fingerprint."""
+
+    __slots__ = ("source", "kind", "table", "executions", "fingerprints", "examples")
+
+    def __init__(self, source: str, kind: str, table: Optional[str]):
+        self.source = source
+        self.kind = kind
+        self.table = table
+        self.executions = 0
+        self.fingerprints: Set[int] = set()  # hashes, capped
+        self.examples: List[str] = []
+
+    @property
+    def normalized_sql(self) -> str:
+        return f"{OVERFLOW_PREFIX} {self.source} {self.kind} {self.table or '*'}"
+
+
+class OverflowReport(NamedTuple):
+    source: str
+    kind: str
+    table: Optional[str]
+    overflow_sql: str  # the fingerprint executions were recorded under
+    executions: int
+    distinct_fingerprints: int  # lower bound once OVERFLOW_DISTINCT_LIMIT is hit
+    examples: List[str]
+
+
+class _TokenBucket:
+    __slots__ = ("tokens", "updated", "admitted", "overflowed")
+
+    def __init__(self, tokens: float, now: float):
+        self.tokens = tokens
+        self.updated = now
+        self.admitted = 0
+        self.overflowed = 0
+
+
+class CardinalityGovernor:
+    """Thread-safe per-source new-fingerprint budget with overflow buckets."""
+
+    def __init__(
+        self,
+        budget_per_minute: float = FINGERPRINT_BUDGET_PER_MINUTE,
+        burst: float = FINGERPRINT_BURST,
+        max_admitted: int = MAX_ADMITTED_FINGERPRINTS,
+        max_buckets: int = MAX_OVERFLOW_BUCKETS,
+    ):
+        self.refill_per_second = budget_per_minute / 60
+        self.burst = burst
+        self.max_admitted = max_admitted
+        self.max_buckets = max_buckets
+
+        self._admitted: Dict[str, None] = {}  # insertion-ordered set
+        self._sources: Dict[str, _TokenBucket] = {}
+        self._buckets: Dict[tuple, OverflowBucket] = {}
+        self._lock = threading.Lock()
+
+    def admit(self, normalized_sql: str, source: str, info: StatementInfo) -> str:
+        """
+        Return the fingerprint to record this execution under.
+
+        Either `normalized_sql` itself or its shape's overflow fingerprint.
+        """
+        if normalized_sql in self._admitted:
+            return normalized_sql
+
+        with self._lock:
+            if normalized_sql in self._admitted:
+                return normalized_sql
+
+            bucket = self._source_bucket(source)
+            if bucket.tokens >= 1:
+                bucket.tokens -= 1
+                bucket.admitted += 1
+                self._admitted[normalized_sql] = None
+                if len(self._admitted) > self.max_admitted:
+                    del self._admitted[next(iter(self._admitted))]
+                return normalized_sql
+
+            bucket.overflowed += 1
+            return self._overflow(normalized_sql, source, info).normalized_sql
+
+    def report(self, limit: int = 20) -> List[OverflowReport]:
+        """Overflow buckets, the most distinct offending fingerprints first."""
+        with self._lock:
+            reports = [
+                OverflowReport(
+                    source=bucket.source,
+                    kind=bucket.kind,
+                    table=bucket.table,
+                    overflow_sql=bucket.normalized_sql,
+                    executions=bucket.executions,
+                    distinct_fingerprints=len(bucket.fingerprints),
+                    examples=list(bucket.examples),
+                )
+                for bucket in self._buckets.values()
+            ]
+
+        reports.sort(
+            key=lambda report: (report.distinct_fingerprints, report.executions),
+            reverse=True,
+        )
+        return reports[:limit]
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Per source: fingerprints admitted, executions overflowed, tokens left."""
+        with self._lock:
+            return {
+                source: {
+                    "admitted": bucket.admitted,
+                    "overflowed": bucket.overflowed,
+                    "tokens": round(bucket.tokens, 1),
+                }
+                for source, bucket in self._sources.items()
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._admitted.clear()
+            self._sources.clear()
+            self._buckets.clear()
+
+    # -----------------------------------------------------------------
+    # Internals (called with the lock held)
+    # -----------------------------------------------------------------
+    def _source_bucket(self, source: str) -> _TokenBucket:
+        now = time.monotonic()
+        bucket = self._sources.get(source)
+        if bucket is None:
+            bucket = self._sources[source] = _TokenBucket(self.burst, now)
+        else:
+            refill = (now - bucket.updated) * self.refill_per_second
+            bucket.tokens = min(self.burst, bucket.tokens + refill)
+            bucket.updated = now
+        return bucket
+
+    def _overflow(
+        self, normalized_sql: str, source: str, info: StatementInfo
+    ) -> OverflowBucket:
+        table = _DIGITS.sub("#", info.primary_relation or "") or None
+        key = (source, info.kind, table)
+
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            per_source = sum(1 for s, _, _ in self._buckets if s == source)
+            if per_source >= self.max_buckets:
+                key = (source, info.kind, None)  # even the shapes are unbounded
+                bucket = self._buckets.get(key)
+
+        if bucket is None:
+            bucket = self._buckets[key] = OverflowBucket(*key)
+            logger.warning(
+                "Fingerprint budget exceeded for source %r: recording new %s "
+                "fingerprints on %s as %r (e.g. %s)",
+                source,
+                info.kind,
+                table or "any table",
+                bucket.normalized_sql,
+                normalized_sql[:200],
+            )
+
+        bucket.executions += 1
+        if len(bucket.fingerprints) < OVERFLOW_DISTINCT_LIMIT:
+            bucket.fingerprints.add(hash(normalized_sql))
+        examples = bucket.examples
+        if len(examples) < OVERFLOW_EXAMPLES and normalized_sql not in examples:
+            examples.append(normalized_sql)
+
+        return bucket
+
+
+def is_overflow_fingerprint(normalized_sql: str) -> bool:
+    return normalized_sql.startswith(OVERFLOW_PREFIX)
+
+
+def execution_source(context) -> str:
+    """The source an execution is budgeted against (see module docstring)."""
+    source = context.execution_options.get(SOURCE_OPTION)
+    if source:
+        return str(source)
+    return context.engine.url.database or "default"
+
+
+# Process-wide governor used by the listeners
+cardinality_governor = CardinalityGovernor()
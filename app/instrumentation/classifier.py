@@ -0,0 +1,265 @@
+"""
+Statement classification, computed once per distinct statement shape
+(literal_shape(), see profiler.py: statements differing only in literal
+values or comments classify the same).
+
+classify_statement() tokenizes a statement (same tokenizer as
+normalize_sql) and extracts:
+- kind: "select", "dml", "ddl" or "utility"
+- relations: the tables it references, properly tokenized — so a column
+  named `queries_count` or a string literal mentioning "recommendations"
+  no longer looks like a profiler table
+- primary_relation: the first table referenced (the FROM / INTO target)
+- is_internal: whether it touches a profiler-internal table
+
+Used by the capture listeners (internal filter), the sampling policy
+(per-kind rates), the cardinality governor (overflow buckets) and the
+EXPLAIN runner (what is safe to ANALYZE).
+"""
+
+from functools import lru_cache
+from typing import FrozenSet, List, NamedTuple, Optional, Set
+
+from app.instrumentation.profiler import (
+    KEYWORDS,
+    PUNCT,
+    QUOTED_IDENT,
+    WORD,
+    Token,
+    literal_shape,
+    tokenize,
+)
+
+
+CLASSIFIER_CACHE_SIZE = 20_000  # distinct raw statements memoized
+
+SELECT = "select"
+DML = "dml"
+DDL = "ddl"
+UTILITY = "utility"
+
+
+# -------------------------------------------------------------
+# Internal tables that should never be profiled
+# -------------------------------------------------------------
+INTERNAL_TABLES: Set[str] = {
+    "queries",
+    "query_executions",
+    "query_analysis",
+    "recommendations",
+    "query_stats_rollups",
+    "job_checkpoints",
+    "query_regressions",
+    "query_plan_diffs",
+    "query_param_samples",
+    "alembic_version",
+}
+# Partitions of internal tables (query_executions_p20260102, ..._default)
+INTERNAL_TABLE_PREFIXES = ("query_executions_",)
+
+
+_SELECT_COMMANDS = frozenset({"SELECT", "WITH", "VALUES", "TABLE"})
+_DML_COMMANDS = frozenset({"INSERT", "UPDATE", "DELETE", "MERGE"})
+_DDL_COMMANDS = frozenset(
+    {"CREATE", "ALTER", "DROP", "TRUNCATE", "COMMENT", "GRANT", "REVOKE", "REINDEX"}
+)
+
+# Words after which a relation name (or a comma-separated list of them) follows
+_RELATION_INTRODUCERS = frozenset(
+    {"FROM", "JOIN", "INTO", "UPDATE", "TABLE", "TRUNCATE", "USING", "LOCK", "COPY"}
+)
+# Not in KEYWORDS, yet `word (` opens a subquery rather than a function call
+_SUBQUERY_OWNERS = frozenset({"COPY"})
+# Only in these contexts can `name(` be a set-returning function call;
+# elsewhere (INSERT INTO t (cols), CREATE TABLE t (...)) it is a column list
+_FUNCTION_CONTEXTS = frozenset({"FROM", "JOIN", "USING"})
+# Words that may sit between an introducer and the relation name
+_RELATION_PREFIXES = frozenset({"ONLY", "LATERAL", "IF", "NOT", "EXISTS"})
+
+
+class StatementInfo(NamedTuple):
+    kind: str
+    command: str  # first significant keyword, e.g. "SELECT", "INSERT", "BEGIN"
+    relations: FrozenSet[str]
+    is_internal: bool
+    primary_relation: Optional[str] = None
+
+
+@lru_cache(maxsize=CLASSIFIER_CACHE_SIZE)
+def classify_statement(sql: str) -> StatementInfo:
+    """
+    Classify a raw SQL statement.
+
+    Args:
+        sql (str): Raw SQL statement as sent to the driver.
+    Returns:
+        StatementInfo: kind, leading command, referenced relations, internal flag.
+    """
+    return _classify_shape(literal_shape(sql))
+
+
+@lru_cache(maxsize=CLASSIFIER_CACHE_SIZE)
+def _classify_shape(shape: str) -> StatementInfo:
+    tokens = tokenize(shape)
+    words = [text.upper() for kind, text in tokens if kind == WORD]
+    command = words[0] if words else ""
+
+    ordered = _extract_relations(tokens)
+    relations = frozenset(ordered)
+    is_internal = any(_is_internal_relation(rel) for rel in relations)
+
+    return StatementInfo(
+        kind=_statement_kind(command, words),
+        command=command,
+        relations=relations,
+        is_internal=is_internal,
+        primary_relation=ordered[0] if ordered else None,
+    )
+
+
+def _is_internal_relation(relation: str) -> bool:
+    name = relation.rsplit(".", 1)[-1]
+    return name in INTERNAL_TABLES or name.startswith(INTERNAL_TABLE_PREFIXES)
+
+
+def _statement_kind(command: str, words: List[str]) -> str:
+    if command in _DML_COMMANDS:
+        return DML
+    if command in _DDL_COMMANDS:
+        return DDL
+    if command not in _SELECT_COMMANDS:
+        return UTILITY
+
+    # WITH ... (DELETE ...) SELECT, SELECT ... INTO new_table, etc.
+    for i, word in enumerate(words):
+        if word in ("INSERT", "DELETE", "MERGE"):
+            return DML
+        if word == "UPDATE" and words[i - 1] not in ("FOR", "KEY"):
+            return DML
+        if word == "INTO" and command == "SELECT":
+            return DDL  # SELECT ... INTO creates a table
+
+    return SELECT
+
+
+def _extract_relations(tokens: List[Token]) -> List[str]:
+    relations: List[str] = []
+    cte_names: Set[str] = set()
+    is_copy = bool(tokens) and tokens[0][1].upper() == "COPY"
+    paren_owners: List[Optional[str]] = []  # word before each open "("
+    expecting = False  # a relation name may come next
+    introducer: Optional[str] = None
+    prev: Optional[str] = None
+
+    i = 0
+    n = len(tokens)
+    while i < n:
+        kind, text = tokens[i]
+        upper = text.upper() if kind == WORD else text
+
+        # WITH name [(cols)] AS ( ... ) — a CTE, not a table
+        if kind in (WORD, QUOTED_IDENT) and _is_cte_name(tokens, i, prev):
+            cte_names.add(_ident(tokens[i]))
+
+        if text == "(":
+            paren_owners.append(prev)
+            expecting = False
+        elif text == ")":
+            if paren_owners:
+                paren_owners.pop()
+            expecting = False
+        elif kind == WORD and upper in _RELATION_INTRODUCERS:
+            # FROM inside extract(... FROM ...), substring(...) etc. is not a table
+            owner = paren_owners[-1] if paren_owners else None
+            in_function = (
+                owner is not None
+                and owner not in KEYWORDS
+                and owner not in _SUBQUERY_OWNERS
+            )
+            # FOR UPDATE / DO UPDATE are locking clauses, not targets
+            locking = upper == "UPDATE" and prev in ("FOR", "KEY", "DO")
+            # COPY t FROM STDIN / 'file' / PROGRAM: a source, not a table
+            copy_source = is_copy and upper == "FROM" and not paren_owners
+            expecting = not (in_function or locking or copy_source)
+            introducer = upper
+        elif expecting and kind == WORD and upper in _RELATION_PREFIXES:
+            pass
+        elif expecting and (
+            kind == QUOTED_IDENT or (kind == WORD and upper not in KEYWORDS)
+        ):
+            name, i = _read_dotted_name(tokens, i)
+            # FROM name( → set-returning function, not a relation
+            is_call = i + 1 < n and tokens[i + 1][1] == "("
+            if not (is_call and introducer in _FUNCTION_CONTEXTS):
+                relations.append(name)
+            i = _skip_alias(tokens, i + 1)
+            expecting = i < n and tokens[i][1] == ","  # FROM a, b, c
+            if expecting:
+                i += 1
+            prev = None
+            continue
+        else:
+            expecting = False
+
+        prev = upper if kind == WORD else text
+        i += 1
+
+    return [rel for rel in relations if rel not in cte_names]
+
+
+def _is_cte_name(tokens: List[Token], i: int, prev: Optional[str]) -> bool:
+    """`name AS (`, or `name (cols) AS (` right after WITH [RECURSIVE] / a comma."""
+    j = i + 1
+    if j < len(tokens) and tokens[j][1] == "(":
+        if prev not in ("WITH", "RECURSIVE", ","):
+            return False  # f(x) AS (...) is a column definition list
+        depth = 0
+        while j < len(tokens):
+            if tokens[j][1] == "(":
+                depth += 1
+            elif tokens[j][1] == ")":
+                depth -= 1
+                if depth == 0:
+                    break
+            j += 1
+        j += 1
+
+    if j >= len(tokens) or tokens[j][1].upper() != "AS":
+        return False
+    j += 1
+    # AS [NOT] MATERIALIZED (
+    while j < len(tokens) and tokens[j][1].upper() in ("NOT", "MATERIALIZED"):
+        j += 1
+    return j < len(tokens) and tokens[j][1] == "("
+
+
+def _read_dotted_name(tokens: List[Token], i: int):
+    """Read `schema.table` / `"Quoted"."Name"`; returns (name, index of last token)."""
+    parts = [_ident(tokens[i])]
+    while (
+        i + 2 < len(tokens)
+        and tokens[i + 1] == (PUNCT, ".")
+        and tokens[i + 2][0] in (WORD, QUOTED_IDENT)
+    ):
+        parts.append(_ident(tokens[i + 2]))
+        i += 2
+    return ".".join(parts), i
+
+
+def _skip_alias(tokens: List[Token], i: int) -> int:
+    """Skip an optional `[AS] alias` after a relation name."""
+    if i < len(tokens) and tokens[i][0] == WORD and tokens[i][1].upper() == "AS":
+        i += 1
+    if i < len(tokens) and (
+        tokens[i][0] == QUOTED_IDENT
+        or (tokens[i][0] == WORD and tokens[i][1].upper() not in KEYWORDS)
+    ):
+        i += 1
+    return i
+
+
+def _ident(token: Token) -> str:
+    kind, text = token
+    if kind == QUOTED_IDENT:
+        return text[1:-1].replace('""', '"')
+    return text.lower()
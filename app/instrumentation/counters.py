@@ -0,0 +1,72 @@
+"""
+In-memory counter deltas for the `queries` table.
+
+total_executions / last_seen_at live on one row per fingerprint, and the
+hottest fingerprints are exactly the rows every writer wants to update.
+Instead of queueing up behind each other's row locks, writers apply
+their deltas with FOR NO KEY UPDATE SKIP LOCKED (see
+writer.apply_execution_counts): rows another writer holds right now are
+skipped and their deltas are parked here, to be folded into the next
+batch. Counts are never lost — only applied a flush later.
+
+Deltas are keyed by query_id; the process-wide `counter_deltas` is
+shared by the buffered writer, the aggregator and sync-mode captures.
+"""
+
+import threading
+from datetime import datetime
+from typing import Dict, NamedTuple, Optional
+
+
+class CounterDelta(NamedTuple):
+    executions: int
+    last_seen: datetime
+
+
+def merge_deltas(
+    into: Dict[int, CounterDelta], deltas: Dict[int, CounterDelta]
+) -> Dict[int, CounterDelta]:
+    """Add `deltas` into `into` (in place) and return it."""
+    for query_id, delta in deltas.items():
+        current = into.get(query_id)
+        if current is None:
+            into[query_id] = delta
+        else:
+            into[query_id] = CounterDelta(
+                current.executions + delta.executions,
+                max(current.last_seen, delta.last_seen),
+            )
+    return into
+
+
+class CounterDeltas:
+    """Thread-safe parking area for counter deltas not yet written."""
+
+    def __init__(self):
+        self._deltas: Dict[int, CounterDelta] = {}
+        self._lock = threading.Lock()
+
+    def drain(self) -> Dict[int, CounterDelta]:
+        """Hand over every parked delta (the caller now owns them)."""
+        with self._lock:
+            deltas, self._deltas = self._deltas, {}
+        return deltas
+
+    def restore(self, deltas: Optional[Dict[int, CounterDelta]]) -> None:
+        """Park deltas that could not be written (locked rows, failed flush)."""
+        if not deltas:
+            return
+        with self._lock:
+            merge_deltas(self._deltas, deltas)
+
+    def pending(self) -> int:
+        """Executions counted in memory but not yet in `queries`."""
+        with self._lock:
+            return sum(delta.executions for delta in self._deltas.values())
+
+    def __len__(self) -> int:
+        return len(self._deltas)
+
+
+# Process-wide instance shared by every profiler write path
+counter_deltas = CounterDeltas()
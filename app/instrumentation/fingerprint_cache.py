@@ -0,0 +1,104 @@
+"""
+Process-local cache: normalized SQL fingerprint → queries.id
+
+Real workloads have a few thousand distinct fingerprints but millions of
+executions, so after warm-up every capture should resolve its query_id
+from memory instead of reading the `queries` table.
+
+hits / misses are exposed so you can confirm that in steady state
+`misses` stops growing (i.e. capture never reads `queries`).
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from app.models import Query
+
+
+FINGERPRINT_CACHE_SIZE = 10_000  # max fingerprints kept in memory
+
+
+class FingerprintCache:
+    """Thread-safe, size-bounded LRU map of normalized_sql → query_id."""
+
+    def __init__(self, max_size: int = FINGERPRINT_CACHE_SIZE):
+        self._max_size = max_size
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.warmed = False
+
+    def get(self, normalized_sql: str) -> Optional[int]:
+        """Return the cached query_id, or None on a miss."""
+        with self._lock:
+            query_id = self._entries.get(normalized_sql)
+            if query_id is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(normalized_sql)
+            self.hits += 1
+            return query_id
+
+    def put(self, normalized_sql: str, query_id: int) -> None:
+        """Insert (or refresh) a mapping, evicting the least recently used."""
+        with self._lock:
+            self._entries[normalized_sql] = query_id
+            self._entries.move_to_end(normalized_sql)
+
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def warm(self, session) -> int:
+        """
+        Preload the most recently seen fingerprints from the `queries` table.
+
+        Returns:
+            int: Number of fingerprints loaded.
+        """
+        rows = (
+            session.query(Query.normalized_sql, Query.id)
+            .order_by(Query.last_seen_at.desc())
+            .limit(self._max_size)
+            .all()
+        )
+
+        with self._lock:
+            # Oldest first so the most recent end up at the MRU end
+            for normalized_sql, query_id in reversed(rows):
+                self._entries[normalized_sql] = query_id
+            self.warmed = True
+
+        return len(rows)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+            self.warmed = False
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self._max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def __contains__(self, normalized_sql: str) -> bool:
+        # Membership only: no LRU bump, no hit / miss accounting
+        return normalized_sql in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Process-wide instance shared by the listener and the background writer
+fingerprint_cache = FingerprintCache()
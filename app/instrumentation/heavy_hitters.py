@@ -0,0 +1,199 @@
+"""
+Live top-K fingerprints by database time, with no database queries.
+
+The capture listener feeds every execution (sampled out or not) into a
+sliding-window Space-Saving summary:
+
+- the window (HEAVY_HITTERS_WINDOW_S) is split into sub-windows; each
+  sub-window keeps at most HEAVY_HITTERS_CAPACITY fingerprints, weighted
+  by duration_ms
+- a tracked fingerprint is updated in O(1) (dict lookup, add)
+- an untracked one replaces the entry with the smallest total time and
+  inherits that total as its error bound (weighted Space-Saving); the
+  smallest entry is found with a lazy min-heap — heap records go stale
+  as totals grow and are refreshed only when they reach the top
+- reading the top K merges the live sub-windows; old ones simply fall off
+
+Guarantee: a fingerprint with more than 1 / capacity of a sub-window's
+time is always tracked there; total_ms is within error_ms of the true
+total. count and max_ms are exact since the entry was (re)created.
+
+    heavy_hitters.top(10)              # in-process
+    { topQueries(limit: 10) { normalizedSql totalMs } }   # GraphQL
+"""
+
+import heapq
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, NamedTuple, Optional, Tuple
+
+
+HEAVY_HITTERS_WINDOW_S = 300  # "right now" = the last five minutes
+HEAVY_HITTERS_SUB_WINDOWS = 10  # window slides in steps of WINDOW_S / SUB_WINDOWS
+HEAVY_HITTERS_CAPACITY = 500  # fingerprints tracked per sub-window
+
+TOP_METRICS = ("total_ms", "count", "max_ms", "avg_ms")
+
+
+class _Entry:
+    __slots__ = ("total_ms", "count", "max_ms", "error_ms", "raw_sql")
+
+    def __init__(self, duration_ms: float, error_ms: float, raw_sql: str):
+        self.total_ms = error_ms + duration_ms
+        self.count = 1
+        self.max_ms = duration_ms
+        self.error_ms = error_ms
+        self.raw_sql = raw_sql
+
+
+class SpaceSaving:
+    """Weighted Space-Saving summary over a fixed number of counters."""
+
+    def __init__(self, capacity: int = HEAVY_HITTERS_CAPACITY):
+        self.capacity = capacity
+        self.entries: Dict[str, _Entry] = {}
+        self._heap: List[Tuple[float, str]] = []  # (total_ms when pushed, key)
+
+    def add(self, key: str, duration_ms: float, raw_sql: str) -> None:
+        entry = self.entries.get(key)
+        if entry is not None:
+            entry.total_ms += duration_ms
+            entry.count += 1
+            if duration_ms > entry.max_ms:
+                entry.max_ms = duration_ms
+            return
+
+        error_ms = 0.0
+        if len(self.entries) >= self.capacity:
+            victim, error_ms = self._pop_min()
+            del self.entries[victim]
+
+        self.entries[key] = entry = _Entry(duration_ms, error_ms, raw_sql)
+        heapq.heappush(self._heap, (entry.total_ms, key))
+
+    def min_total(self) -> float:
+        """Smallest tracked total: the error bound for untracked keys."""
+        if len(self.entries) < self.capacity:
+            return 0.0
+        return min(entry.total_ms for entry in self.entries.values())
+
+    def _pop_min(self) -> Tuple[str, float]:
+        while True:
+            pushed_total, key = heapq.heappop(self._heap)
+            entry = self.entries.get(key)
+            if entry is None:
+                continue  # record of an evicted key
+            if entry.total_ms == pushed_total:
+                return key, pushed_total
+            # Stale: the entry grew since it was pushed; re-file it
+            heapq.heappush(self._heap, (entry.total_ms, key))
+
+
+class HeavyHitter(NamedTuple):
+    normalized_sql: str
+    raw_example_sql: str
+    total_ms: float  # Space-Saving estimate; true total within ± error_ms
+    count: int
+    max_ms: float
+    avg_ms: float
+    error_ms: float
+
+
+class HeavyHitterTracker:
+    """Thread-safe sliding-window top-K over Space-Saving sub-windows."""
+
+    def __init__(
+        self,
+        window_s: float = HEAVY_HITTERS_WINDOW_S,
+        sub_windows: int = HEAVY_HITTERS_SUB_WINDOWS,
+        capacity: int = HEAVY_HITTERS_CAPACITY,
+    ):
+        self.sub_window_s = window_s / sub_windows
+        self.sub_windows = sub_windows
+        self.capacity = capacity
+
+        self._windows: Deque[Tuple[int, SpaceSaving]] = deque()
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        normalized_sql: str,
+        raw_sql: str,
+        duration_ms: float,
+        now: Optional[float] = None,
+    ) -> None:
+        """Count one execution: O(1), amortized O(log capacity) when it evicts."""
+        index = int((time.monotonic() if now is None else now) // self.sub_window_s)
+
+        with self._lock:
+            if not self._windows or self._windows[-1][0] != index:
+                self._rotate(index)
+            self._windows[-1][1].add(normalized_sql, duration_ms, raw_sql)
+
+    def top(
+        self, limit: int = 10, by: str = "total_ms", now: Optional[float] = None
+    ) -> List[HeavyHitter]:
+        """
+        The `limit` heaviest fingerprints over the window.
+
+        `by` picks the ordering (total_ms, count, max_ms, avg_ms); the
+        Space-Saving guarantee is on total_ms — the others rank the
+        fingerprints that are tracked.
+        """
+        if by not in TOP_METRICS:
+            raise ValueError(f"Unknown metric {by!r}; expected one of {TOP_METRICS}")
+
+        index = int((time.monotonic() if now is None else now) // self.sub_window_s)
+        oldest = index - self.sub_windows + 1
+
+        merged: Dict[str, list] = {}
+        with self._lock:
+            live = [summary for start, summary in self._windows if start >= oldest]
+            floors = [summary.min_total() for summary in live]
+
+            for position, summary in enumerate(live):
+                for key, entry in summary.entries.items():
+                    stats = merged.get(key)
+                    if stats is None:
+                        # total, count, max, error, raw SQL, sub-windows seen in
+                        stats = [0.0, 0, 0.0, 0.0, entry.raw_sql, set()]
+                        merged[key] = stats
+                    stats[0] += entry.total_ms
+                    stats[1] += entry.count
+                    stats[2] = max(stats[2], entry.max_ms)
+                    stats[3] += entry.error_ms
+                    stats[5].add(position)
+
+        hitters = []
+        for key, (total, count, max_ms, error, raw_sql, seen) in merged.items():
+            # Tracked totals overestimate by at most `error`; sub-windows that
+            # didn't track it may hide up to their smallest total
+            hidden = sum(floor for i, floor in enumerate(floors) if i not in seen)
+            hitters.append(
+                HeavyHitter(
+                    normalized_sql=key,
+                    raw_example_sql=raw_sql,
+                    total_ms=total,
+                    count=count,
+                    max_ms=max_ms,
+                    avg_ms=(total - error) / count,
+                    error_ms=max(error, hidden),
+                )
+            )
+
+        hitters.sort(key=lambda hitter: getattr(hitter, by), reverse=True)
+        return hitters[:limit]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._windows.clear()
+
+    def _rotate(self, index: int) -> None:
+        self._windows.append((index, SpaceSaving(self.capacity)))
+        while self._windows[0][0] <= index - self.sub_windows:
+            self._windows.popleft()
+
+
+# Process-wide tracker fed by the listeners
+heavy_hitters = HeavyHitterTracker()
@@ -4,43 +4,71 @@ measures its execution time, safely records it,
 and never interferes with the real application.
 """
 
+import logging
+import os
 import time
 from contextvars import ContextVar
-from typing import Set
+from datetime import datetime, timezone
 
 from sqlalchemy import event
 from sqlalchemy.engine import Engine
 
-from app.db.session import get_session
-from app.models import Query, QueryExecution
+from app.db.session import (
+    PROFILER_BACKEND,
+    analysis_cancel_engine,
+    analysis_engine,
+    profiler_engine,
+)
+from app.instrumentation.aggregator import get_aggregator
+from app.instrumentation.cardinality import cardinality_governor, execution_source
+from app.instrumentation.classifier import DML, classify_statement
+from app.instrumentation.fingerprint_cache import fingerprint_cache
+from app.instrumentation.heavy_hitters import heavy_hitters
+from app.instrumentation.param_samples import PARAM_CAPTURE, param_samples
 from app.instrumentation.profiler import normalize_sql
+from app.instrumentation.sampling import sampling_policy
+from app.instrumentation.spool import event_spool
+from app.instrumentation.writer import ExecutionEvent, get_writer, persist_events
+
+logger = logging.getLogger(__name__)
 
 
 # -------------------------------------------------------------
-# Reentrancy guard to avoid double instrumentation
+# Capture mode
 # -------------------------------------------------------------
-_in_listener: ContextVar[bool] = ContextVar("_in_listener", default=False)
+# "buffered":  enqueue the event and let the background writer persist it
+# "aggregate": fold it into per-fingerprint rollups (no per-execution rows)
+# "sync":      persist inline on the caller's thread (old behaviour, easier to debug)
+CAPTURE_MODE = os.getenv("PROFILER_CAPTURE_MODE", "buffered")
+
+# Rollups are merged with Postgres upserts into query_stats_rollups, which
+# the local SQLite store doesn't have; its shipper moves raw executions
+if CAPTURE_MODE == "aggregate" and PROFILER_BACKEND != "postgres":
+    logger.warning(
+        "PROFILER_CAPTURE_MODE=aggregate needs the postgres backend; using buffered"
+    )
+    CAPTURE_MODE = "buffered"
+
+
+# The profiler's own engines: never profiled
+_INTERNAL_ENGINES = (profiler_engine, analysis_engine, analysis_cancel_engine)
 
 
 # -------------------------------------------------------------
-# Internal tables that should never be profiled
+# Reentrancy guard to avoid double instrumentation
 # -------------------------------------------------------------
-INTERNAL_TABLES: Set[str] = {
-    "queries",
-    "query_executions",
-    "query_analysis",
-    "recommendations",
-    "alembic_version",
-}
+_in_listener: ContextVar[bool] = ContextVar("_in_listener", default=False)
 
 
 def is_internal_query(sql_stmt: str) -> bool:
     """
     Returns True if the SQL touches profiler-internal tables.
     These queries must be excluded to avoid noise and recursion.
+
+    Classification is cached per distinct statement text, so this is a
+    dict lookup after the first execution of a statement.
     """
-    lowered = sql_stmt.lower()  # Normalize for case-insensitive matching
-    return any(table in lowered for table in INTERNAL_TABLES)
+    return classify_statement(sql_stmt).is_internal
 
 
 # ---------------------------------------------------------------------
@@ -59,6 +87,10 @@ def before_cursor_execute(
     if _in_listener.get():
         return
 
+    # The profiler's own write and analysis pools are never profiled
+    if conn.engine in _INTERNAL_ENGINES:
+        return
+
     # Attach start time to context for later use
     context._query_start_time = time.perf_counter()
 
@@ -75,11 +107,66 @@ def after_cursor_execute(
     context,
     executemany,
 ):
-    # Skip if:
-    # 1. We're already inside profiler logic
-    # 2. This is an internal profiler query
-    if _in_listener.get() or is_internal_query(statement):
-        return
+    rowcount = cursor.rowcount if cursor.rowcount != -1 else None
+    _capture(
+        statement,
+        context,
+        rowcount=rowcount,
+        batch_size=_batch_size(parameters, executemany, rowcount),
+        parameters=None if executemany else parameters,
+    )
+
+
+def _batch_size(parameters, executemany, rowcount) -> int:
+    """
+    Number of parameter sets sent in one call.
+
+    A classic executemany() passes a list of parameter sets. SQLAlchemy's
+    "insertmanyvalues" mode also reports executemany=True but sends one
+    multi-row INSERT with flat parameters; there, the inserted row count
+    is the batch size.
+    """
+    if not executemany:
+        return 1
+    if isinstance(parameters, (list, tuple)) and parameters:
+        if isinstance(parameters[0], (dict, list, tuple)):
+            return len(parameters)
+    return max(rowcount or 1, 1)
+
+
+# ---------------------------------------------------------------------
+# FAILED execution — always recorded, whatever the sampling rate
+# ---------------------------------------------------------------------
+@event.listens_for(Engine, "handle_error")
+def handle_error(exception_context):
+    statement = exception_context.statement
+    if statement is None:
+        return  # connection-level error, not a statement execution
+    if exception_context.engine in _INTERNAL_ENGINES:
+        return  # the profiler's own pools
+
+    context = exception_context.execution_context
+    _capture(
+        statement,
+        context,
+        error=str(exception_context.original_exception),
+        batch_size=_batch_size(
+            exception_context.parameters,
+            getattr(context, "executemany", False),
+            None,
+        ),
+    )
+
+
+def _capture(
+    statement, context, rowcount=None, error=None, batch_size=1, parameters=None
+):
+    if _in_listener.get():
+        return  # We're already inside profiler logic
+
+    statement_info = classify_statement(statement)
+    if statement_info.is_internal:
+        return  # This is an internal profiler query
 
     # Mark that we're inside the listener to avoid recursion
     token = _in_listener.set(True)  # Enter listener context
@@ -94,41 +181,61 @@ def after_cursor_execute(
 
         normalized_sql = normalize_sql(statement)
 
-        session = get_session()
-
-        try:
-            # Fetch or create query fingerprint
-            query = (
-                session.query(Query)
-                .filter(Query.normalized_sql == normalized_sql)
-                .one_or_none()
+        # Past its source's new-fingerprint budget, a new fingerprint is
+        # recorded under its shape's overflow fingerprint instead
+        if normalized_sql not in fingerprint_cache:
+            normalized_sql = cardinality_governor.admit(
+                normalized_sql, execution_source(context), statement_info
             )
 
-            if query is None:
-                query = Query(
-                    normalized_sql=normalized_sql,
-                    raw_example_sql=statement,
-                    total_executions=0,
-                )
-                session.add(query)
-                session.flush()  # populate query.id
-
-            # Update execution count
-            query.total_executions += 1
-
-            execution = QueryExecution(
-                query_id=query.id,
-                duration_ms=duration_ms,
-                rows_returned=(cursor.rowcount if cursor.rowcount != -1 else None),
-            )
-
-            session.add(execution)
-            session.commit()
-
-        except Exception:
-            session.rollback()
+        # Live top-K sees every execution, sampled or not (no I/O)
+        heavy_hitters.record(normalized_sql, statement, duration_ms)
+
+        # Opt-in: bind values of the slowest executions, for EXPLAIN
+        if PARAM_CAPTURE and parameters:
+            param_samples.offer(normalized_sql, statement, parameters, duration_ms)
+
+        # Sampled-out executions are only counted, never queued
+        sample_weight = sampling_policy.decide(
+            normalized_sql,
+            statement,
+            duration_ms,
+            failed=error is not None,
+            kind=statement_info.kind,
+        )
+        if sample_weight is None:
+            return
+
+        # cursor.rowcount means "rows changed" for DML, "rows fetched" otherwise
+        is_dml = statement_info.kind == DML
+
+        execution_event = ExecutionEvent(
+            normalized_sql=normalized_sql,
+            raw_sql=statement,
+            executed_at=datetime.now(timezone.utc),
+            duration_ms=duration_ms,
+            rows_returned=None if is_dml else rowcount,
+            error=error,
+            sample_weight=sample_weight,
+            rows_affected=rowcount if is_dml else None,
+            batch_size=batch_size,
+        )
+
+        # Batches are their own class: keep them out of per-fingerprint
+        # rollups and record them as raw executions instead
+        if CAPTURE_MODE == "aggregate" and batch_size == 1:
+            get_aggregator().record(execution_event)
+        elif CAPTURE_MODE == "sync":
+            try:
+                persist_events([execution_event])
+            except Exception:
+                # never interfere with the real application; keep the event on disk
+                try:
+                    event_spool.append([execution_event])
+                except OSError:
+                    pass
+        else:
+            get_writer().submit(execution_event)
 
-        finally:
-            session.close()
     finally:
         _in_listener.reset(token)  # Exit listener context
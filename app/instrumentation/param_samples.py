@@ -0,0 +1,244 @@
+"""
+Bind-parameter samples of the slowest executions (opt-in).
+
+queries.raw_example_sql is whichever variant of a fingerprint came first,
+and for parameterized statements it holds placeholders, not values — so
+EXPLAIN either can't run it or analyzes a case nobody complained about.
+With PROFILER_CAPTURE_PARAMS=1 the capture listener offers each
+execution's parameters to a per-fingerprint reservoir:
+
+- only the PARAM_SAMPLES_PER_FINGERPRINT slowest executions since the
+  last flush are kept (a min-heap by duration); anything not slower than
+  the fastest kept one is rejected before its parameters are even copied
+- kept parameters are converted to JSON and passed through the redaction
+  hooks: by default values of parameters named like credentials or
+  personal data become REDACTED, and samples with redacted values are
+  stored but never executed (add_redactor() adds site-specific rules)
+- the writer stores the reservoir every PARAM_SAMPLE_FLUSH_INTERVAL_S
+  (query_param_samples); param_sample_services trims the table to the
+  slowest few per query of the last PARAM_SAMPLE_MAX_AGE
+
+The EXPLAIN runner then analyzes each query with its slowest usable
+sample (app/analysis/explain.py).
+
+Only the Postgres capture backend supports samples: the local SQLite
+store has no table for them.
+"""
+
+import heapq
+import itertools
+import json
+import logging
+import os
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from app.analysis.slow_query import SLOW_QUERY_MS
+from app.db.session import PROFILER_BACKEND
+
+logger = logging.getLogger(__name__)
+
+
+PARAM_CAPTURE = os.getenv("PROFILER_CAPTURE_PARAMS", "0") == "1"
+PARAM_SAMPLES_PER_FINGERPRINT = 5  # slowest kept per flush, and per query in the table
+PARAM_SAMPLE_MIN_MS = SLOW_QUERY_MS  # faster executions are never sampled
+PARAM_SAMPLE_MAX_FINGERPRINTS = 10_000  # fingerprints sampled between flushes
+PARAM_SAMPLE_MAX_BYTES = 8_192  # larger parameter sets (JSON) are not kept
+PARAM_SAMPLE_FLUSH_INTERVAL_S = 60.0  # how often the writer stores samples
+PARAM_SAMPLE_MAX_AGE = timedelta(days=7)  # older samples are not explained
+
+REDACTED = "<redacted>"
+
+# Named parameters whose values are redacted by default. SQLAlchemy names
+# parameters after their columns (email, email_1, password_hash, ...)
+REDACT_PARAM_NAMES = re.compile(
+    r"pass(word)?|secret|token|api_?key|auth|email|phone|ssn|card|iban|address",
+    re.IGNORECASE,
+)
+
+if PARAM_CAPTURE and PROFILER_BACKEND != "postgres":
+    logger.warning(
+        "PROFILER_CAPTURE_PARAMS ignored: parameter samples need the postgres backend"
+    )
+    PARAM_CAPTURE = False
+
+
+# A redactor gets (statement, parameters) — parameters already JSON-safe —
+# and returns them with sensitive values replaced by REDACTED, or None to
+# drop the sample altogether
+Redactor = Callable[[str, object], Optional[object]]
+
+
+class ParamSample(NamedTuple):
+    normalized_sql: str
+    statement: str  # as sent to the driver, with placeholders
+    parameters: object  # dict (named placeholders) or list (positional)
+    duration_ms: float
+    captured_at: datetime
+    redacted: bool
+
+
+def redact_sensitive_names(statement: str, parameters):
+    """Default redactor: REDACTED for named parameters like REDACT_PARAM_NAMES."""
+    if not isinstance(parameters, dict):
+        return parameters  # positional: no names to go by
+    return {
+        name: REDACTED if REDACT_PARAM_NAMES.search(name) else value
+        for name, value in parameters.items()
+    }
+
+
+def to_json_value(value):
+    """
+    A JSON-safe copy of a bind value that Postgres reads back the same way.
+
+    Dates, decimals, UUIDs, ... become their text form (valid input for
+    their types); bytes become bytea hex input.
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [to_json_value(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): to_json_value(item) for key, item in value.items()}
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return "\\x" + bytes(value).hex()
+    return str(value)
+
+
+class ParamSampleReservoir:
+    """Thread-safe per-fingerprint reservoir of the slowest executions."""
+
+    def __init__(
+        self,
+        per_fingerprint: int = PARAM_SAMPLES_PER_FINGERPRINT,
+        min_ms: float = PARAM_SAMPLE_MIN_MS,
+        max_fingerprints: int = PARAM_SAMPLE_MAX_FINGERPRINTS,
+        flush_interval_s: float = PARAM_SAMPLE_FLUSH_INTERVAL_S,
+    ):
+        self.per_fingerprint = per_fingerprint
+        self.min_ms = min_ms
+        self.max_fingerprints = max_fingerprints
+        self.flush_interval_s = flush_interval_s
+
+        # normalized_sql → min-heap of (duration_ms, tie-breaker, sample)
+        self._heaps: Dict[str, List[Tuple[float, int, ParamSample]]] = {}
+        self._redactors: List[Redactor] = [redact_sensitive_names]
+        self._order = itertools.count()
+        self._last_drain = time.monotonic()
+        self._lock = threading.Lock()
+
+    def add_redactor(self, redactor: Redactor) -> None:
+        """Run `redactor` on every sample kept from now on (after the others)."""
+        self._redactors.append(redactor)
+
+    def offer(
+        self, normalized_sql: str, statement: str, parameters, duration_ms: float
+    ) -> bool:
+        """
+        Keep this execution's parameters if it is among the slowest.
+
+        Returns:
+            bool: True if the sample was kept.
+        """
+        if duration_ms < self.min_ms:
+            return False
+        if not self._could_keep(normalized_sql, duration_ms):
+            return False
+
+        sample = self._build(normalized_sql, statement, parameters, duration_ms)
+        if sample is None:
+            return False
+
+        with self._lock:
+            return self._keep(sample)
+
+    def drain(self, force: bool = False) -> List[ParamSample]:
+        """
+        Hand over the kept samples (the caller now owns them) — at most
+        once per flush_interval_s unless `force`.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last_drain < self.flush_interval_s:
+                return []
+            heaps, self._heaps = self._heaps, {}
+            self._last_drain = now
+        return [sample for heap in heaps.values() for _, _, sample in heap]
+
+    def restore(self, samples: List[ParamSample]) -> None:
+        """Take back samples that could not be written."""
+        with self._lock:
+            for sample in samples:
+                self._keep(sample)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._heaps.clear()
+
+    # -----------------------------------------------------------------
+    # Internals
+    # -----------------------------------------------------------------
+    def _could_keep(self, normalized_sql: str, duration_ms: float) -> bool:
+        # Unlocked read: a stale answer only costs one wasted copy (or one
+        # missed sample) — the locked _keep() decides
+        heap = self._heaps.get(normalized_sql)
+        if heap is None:
+            return len(self._heaps) < self.max_fingerprints
+        return len(heap) < self.per_fingerprint or duration_ms > heap[0][0]
+
+    def _build(
+        self, normalized_sql: str, statement: str, parameters, duration_ms: float
+    ) -> Optional[ParamSample]:
+        try:
+            values = to_json_value(parameters)
+            for redactor in self._redactors:
+                values = redactor(statement, values)
+                if values is None:
+                    return None
+            if len(json.dumps(values)) > PARAM_SAMPLE_MAX_BYTES:
+                return None
+        except Exception:
+            logger.exception("Could not sample parameters of %s", normalized_sql[:200])
+            return None
+
+        return ParamSample(
+            normalized_sql=normalized_sql,
+            statement=statement,
+            parameters=values,
+            duration_ms=duration_ms,
+            captured_at=datetime.now(timezone.utc),
+            redacted=_contains_redacted(values),
+        )
+
+    def _keep(self, sample: ParamSample) -> bool:
+        # Called with the lock held
+        heap = self._heaps.get(sample.normalized_sql)
+        if heap is None:
+            if len(self._heaps) >= self.max_fingerprints:
+                return False
+            heap = self._heaps[sample.normalized_sql] = []
+
+        entry = (sample.duration_ms, next(self._order), sample)
+        if len(heap) < self.per_fingerprint:
+            heapq.heappush(heap, entry)
+        elif sample.duration_ms > heap[0][0]:
+            heapq.heapreplace(heap, entry)
+        else:
+            return False
+        return True
+
+
+def _contains_redacted(values) -> bool:
+    if isinstance(values, dict):
+        values = values.values()
+    elif not isinstance(values, list):
+        return values == REDACTED
+    return any(_contains_redacted(value) for value in values)
+
+
+# Process-wide reservoir fed by the listeners
+param_samples = ParamSampleReservoir()
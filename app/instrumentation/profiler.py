@@ -1,12 +1,480 @@
+"""
+SQL fingerprinting.
+
+normalize_sql() turns a raw statement into its query *pattern* so that
+executions differing only in literal values share one `queries` row.
+
+It is built on a single-pass, character-dispatch tokenizer (no regex
+substitution over the whole statement):
+- every literal (strings, numbers, dollar-quoted bodies, E'' / B'' / X'')
+  and every bind parameter (%s, %(name)s, $1, :name, ?) becomes `?`
+- variable-length IN (...) / ARRAY[...] lists collapse to `(...)` / `[...]`
+- repeated VALUES rows of the same shape collapse to a single row
+- comments are dropped and whitespace / keyword case are canonicalized
+
+Results are memoized by raw statement text, so steady-state capture of an
+ORM workload (a small, stable set of statement strings) is a dict lookup.
+
+Statements with inlined literals rarely repeat verbatim, so a raw-text
+cache alone would tokenize nearly every one of them. Before tokenizing,
+two C-level substitutions therefore rewrite every string literal to '',
+every number to 0 and drop comments (literal_shape). Statements that
+differ only in literal values or comments share that shape, and the
+tokenizer runs once per shape. Texts a plain substitution could misread
+(see the _SHAPE_* patterns, and non-ASCII) are tokenized as they are.
+"""
+
+import hashlib
 import re
+import string
+from functools import lru_cache
+from typing import List, Tuple
+
+
+NORMALIZE_CACHE_SIZE = 20_000  # distinct raw statements memoized
+
+PLACEHOLDER = "?"
+COLLAPSED_LIST = "..."
+
+
+# -------------------------------------------------------------
+# Token kinds
+# -------------------------------------------------------------
+WORD = "word"  # keyword or unquoted identifier
+QUOTED_IDENT = "quoted_ident"  # "Some Column"
+STRING = "string"  # 'x', E'x', $$x$$, B'0101', X'ff'
+NUMBER = "number"  # 42, 3.14, .5e-3
+PARAM = "param"  # %s, %(name)s, $1, :name, ?
+OP = "op"  # =, <>, ::, ||, ...
+PUNCT = "punct"  # ( ) [ ] , ; .
+
+Token = Tuple[str, str]
+
+
+# Run matchers used by the scanner once it has decided what a token is.
+_WHITESPACE = re.compile(r"\s+")
+_WORD = re.compile(r"[A-Za-z_\x80-\uffff][A-Za-z0-9_$\x80-\uffff]*")
+_NUMBER = re.compile(r"(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?")
+_DOLLAR_TAG = re.compile(r"\$(?:[A-Za-z_][A-Za-z0-9_]*)?\$")
+_DOLLAR_PARAM = re.compile(r"\$\d+")
+_PYFORMAT_PARAM = re.compile(r"%(?:\([^)]*\))?s")
+_NAMED_PARAM = re.compile(r":[A-Za-z_][A-Za-z0-9_]*")
+
+_OP_CHARS = frozenset("+-*/<>=~!@#%^&|`")
+_PUNCT_CHARS = frozenset("()[],;.")
+_SPACE_CHARS = frozenset(" \t\n\r\f\v")
+_STRING_PREFIXES = frozenset("eEbBxXnN")
+
+# Character classes for the scanner's dispatch (one dict lookup per token)
+(
+    _C_WORD,
+    _C_SPACE,
+    _C_PUNCT,
+    _C_DIGIT,
+    _C_OP,
+    _C_PERCENT,
+    _C_QUOTE,
+    _C_DQUOTE,
+    _C_DOLLAR,
+    _C_COLON,
+    _C_OTHER,
+) = range(11)
+
+_CHAR_CLASS = {
+    **{c: _C_WORD for c in string.ascii_letters + "_"},
+    **{c: _C_SPACE for c in _SPACE_CHARS},
+    **{c: _C_PUNCT for c in _PUNCT_CHARS},
+    **{c: _C_DIGIT for c in string.digits},
+    **{c: _C_OP for c in _OP_CHARS},
+    "%": _C_PERCENT,
+    "'": _C_QUOTE,
+    '"': _C_DQUOTE,
+    "$": _C_DOLLAR,
+    ":": _C_COLON,
+}
+
+
+# Upper-cased in the fingerprint; every other unquoted word is lower-cased
+# (Postgres folds unquoted identifiers to lower case anyway).
+KEYWORDS = frozenset(
+    """
+    ALL AND ANY ARRAY AS ASC BEGIN BETWEEN BY CASE CAST COMMIT CONFLICT
+    CREATE CROSS CURRENT_DATE CURRENT_TIMESTAMP DEFAULT DELETE DESC DISTINCT
+    DO DROP ELSE END EXCEPT EXISTS EXPLAIN FALSE FETCH FIRST FOR FROM FULL
+    GROUP HAVING ILIKE IN INNER INSERT INTERSECT INTO IS JOIN LATERAL LEFT
+    LIKE LIMIT LOCK NATURAL NEXT NOT NOTHING NOWAIT NULL NULLS OFFSET ON ONLY
+    OR ORDER OUTER OVER PARTITION RECURSIVE RELEASE RETURNING RIGHT ROLLBACK
+    ROW ROWS SAVEPOINT SELECT SET SHARE SKIP SOME TABLE THEN TO TRUE
+    TRUNCATE UNION UPDATE USING VALUES WHEN WHERE WINDOW WITH
+    """.split()
+)
+
+# Keywords after which a sign is unary (`WHERE x > -1`, `LIMIT -1`, ...)
+_UNARY_CONTEXT = frozenset(
+    """
+    AND BETWEEN BY ELSE IN IS LIMIT NOT OFFSET ON OR RETURNING SELECT SET
+    THEN VALUES WHEN WHERE
+    """.split()
+)
+
+# Keywords that keep a space before "(" — everything else is a call: f(x)
+_SPACED_BEFORE_PAREN = frozenset(
+    """
+    AND AS EXISTS FROM IN INTO JOIN NOT ON OR OVER SELECT USING VALUES
+    WHERE WITH
+    """.split()
+)
+
+# Literal shape (see module docstring). The first pass replaces strings
+# with '' and drops comments (group 1 is the quote, empty for a comment);
+# the second replaces numbers, segmented like the tokenizer: ".5" always
+# starts one, a digit only outside a word. Replacements are padded with
+# spaces so they stay tokens of their own (x.5, 1.5.6). Texts with quoted
+# identifiers, dollar quotes, backslash escapes, odd %(name)s parameters,
+# nested block comments or unterminated strings are not shaped: the
+# tokenizer reads those differently
+_SHAPE_UNSAFE_PARAM = re.compile(r"%\([^)]*[-/'\d]|%(?:\([^)]*\))?s\d")
+_SHAPE_NESTED_COMMENT = re.compile(r"/\*(?:[^*]|\*(?!/))*?/\*")
+_SHAPE_STRING = re.compile(r"'[^']*(?:''[^']*)*'(?!')")
+_SHAPE_STRING_OR_COMMENT = re.compile(
+    r"(')[^']*(?:''[^']*)*'(?!')|--[^\n]*|/\*(?:[^*/]|\*(?!/)|/(?!\*))*\*/"
+)
+_SHAPE_NUMBER = re.compile(
+    r"[.\d](?:(?<=\.)\d+|(?<=\d)(?<![A-Za-z0-9_$]\d)\d*(?:\.\d*)?)(?:[eE][+-]?\d+)?"
+)
+
+_NO_SPACE_BEFORE = frozenset({",", ")", "]", ".", "::", ";", "["})
+_NO_SPACE_AFTER = frozenset({"(", "[", ".", "::"})
+
+
+# ---------------------------------------------------------------------
+# Tokenizer
+# ---------------------------------------------------------------------
+def tokenize(sql: str) -> List[Token]:
+    """
+    Split a SQL statement into (kind, text) tokens in a single pass.
+
+    Comments and whitespace are skipped. Unterminated strings or comments
+    simply run to the end of the statement.
+    """
+    tokens: List[Token] = []
+    append = tokens.append
+    char_class = _CHAR_CLASS.get
+    i = 0
+    n = len(sql)
+
+    while i < n:
+        c = sql[i]
+        cls = char_class(c, _C_WORD if c > "\x7f" else _C_OTHER)
+
+        # Keywords / identifiers / prefixed strings (E'..', B'..', X'..')
+        if cls == _C_WORD:
+            j = _WORD.match(sql, i).end()
+            if j < n and sql[j] == "'" and j - i == 1 and c in _STRING_PREFIXES:
+                k = _skip_quoted(sql, j, "'", backslash=c in "eE")
+                append((STRING, sql[i:k]))
+                i = k
+            else:
+                append((WORD, sql[i:j]))
+                i = j
+
+        elif cls == _C_SPACE:
+            i += 1
+            if i < n and sql[i] in _SPACE_CHARS:
+                i = _WHITESPACE.match(sql, i).end()
+
+        elif cls == _C_PUNCT:
+            # ".5" is a number, not a qualifier dot
+            if c == "." and i + 1 < n and sql[i + 1].isdigit():
+                j = _NUMBER.match(sql, i).end()
+                append((NUMBER, sql[i:j]))
+                i = j
+            else:
+                append((PUNCT, c))
+                i += 1
+
+        elif cls == _C_DIGIT:
+            j = _NUMBER.match(sql, i).end()
+            append((NUMBER, sql[i:j]))
+            i = j
+
+        # %s / %(name)s parameters (psycopg2 paramstyle)
+        elif cls == _C_PERCENT and (m := _PYFORMAT_PARAM.match(sql, i)):
+            append((PARAM, m.group()))
+            i = m.end()
+
+        # -- line comment
+        elif c == "-" and sql.startswith("--", i):
+            j = sql.find("\n", i)
+            i = n if j == -1 else j + 1
+
+        # /* block comment */ (Postgres allows nesting)
+        elif c == "/" and sql.startswith("/*", i):
+            i = _skip_block_comment(sql, i)
+
+        # Operators: a run of operator characters
+        elif cls == _C_OP or cls == _C_PERCENT:
+            j = i + 1
+            while (
+                j < n
+                and sql[j] in _OP_CHARS
+                and not sql.startswith(("--", "/*"), j)
+                and not (sql[j] == "%" and _PYFORMAT_PARAM.match(sql, j))
+            ):
+                j += 1
+            append((OP, sql[i:j]))
+            i = j
+
+        # 'string'
+        elif cls == _C_QUOTE:
+            j = _skip_quoted(sql, i, "'")
+            append((STRING, sql[i:j]))
+            i = j
+
+        # "quoted identifier"
+        elif cls == _C_DQUOTE:
+            j = _skip_quoted(sql, i, '"')
+            append((QUOTED_IDENT, sql[i:j]))
+            i = j
+
+        # $1 parameters and $tag$ ... $tag$ strings
+        elif cls == _C_DOLLAR:
+            i = _scan_dollar(sql, i, append)
+
+        # :name parameters and :: casts
+        elif cls == _C_COLON:
+            if sql.startswith("::", i):
+                append((OP, "::"))
+                i += 2
+            elif m := _NAMED_PARAM.match(sql, i):
+                append((PARAM, m.group()))
+                i = m.end()
+            else:
+                append((OP, ":"))
+                i += 1
+
+        elif c == "?":
+            append((PARAM, c))
+            i += 1
 
+        elif cls == _C_OTHER and c.isspace():  # exotic unicode whitespace
+            i += 1
 
-LITERAL_REGEX = re.compile(r"=\s*('[^']*'|\d+)")
+        else:
+            append((OP, c))
+            i += 1
 
+    return tokens
 
+
+def _skip_quoted(sql: str, start: int, quote: str, backslash: bool = False) -> int:
+    """Return the index just past a quoted run; doubled quotes are escapes."""
+    n = len(sql)
+    i = start + 1
+
+    if backslash:  # E'...' strings: \' is an escaped quote as well
+        while i < n:
+            c = sql[i]
+            if c == "\\":
+                i += 2
+            elif c == quote:
+                if i + 1 < n and sql[i + 1] == quote:
+                    i += 2
+                else:
+                    return i + 1
+            else:
+                i += 1
+        return n
+
+    while True:
+        j = sql.find(quote, i)
+        if j == -1:
+            return n
+        if j + 1 < n and sql[j + 1] == quote:
+            i = j + 2
+            continue
+        return j + 1
+
+
+def _skip_block_comment(sql: str, start: int) -> int:
+    depth = 1
+    i = start + 2
+    n = len(sql)
+    while depth:
+        close = sql.find("*/", i)
+        if close == -1:
+            return n
+        nested = sql.find("/*", i, close)
+        if nested != -1:
+            depth += 1
+            i = nested + 2
+        else:
+            depth -= 1
+            i = close + 2
+    return i
+
+
+def _scan_dollar(sql: str, i: int, append) -> int:
+    m = _DOLLAR_PARAM.match(sql, i)
+    if m:
+        append((PARAM, m.group()))
+        return m.end()
+
+    m = _DOLLAR_TAG.match(sql, i)
+    if m:
+        tag = m.group()
+        end = sql.find(tag, m.end())
+        end = len(sql) if end == -1 else end + len(tag)
+        append((STRING, sql[i:end]))
+        return end
+
+    append((OP, "$"))
+    return i + 1
+
+
+# ---------------------------------------------------------------------
+# Normalizer
+# ---------------------------------------------------------------------
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
 def normalize_sql(sql: str) -> str:
     """
     Replace literal values with placeholders so similar queries
     map to the same normalized form.
+
+    Args:
+        sql (str): Raw SQL statement as sent to the driver.
+    Returns:
+        str: Canonical fingerprint text, e.g. `SELECT * FROM users WHERE id = ?`.
+    """
+    return _normalize_shape(literal_shape(sql))
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def _normalize_shape(shape: str) -> str:
+    return _render(_canonical_tokens(tokenize(shape)))
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def literal_shape(sql: str) -> str:
+    """
+    `sql` with literal values canonicalized and comments dropped.
+
+    It tokenizes like `sql` except for literal text, so it normalizes and
+    classifies the same; `sql` itself where that can't be guaranteed.
+    """
+    if not sql.isascii() or '"' in sql or "$" in sql or "\\" in sql:
+        return sql
+    if "%" in sql and _SHAPE_UNSAFE_PARAM.search(sql):
+        return sql
+
+    if "--" in sql or "/*" in sql:
+        if _SHAPE_NESTED_COMMENT.search(sql):
+            return sql
+        shape = _SHAPE_STRING_OR_COMMENT.sub(r"\1\1 ", sql)
+    elif "'" in sql:
+        shape = _SHAPE_STRING.sub("'' ", sql)
+    else:
+        shape = sql
+
+    if "'" in shape and "'" in shape.replace("'' ", ""):
+        return sql
+    return _SHAPE_NUMBER.sub(" 0 ", shape)
+
+
+def _canonical_tokens(tokens: List[Token]) -> List[str]:
+    """Map tokens to fingerprint text, collapsing literal lists on the fly."""
+    out: List[str] = []
+    open_groups: List[int] = []  # indexes in `out` of unclosed ( / [
+    values_row = None  # first row after VALUES, as a tuple of tokens
+    values_end = -1  # len(out) right after the last VALUES row
+
+    for kind, text in tokens:
+        if kind in (STRING, NUMBER, PARAM):
+            # Fold unary sign into the literal: `> -1` → `> ?`
+            if kind == NUMBER and out and out[-1] in ("-", "+") and _is_unary(out):
+                out.pop()
+            out.append(PLACEHOLDER)
+
+        elif kind == WORD:
+            upper = text.upper()
+            out.append(upper if upper in KEYWORDS else text.lower())
+
+        elif text in ("(", "["):
+            open_groups.append(len(out))
+            out.append(text)
+
+        elif text in (")", "]") and open_groups:
+            start = open_groups.pop()
+            out.append(text)
+            group = out[start + 1 : -1]
+            before = out[start - 1] if start > 0 else None
+
+            # IN (?, ?, ?) / ARRAY[?, ?] → IN (...) / ARRAY[...]
+            if before in ("IN", "ARRAY") and group and _only_placeholders(group):
+                out[start + 1 : -1] = [COLLAPSED_LIST]
+
+            # VALUES (?, ?), (?, ?), ... → VALUES (?, ?)
+            elif before == "VALUES" and text == ")":
+                values_row = tuple(out[start:])
+                values_end = len(out)
+            elif (
+                before == ","
+                and start - 1 == values_end
+                and tuple(out[start:]) == values_row
+            ):
+                del out[start - 1 :]
+
+        else:
+            out.append(text)
+
+    return out
+
+
+def _is_unary(out: List[str]) -> bool:
+    if len(out) == 1:
+        return True
+    prev = out[-2]
+    return prev in ("(", "[", ",", "=") or prev in _UNARY_CONTEXT or (
+        prev[0] in _OP_CHARS
+    )
+
+
+def _only_placeholders(group: List[str]) -> bool:
+    return all(tok == PLACEHOLDER or tok == "," for tok in group)
+
+
+def _render(out: List[str]) -> str:
+    parts: List[str] = []
+    prev = None
+    for tok in out:
+        if prev is not None and not (
+            tok in _NO_SPACE_BEFORE
+            or prev in _NO_SPACE_AFTER
+            or (tok == "(" and _is_call(prev))
+        ):
+            parts.append(" ")
+        parts.append(tok)
+        prev = tok
+    return "".join(parts)
+
+
+def _is_call(prev: str) -> bool:
+    """True when "(" after `prev` opens a call / column list: count(*), users(id)."""
+    if prev in KEYWORDS:
+        return prev not in _SPACED_BEFORE_PAREN
+    return prev[0].isalpha() or prev[0] in '_"'
+
+
+# ---------------------------------------------------------------------
+# Fixed-width fingerprint hash
+# ---------------------------------------------------------------------
+def fingerprint_hash(normalized_sql: str) -> int:
+    """
+    64-bit signed hash of a normalized statement (stored in queries.fingerprint_hash).
+
+    Defined as the first 8 bytes of md5(normalized_sql), which Postgres can
+    compute too:  ('x' || substr(md5(normalized_sql), 1, 16))::bit(64)::bigint
+    so backfills and ad-hoc lookups can be done in plain SQL.
     """
-    return LITERAL_REGEX.sub("= ?", sql)
+    digest = hashlib.md5(normalized_sql.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big", signed=True)
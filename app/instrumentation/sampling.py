@@ -0,0 +1,144 @@
+"""
+Sampling policy for the capture listeners.
+
+Recording 100% of statements on a hot service means one profiler row per
+application query. This policy decides, per execution, whether to record
+it — without losing the ability to compute correct totals and averages:
+
+- a global rate, optional per-statement-kind rates (select / dml / ddl /
+  utility, see classifier) and per-fingerprint rates, most specific wins
+- statements slower than ALWAYS_CAPTURE_MS (unless it is 0), and
+  failures, are always kept
+- fingerprints seen more than DECAY_AFTER times get a decaying rate
+- every kept execution carries sample_weight = 1 / rate (Horvitz-Thompson),
+  so SUM(duration * weight) / SUM(weight) is an unbiased average
+- skipped executions are still counted and folded into total_executions
+
+The global rate, the per-kind rates and the always-capture threshold come
+from the environment:
+
+    PROFILER_SAMPLE_RATE=0.1            # record 10% of executions
+    PROFILER_SAMPLE_RATE_SELECT=0.01    # ... but 1% of SELECTs
+    PROFILER_ALWAYS_CAPTURE_MS=500      # 0 disables the rule
+"""
+
+import os
+import random
+import threading
+from typing import Dict, Optional, Tuple
+
+from app.instrumentation.classifier import DDL, DML, SELECT, UTILITY
+
+DEFAULT_SAMPLE_RATE = float(os.getenv("PROFILER_SAMPLE_RATE", "1.0"))  # 1.0 = everything
+KIND_SAMPLE_RATES: Dict[str, float] = {  # statement kind → rate override
+    kind: float(os.environ[f"PROFILER_SAMPLE_RATE_{kind.upper()}"])
+    for kind in (SELECT, DML, DDL, UTILITY)
+    if os.getenv(f"PROFILER_SAMPLE_RATE_{kind.upper()}")
+}
+FINGERPRINT_SAMPLE_RATES: Dict[str, float] = {}  # normalized_sql → rate override
+# Slower than this is always recorded; 0 disables the rule. Not SLOW_QUERY_MS:
+# that is 0 (every query is a candidate), which would record everything
+ALWAYS_CAPTURE_MS = float(os.getenv("PROFILER_ALWAYS_CAPTURE_MS", "500"))
+DECAY_AFTER = 1_000_000  # executions of one fingerprint before its rate decays
+MIN_SAMPLE_RATE = 0.001  # decay never goes below 1 in 1000
+
+
+class SamplingPolicy:
+    """Thread-safe per-execution sampling decisions with skip accounting."""
+
+    def __init__(
+        self,
+        rate: float = DEFAULT_SAMPLE_RATE,
+        fingerprint_rates: Optional[Dict[str, float]] = None,
+        kind_rates: Optional[Dict[str, float]] = None,
+        always_capture_ms: float = ALWAYS_CAPTURE_MS,
+        decay_after: int = DECAY_AFTER,
+        min_rate: float = MIN_SAMPLE_RATE,
+    ):
+        self.rate = rate
+        self.always_capture_ms = always_capture_ms
+        self.decay_after = decay_after
+        self.min_rate = min_rate
+
+        self._fingerprint_rates = dict(fingerprint_rates or {})
+        self._kind_rates = dict(kind_rates or {})
+        self._seen: Dict[str, int] = {}  # approximate, lock-free
+        self._unsampled: Dict[str, Tuple[int, str]] = {}  # exact, under lock
+        self._lock = threading.Lock()
+
+    def set_rate(self, normalized_sql: str, rate: Optional[float]) -> None:
+        """Override (or with None, clear) the rate for one fingerprint."""
+        if rate is None:
+            self._fingerprint_rates.pop(normalized_sql, None)
+        else:
+            self._fingerprint_rates[normalized_sql] = rate
+
+    def rate_for(
+        self, normalized_sql: str, seen: int = 0, kind: Optional[str] = None
+    ) -> float:
+        """Effective sampling rate for a fingerprint seen `seen` times."""
+        rate = self._fingerprint_rates.get(
+            normalized_sql, self._kind_rates.get(kind, self.rate)
+        )
+
+        if seen > self.decay_after:
+            rate = min(rate, self.decay_after / seen)
+
+        return max(rate, self.min_rate)
+
+    def decide(
+        self,
+        normalized_sql: str,
+        raw_sql: str,
+        duration_ms: float,
+        failed: bool = False,
+        kind: Optional[str] = None,
+    ) -> Optional[float]:
+        """
+        Decide whether to record one execution.
+
+        Returns:
+            Optional[float]: The sample weight if the execution should be
+            recorded, or None if it was sampled out (and counted as skipped).
+        """
+        seen = self._seen.get(normalized_sql, 0) + 1
+        self._seen[normalized_sql] = seen
+
+        if failed:
+            return 1.0
+        if self.always_capture_ms > 0 and duration_ms > self.always_capture_ms:
+            return 1.0
+
+        rate = self.rate_for(normalized_sql, seen, kind)
+        if rate >= 1.0 or random.random() < rate:
+            return 1.0 / rate if rate < 1.0 else 1.0
+
+        with self._lock:
+            count, example = self._unsampled.get(normalized_sql, (0, raw_sql))
+            self._unsampled[normalized_sql] = (count + 1, example)
+
+        return None
+
+    def drain_unsampled(self) -> Dict[str, Tuple[int, str]]:
+        """
+        Hand over skipped-execution counts accumulated since the last drain.
+
+        Returns:
+            Dict[str, Tuple[int, str]]: normalized_sql → (count, raw example SQL)
+        """
+        with self._lock:
+            unsampled, self._unsampled = self._unsampled, {}
+        return unsampled
+
+    def restore_unsampled(self, unsampled: Dict[str, Tuple[int, str]]) -> None:
+        """Put back counts from a drain whose flush failed, so none are lost."""
+        with self._lock:
+            for normalized_sql, (count, example) in unsampled.items():
+                current, _ = self._unsampled.get(normalized_sql, (0, example))
+                self._unsampled[normalized_sql] = (current + count, example)
+
+
+# Process-wide policy used by the listeners
+sampling_policy = SamplingPolicy(
+    fingerprint_rates=FINGERPRINT_SAMPLE_RATES, kind_rates=KIND_SAMPLE_RATES
+)
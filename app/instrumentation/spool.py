@@ -0,0 +1,226 @@
+"""
+Local disk spool for captured events the store could not accept.
+
+When a flush fails (store down, pool exhausted, statement timeout) the
+batch is appended to an NDJSON file instead of being dropped. Once the
+store is reachable again, replay() bulk-loads the spooled events through
+the normal persistence path.
+
+Replay is resumable: the file is first renamed to `<path>.replaying`,
+and the byte offset of the last committed batch is kept next to it, so a
+crash or a second outage mid-replay loses no events. Delivery is
+at-least-once: the offset is written after the batch commits, so a crash
+between the two replays that batch again.
+
+Every worker process of a server shares one spool. Appends hold an
+exclusive flock on `<path>.lock` and replay holds one on
+`<path>.replaying.lock`, so appends never interleave and only one process
+(a writer or scripts/replay_spool.py) replays at a time; the others skip
+until the next interval.
+"""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import TYPE_CHECKING, Callable, List
+
+try:
+    import fcntl
+except ImportError:  # Windows: thread lock only, one process per spool
+    fcntl = None
+
+if TYPE_CHECKING:
+    from app.instrumentation.writer import ExecutionEvent
+
+logger = logging.getLogger(__name__)
+
+
+SPOOL_PATH = os.getenv(
+    "PROFILER_SPOOL_PATH",
+    os.path.join(tempfile.gettempdir(), "query_profiler_spool.ndjson"),
+)
+SPOOL_MAX_BYTES = 256 * 1024 * 1024  # stop spooling (drop) beyond this size
+REPLAY_BATCH_SIZE = 1000
+
+
+class EventSpool:
+    """Append-only NDJSON spool with resumable replay."""
+
+    def __init__(self, path: str = SPOOL_PATH, max_bytes: int = SPOOL_MAX_BYTES):
+        self.path = path
+        self.replay_path = path + ".replaying"
+        self.offset_path = path + ".replaying.offset"
+        self.lock_path = path + ".lock"
+        self.replay_lock_path = path + ".replaying.lock"
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        self.spooled = 0
+        self.dropped = 0
+        self.replayed = 0
+
+    # -----------------------------------------------------------------
+    # Append
+    # -----------------------------------------------------------------
+    def append(self, events: List["ExecutionEvent"]) -> int:
+        """
+        Append events to the spool file.
+
+        Returns:
+            int: Number of events written (0 if the spool is full).
+        """
+        if not events:
+            return 0
+
+        lines = "".join(_dump(event) + "\n" for event in events)
+
+        with self._lock, _file_lock(self.lock_path):
+            size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+            if size + len(lines) > self.max_bytes:
+                self.dropped += len(events)
+                logger.warning(
+                    "Profiler spool full (%d bytes); %d events dropped",
+                    size,
+                    len(events),
+                )
+                return 0
+
+            with open(self.path, "a", encoding="utf-8") as spool_file:
+                spool_file.write(lines)
+                spool_file.flush()
+                os.fsync(spool_file.fileno())
+
+        self.spooled += len(events)
+        return len(events)
+
+    # -----------------------------------------------------------------
+    # Replay
+    # -----------------------------------------------------------------
+    def pending(self) -> bool:
+        return os.path.exists(self.replay_path) or os.path.exists(self.path)
+
+    def replay(
+        self,
+        flush_fn: Callable[[List["ExecutionEvent"]], None],
+        batch_size: int = REPLAY_BATCH_SIZE,
+    ) -> int:
+        """
+        Load spooled events through `flush_fn`, one batch per transaction.
+
+        Stops (and keeps its position) at the first failing batch. Returns
+        0 straight away if another process is replaying.
+
+        Returns:
+            int: Number of events replayed in this call.
+        """
+        with _file_lock(self.replay_lock_path, blocking=False) as locked:
+            if not locked:
+                return 0
+            return self._replay(flush_fn, batch_size)
+
+    def _replay(self, flush_fn, batch_size: int) -> int:
+        # Called with the replay lock held
+        with self._lock, _file_lock(self.lock_path):
+            if not os.path.exists(self.replay_path):
+                if not os.path.exists(self.path):
+                    return 0
+                # New appends go to a fresh file while we replay this one
+                os.replace(self.path, self.replay_path)
+
+        replayed = 0
+        offset = self._read_offset()
+
+        with open(self.replay_path, "r", encoding="utf-8") as replay_file:
+            replay_file.seek(offset)
+            while True:
+                batch, offset = _read_batch(replay_file, batch_size)
+                if not batch:
+                    break
+
+                flush_fn(batch)  # raises → position is kept for next time
+                self._write_offset(offset)
+                replayed += len(batch)
+
+        os.remove(self.replay_path)
+        if os.path.exists(self.offset_path):
+            os.remove(self.offset_path)
+
+        self.replayed += replayed
+        return replayed
+
+    def _read_offset(self) -> int:
+        try:
+            with open(self.offset_path, "r", encoding="utf-8") as offset_file:
+                return int(offset_file.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def _write_offset(self, offset: int) -> None:
+        tmp_path = self.offset_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as offset_file:
+            offset_file.write(str(offset))
+        os.replace(tmp_path, self.offset_path)
+
+
+@contextmanager
+def _file_lock(path: str, blocking: bool = True):
+    """
+    Exclusive flock on `path` across processes; yields False if not
+    `blocking` and another process holds it.
+    """
+    if fcntl is None:
+        yield True
+        return
+
+    with open(path, "a") as lock_file:
+        flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+        try:
+            fcntl.flock(lock_file.fileno(), flags)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def _dump(event: "ExecutionEvent") -> str:
+    record = event._asdict()
+    record["executed_at"] = event.executed_at.isoformat()
+    return json.dumps(record, separators=(",", ":"))
+
+
+def _load(line: str) -> "ExecutionEvent":
+    # Imported here: the writer itself depends on this module
+    from app.instrumentation.writer import ExecutionEvent
+
+    record = json.loads(line)
+    record["executed_at"] = datetime.fromisoformat(record["executed_at"])
+    # Ignore fields written by a newer version, default missing ones
+    return ExecutionEvent(
+        **{k: v for k, v in record.items() if k in ExecutionEvent._fields}
+    )
+
+
+def _read_batch(replay_file, batch_size: int):
+    batch = []
+    while len(batch) < batch_size:
+        line = replay_file.readline()
+        if not line:
+            break
+        if not line.endswith("\n"):
+            break  # torn final write from a crash; nothing after it
+        try:
+            batch.append(_load(line))
+        except (ValueError, TypeError, KeyError):
+            logger.warning("Skipping unreadable profiler spool line")
+    return batch, replay_file.tell()
+
+
+# Process-wide spool shared by the writer and the sync capture path
+event_spool = EventSpool()
@@ -0,0 +1,679 @@
+"""
+This file moves profiler writes off the application's thread.
+
+The listener only builds a tiny ExecutionEvent and puts it on a bounded
+in-memory queue. A background flusher thread drains that queue and writes
+events in bulk — every BATCH_SIZE events or every FLUSH_INTERVAL_MS,
+whichever comes first.
+
+In short:
+caller thread → queue.put_nowait()   (microseconds)
+flusher thread → one session, one commit per batch   (milliseconds, off the hot path)
+
+Writes go through the dedicated profiler pool (see app/db/session.py).
+When the store is unavailable, batches are appended to the local disk
+spool (see spool.py) and a circuit breaker keeps new batches going
+straight to disk until the store answers again; the spool is then
+replayed in the background.
+"""
+
+import atexit
+import csv
+import io
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from sqlalchemy import (
+    BigInteger,
+    bindparam,
+    DateTime,
+    Integer,
+    column,
+    func,
+    insert,
+    select,
+    update,
+    values,
+)
+
+from app.db.local_store import local_executions
+from app.db.session import get_profiler_session
+from app.instrumentation.counters import CounterDelta, counter_deltas, merge_deltas
+from app.instrumentation.fingerprint_cache import fingerprint_cache
+from app.instrumentation.param_samples import ParamSample, param_samples
+from app.instrumentation.sampling import sampling_policy
+from app.instrumentation.spool import EventSpool, event_spool
+from app.models import Query, QueryExecution, QueryParamSample
+from app.services.query_services import register_fingerprints
+
+logger = logging.getLogger(__name__)
+
+
+# -------------------------------------------------------------
+# Tunables
+# -------------------------------------------------------------
+MAX_QUEUE_SIZE = 10_000  # events held in memory before backpressure kicks in
+BATCH_SIZE = 500  # flush after this many events...
+FLUSH_INTERVAL_MS = 200  # ...or after this long, whichever comes first
+
+# What to do when the queue is full:
+# - "drop":   discard the event immediately (never slows the caller)
+# - "block":  wait up to BLOCK_TIMEOUT_MS for room (lossless under short bursts)
+# - "sample": block for a random OVERFLOW_SAMPLE_RATE share of events, drop the rest
+BACKPRESSURE = "drop"
+BLOCK_TIMEOUT_MS = 50
+OVERFLOW_SAMPLE_RATE = 0.1
+
+# How executions are inserted:
+# - "copy": stream the batch as CSV through COPY FROM STDIN (Postgres only)
+# - "orm":  session.add_all(QueryExecution(...)) — row-by-row INSERTs
+INGEST_METHOD = os.getenv("PROFILER_INGEST_METHOD", "copy")
+
+SHUTDOWN_TIMEOUT_S = 5.0  # how long interpreter exit waits for the final flush
+
+# Circuit breaker: after a failed flush, spool directly for a while
+# (doubling up to the max) instead of hitting a store that is down
+RETRY_BACKOFF_S = 1.0
+MAX_RETRY_BACKOFF_S = 60.0
+REPLAY_INTERVAL_S = 5.0  # how often to look for spooled events once healthy
+
+BACKPRESSURE_POLICIES = ("drop", "block", "sample")
+
+
+class ExecutionEvent(NamedTuple):
+    """One captured execution, as cheap to build as possible."""
+
+    normalized_sql: str
+    raw_sql: str
+    executed_at: datetime
+    duration_ms: float
+    rows_returned: Optional[int] = None
+    error: Optional[str] = None
+    sample_weight: float = 1.0  # 1 / sampling rate at capture time
+    rows_affected: Optional[int] = None  # DML row count
+    batch_size: int = 1  # parameter sets in one executemany() call
+
+
+# ---------------------------------------------------------------------
+# Bulk persistence — runs on the flusher thread (or inline in sync mode)
+# ---------------------------------------------------------------------
+def persist_events(
+    events: List[ExecutionEvent], method: Optional[str] = None
+) -> None:
+    """
+    Write a batch of execution events in a single transaction.
+
+    Each distinct fingerprint in the batch is resolved once — from the
+    in-process fingerprint cache when possible, new ones registered by
+    one upsert — its counters are bumped by one set-based UPDATE for the
+    whole batch, and all executions are inserted together (COPY by
+    default, see INGEST_METHOD).
+
+    Executions skipped by the sampling policy since the last flush, and
+    counter deltas parked by earlier flushes (see counters.py), are
+    folded into total_executions here as well. Bind-parameter samples
+    (param_samples.py) are stored once per PARAM_SAMPLE_FLUSH_INTERVAL_S.
+    """
+    unsampled = sampling_policy.drain_unsampled()
+    carried = counter_deltas.drain()
+    samples = param_samples.drain()
+    if not events and not unsampled and not carried and not samples:
+        return
+
+    session = get_profiler_session()
+    try:
+        counts = Counter(event.normalized_sql for event in events)
+        examples = {event.normalized_sql: event.raw_sql for event in events}
+        last_seen = {}
+        for event in events:
+            seen = last_seen.get(event.normalized_sql)
+            if seen is None or event.executed_at > seen:
+                last_seen[event.normalized_sql] = event.executed_at
+
+        for normalized_sql, (skipped, raw_sql) in unsampled.items():
+            counts[normalized_sql] += skipped
+            examples.setdefault(normalized_sql, raw_sql)
+
+        for sample in samples:
+            examples.setdefault(sample.normalized_sql, sample.statement)
+
+        query_ids = resolve_query_ids(session, examples)
+        deltas = merge_deltas(execution_deltas(query_ids, counts, last_seen), carried)
+        deferred = apply_execution_counts(session, deltas)
+        insert_executions(session, query_ids, events, method or INGEST_METHOD)
+        insert_param_samples(session, query_ids, samples)
+        session.commit()
+
+    except Exception:
+        session.rollback()
+        # The skipped counts were not written either; keep them for next time
+        sampling_policy.restore_unsampled(unsampled)
+        counter_deltas.restore(carried)
+        param_samples.restore(samples)
+        raise
+
+    finally:
+        session.close()
+
+    counter_deltas.restore(deferred)
+
+
+def resolve_query_ids(session, examples: Dict[str, str]) -> Dict[str, int]:
+    """
+    Map each normalized_sql to its query_id, creating missing fingerprints.
+
+    Cache misses are resolved together by one upsert (register_fingerprints).
+
+    Args:
+        examples (Dict[str, str]): normalized_sql → one raw example statement.
+    """
+    if not fingerprint_cache.warmed:
+        fingerprint_cache.warm(session)
+
+    query_ids = {}
+    missing = {}
+    for normalized_sql, raw_sql in examples.items():
+        query_id = fingerprint_cache.get(normalized_sql)
+        if query_id is None:
+            missing[normalized_sql] = raw_sql
+        else:
+            query_ids[normalized_sql] = query_id
+
+    for normalized_sql, query_id in register_fingerprints(session, missing).items():
+        fingerprint_cache.put(normalized_sql, query_id)
+        query_ids[normalized_sql] = query_id
+
+    return query_ids
+
+
+def execution_deltas(
+    query_ids: Dict[str, int],
+    counts: Dict[str, int],
+    last_seen: Optional[Dict[str, datetime]] = None,
+) -> Dict[int, CounterDelta]:
+    """Turn per-fingerprint counts into counter deltas keyed by query_id."""
+    now = datetime.now(timezone.utc)
+    last_seen = last_seen or {}
+    return {
+        query_ids[normalized_sql]: CounterDelta(
+            count, last_seen.get(normalized_sql, now)
+        )
+        for normalized_sql, count in counts.items()
+    }
+
+
+def apply_execution_counts(
+    session, deltas: Dict[int, CounterDelta], skip_locked: bool = True
+) -> Dict[int, CounterDelta]:
+    """
+    Bump total_executions and last_seen_at for a whole batch in one statement:
+
+        WITH lockable AS (
+            SELECT id FROM queries WHERE id IN (...)
+            ORDER BY id FOR NO KEY UPDATE SKIP LOCKED
+        )
+        UPDATE queries SET total_executions = total_executions + v.n, ...
+        FROM (VALUES (id, n, seen), ...) AS v
+        WHERE queries.id = v.id AND queries.id IN (SELECT id FROM lockable)
+
+    With skip_locked, rows another writer holds are skipped instead of
+    waited for. NO KEY UPDATE doesn't block the foreign-key checks of
+    concurrent execution inserts.
+
+    Returns:
+        Dict[int, CounterDelta]: Deltas that were not applied (park them
+        in counter_deltas for the next flush).
+    """
+    if not deltas:
+        return {}
+
+    if session.get_bind().dialect.name == "sqlite":
+        _apply_local_execution_counts(session, deltas)
+        return {}
+
+    rows = sorted(
+        (query_id, delta.executions, delta.last_seen)
+        for query_id, delta in deltas.items()
+    )
+
+    batch = values(
+        column("id", Integer),
+        column("n", BigInteger),
+        column("seen", DateTime(timezone=True)),
+        name="batch",
+    ).data(rows)
+
+    stmt = update(Query).where(Query.id == batch.c.id)
+    if skip_locked:
+        lockable = (
+            select(Query.id)
+            .where(Query.id.in_(list(deltas)))
+            .order_by(Query.id)
+            .with_for_update(skip_locked=True, key_share=True)
+            .cte("lockable")
+        )
+        stmt = stmt.where(Query.id.in_(select(lockable.c.id)))
+
+    applied = session.execute(
+        stmt.values(
+            total_executions=Query.total_executions + batch.c.n,
+            last_seen_at=func.greatest(Query.last_seen_at, batch.c.seen),
+        ).returning(Query.id),
+        execution_options={"synchronize_session": False},
+    ).scalars()
+
+    deferred = dict(deltas)
+    for query_id in applied:
+        del deferred[query_id]
+    return deferred
+
+
+def _apply_local_execution_counts(session, deltas: Dict[int, CounterDelta]) -> None:
+    # Local store (local_store.py): SQLite has one writer at a time, so there
+    # are no row locks to skip — one executemany UPDATE in id order
+    queries = Query.__table__
+    session.execute(
+        update(queries)
+        .where(queries.c.id == bindparam("delta_id"))
+        .values(
+            total_executions=queries.c.total_executions + bindparam("delta_n"),
+            last_seen_at=func.greatest(
+                queries.c.last_seen_at,
+                bindparam("delta_seen", type_=DateTime(timezone=True)),
+            ),
+        ),
+        [
+            {
+                "delta_id": query_id,
+                "delta_n": delta.executions,
+                "delta_seen": delta.last_seen,
+            }
+            for query_id, delta in sorted(deltas.items())
+        ],
+    )
+
+
+def flush_counter_deltas() -> int:
+    """
+    Apply every parked counter delta, waiting for row locks if needed.
+
+    Called on shutdown so deltas deferred by the last flushes are not lost.
+
+    Returns:
+        int: Executions written to total_executions.
+    """
+    carried = counter_deltas.drain()
+    if not carried:
+        return 0
+
+    session = get_profiler_session()
+    try:
+        # Whatever is left over refers to fingerprints deleted meanwhile
+        apply_execution_counts(session, carried, skip_locked=False)
+        session.commit()
+        return sum(delta.executions for delta in carried.values())
+
+    except Exception:
+        session.rollback()
+        counter_deltas.restore(carried)
+        raise
+
+    finally:
+        session.close()
+
+
+def _flush_counter_deltas_at_exit() -> None:
+    try:
+        flush_counter_deltas()
+    except Exception:
+        logger.exception(
+            "Could not write %d parked profiler executions", counter_deltas.pending()
+        )
+
+
+# Runs after the writer / aggregator shutdown flushes (atexit is LIFO)
+atexit.register(_flush_counter_deltas_at_exit)
+
+
+def insert_executions(
+    session, query_ids: Dict[str, int], events: List[ExecutionEvent], method: str
+) -> None:
+    """Insert one QueryExecution row per event, by COPY or through the ORM."""
+    if not events:
+        return
+
+    dialect = session.get_bind().dialect.name
+    if method == "copy" and dialect == "postgresql":
+        copy_executions(session, query_ids, events)
+        return
+
+    if dialect == "sqlite":
+        # Local store (local_store.py): one executemany, no ORM objects
+        session.execute(
+            insert(local_executions),
+            [
+                {
+                    "query_id": query_ids[event.normalized_sql],
+                    "executed_at": event.executed_at,
+                    "duration_ms": event.duration_ms,
+                    "rows_returned": event.rows_returned,
+                    "rows_affected": event.rows_affected,
+                    "error": event.error,
+                    "sample_weight": event.sample_weight,
+                    "batch_size": event.batch_size,
+                }
+                for event in events
+            ],
+        )
+        return
+
+    session.add_all(
+        [
+            QueryExecution(
+                query_id=query_ids[event.normalized_sql],
+                executed_at=event.executed_at,
+                duration_ms=event.duration_ms,
+                rows_returned=event.rows_returned,
+                rows_affected=event.rows_affected,
+                error=event.error,
+                sample_weight=event.sample_weight,
+                batch_size=event.batch_size,
+            )
+            for event in events
+        ]
+    )
+
+
+_COPY_COLUMNS = (
+    "query_id",
+    "executed_at",
+    "duration_ms",
+    "rows_returned",
+    "rows_affected",
+    "error",
+    "sample_weight",
+    "batch_size",
+)
+_COPY_SQL = (
+    f"COPY query_executions ({', '.join(_COPY_COLUMNS)}) "
+    "FROM STDIN WITH (FORMAT csv)"
+)
+
+
+def copy_executions(
+    session, query_ids: Dict[str, int], events: List[ExecutionEvent]
+) -> None:
+    """
+    Stream events into query_executions with COPY FROM STDIN (CSV).
+
+    Rows go straight from the events to a CSV buffer — no ORM objects,
+    no per-row INSERT. Empty unquoted fields are NULL in CSV COPY.
+    Runs on the session's own connection, inside its transaction.
+    """
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(
+        (
+            query_ids[event.normalized_sql],
+            event.executed_at.isoformat(),
+            event.duration_ms,
+            event.rows_returned,
+            event.rows_affected,
+            event.error,
+            event.sample_weight,
+            event.batch_size,
+        )
+        for event in events
+    )
+    buffer.seek(0)
+
+    cursor = session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(_COPY_SQL, buffer)
+    finally:
+        cursor.close()
+
+
+def insert_param_samples(
+    session, query_ids: Dict[str, int], samples: List[ParamSample]
+) -> None:
+    """Insert bind-parameter samples (one executemany)."""
+    if not samples:
+        return
+
+    session.execute(
+        insert(QueryParamSample),
+        [
+            {
+                "query_id": query_ids[sample.normalized_sql],
+                "captured_at": sample.captured_at,
+                "duration_ms": sample.duration_ms,
+                "statement": sample.statement,
+                "parameters": sample.parameters,
+                "redacted": sample.redacted,
+            }
+            for sample in samples
+        ],
+    )
+
+
+# ---------------------------------------------------------------------
+# Background writer
+# ---------------------------------------------------------------------
+class BufferedWriter:
+    """
+    Bounded queue + background flusher thread.
+
+    submit() is the only method called on the application's thread and it
+    never touches the database.
+    """
+
+    def __init__(
+        self,
+        flush_fn: Callable[[List[ExecutionEvent]], None] = persist_events,
+        max_queue_size: int = MAX_QUEUE_SIZE,
+        batch_size: int = BATCH_SIZE,
+        flush_interval_ms: float = FLUSH_INTERVAL_MS,
+        backpressure: str = BACKPRESSURE,
+        block_timeout_ms: float = BLOCK_TIMEOUT_MS,
+        overflow_sample_rate: float = OVERFLOW_SAMPLE_RATE,
+        spool: Optional[EventSpool] = event_spool,
+    ):
+        if backpressure not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"Unknown backpressure policy: {backpressure!r}")
+
+        self._flush_fn = flush_fn
+        self._queue: "queue.Queue[ExecutionEvent]" = queue.Queue(
+            maxsize=max_queue_size
+        )
+        self._batch_size = batch_size
+        self._flush_interval_s = flush_interval_ms / 1000
+        self._backpressure = backpressure
+        self._block_timeout_s = block_timeout_ms / 1000
+        self._overflow_sample_rate = overflow_sample_rate
+        self._spool = spool
+
+        # Circuit breaker state (flusher thread only)
+        self._backoff_s = RETRY_BACKOFF_S
+        self._open_until = 0.0  # monotonic time before which we spool directly
+        self._next_replay = 0.0
+
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        # Counters (read-only for callers, best-effort under contention)
+        self.submitted = 0
+        self.dropped = 0
+        self.flushed = 0
+        self.failed = 0
+        self.spooled = 0
+
+    # -----------------------------------------------------------------
+    # Lifecycle
+    # -----------------------------------------------------------------
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+
+        self._thread = threading.Thread(
+            target=self._run, name="query-profiler-writer", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.stop)  # flush whatever is left on interpreter exit
+
+    def stop(self, timeout: float = SHUTDOWN_TIMEOUT_S) -> None:
+        """Stop the flusher thread after it has drained the queue."""
+        if self._thread is None:
+            return
+
+        self._stop_event.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    # -----------------------------------------------------------------
+    # Caller side
+    # -----------------------------------------------------------------
+    def submit(self, event: ExecutionEvent) -> bool:
+        """
+        Enqueue an event. Returns False if it was dropped by backpressure.
+        """
+        try:
+            self._queue.put_nowait(event)
+            self.submitted += 1
+            return True
+        except queue.Full:
+            pass
+
+        if self._backpressure == "block" or (
+            self._backpressure == "sample"
+            and random.random() < self._overflow_sample_rate
+        ):
+            try:
+                self._queue.put(event, timeout=self._block_timeout_s)
+                self.submitted += 1
+                return True
+            except queue.Full:
+                pass
+
+        self.dropped += 1
+        return False
+
+    # -----------------------------------------------------------------
+    # Flusher side
+    # -----------------------------------------------------------------
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            # An empty batch still flushes: it carries sampled-out counts
+            self._flush(self._next_batch())
+
+        # Final drain on shutdown
+        while True:
+            batch = self._drain_nowait()
+            self._flush(batch)
+            if not batch:
+                break
+
+    def _next_batch(self) -> List[ExecutionEvent]:
+        """Block for the first event, then collect until size or time limit."""
+        try:
+            first = self._queue.get(timeout=self._flush_interval_s)
+        except queue.Empty:
+            return []
+
+        batch = [first]
+        deadline = time.monotonic() + self._flush_interval_s
+
+        while len(batch) < self._batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _drain_nowait(self) -> List[ExecutionEvent]:
+        batch = []
+        while len(batch) < self._batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, batch: List[ExecutionEvent]) -> None:
+        now = time.monotonic()
+        if now < self._open_until:
+            self._spool_batch(batch)  # store known to be down; don't wait on it
+            return
+
+        try:
+            self._flush_fn(batch)
+            self.flushed += len(batch)
+        except Exception:
+            logger.exception("Profiler flush failed; spooling %d events", len(batch))
+            self._trip(now)
+            self._spool_batch(batch)
+            return
+
+        self._backoff_s = RETRY_BACKOFF_S
+        if self._spool is not None and now >= self._next_replay:
+            self._next_replay = now + REPLAY_INTERVAL_S
+            self._replay()
+
+    def _replay(self) -> None:
+        """Load spooled events now that the store accepts writes again."""
+        if not self._spool.pending():
+            return
+        try:
+            replayed = self._spool.replay(self._flush_fn, self._batch_size)
+            if replayed:
+                logger.info("Replayed %d spooled profiler events", replayed)
+        except Exception:
+            logger.exception("Profiler spool replay failed; will retry")
+            self._trip(time.monotonic())
+
+    def _trip(self, now: float) -> None:
+        self._open_until = now + self._backoff_s
+        self._backoff_s = min(self._backoff_s * 2, MAX_RETRY_BACKOFF_S)
+
+    def _spool_batch(self, batch: List[ExecutionEvent]) -> None:
+        if not batch:
+            return
+        written = 0
+        if self._spool is not None:
+            try:
+                written = self._spool.append(batch)
+            except OSError:
+                logger.exception("Profiler spool write failed")
+        self.spooled += written
+        self.failed += len(batch) - written
+
+
+# -------------------------------------------------------------
+# Process-wide writer, started lazily on first capture
+# -------------------------------------------------------------
+_writer: Optional[BufferedWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> BufferedWriter:
+    """Return the process-wide BufferedWriter, starting it if needed."""
+    global _writer
+
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                writer = BufferedWriter()
+                writer.start()
+                _writer = writer
+
+    return _writer
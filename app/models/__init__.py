@@ -4,10 +4,20 @@ from .query import Query
 from .analysis import QueryAnalysis
 from .execution import QueryExecution
 from .recommendation import Recommendation
+from .rollup import QueryStatsRollup
+from .checkpoint import JobCheckpoint
+from .regression import QueryRegression
+from .plan_diff import QueryPlanDiff
+from .param_sample import QueryParamSample
 
 __all__ = [
     "Query",
     "QueryAnalysis",
     "QueryExecution",
     "Recommendation",
+    "QueryStatsRollup",
+    "JobCheckpoint",
+    "QueryRegression",
+    "QueryPlanDiff",
+    "QueryParamSample",
 ]
@@ -9,7 +9,22 @@ Think of it as:
 “What Postgres thought and what actually happened.”
 """
 
-from sqlalchemy import Column, Integer, Float, ForeignKey, Boolean, func, DateTime, JSON
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    Integer,
+    Float,
+    ForeignKey,
+    Boolean,
+    func,
+    DateTime,
+    Index,
+    JSON,
+    String,
+    Text,
+    or_,
+)
+from sqlalchemy.dialects.postgresql import ARRAY
 from app.db.base import Base
 
 
@@ -34,6 +49,49 @@ class QueryAnalysis(Base):
     seq_scan_detected = Column(Boolean, default=False, nullable=False)
     index_scan_detected = Column(Boolean, default=False, nullable=False)
 
+    # md5 of the plan's shape (app/analysis/plan_shape.py); NULL for rows
+    # stored before shapes were recorded
+    plan_shape_hash = Column(String(32), nullable=True)
+
+    # Plan features (app/analysis/plan_features.py), extracted once on insert
+    node_type_counts = Column(JSON, nullable=True)
+    seq_scan_relations = Column(ARRAY(Text), nullable=True)
+    plan_depth = Column(Integer, nullable=True)
+    max_estimate_error = Column(Float, nullable=True)
+    shared_hit_blocks = Column(BigInteger, nullable=True)
+    shared_read_blocks = Column(BigInteger, nullable=True)
+    temp_blocks = Column(BigInteger, nullable=True)
+    sort_spilled = Column(Boolean, default=False, nullable=False)
+    hash_spilled = Column(Boolean, default=False, nullable=False)
+    slowest_node_type = Column(Text, nullable=True)
+    slowest_node_ms = Column(Float, nullable=True)
+
+    # What was explained: a captured bind-parameter sample, or PG 16's
+    # GENERIC_PLAN for a parameterized statement without one
+    param_sample_id = Column(
+        Integer,
+        ForeignKey("query_param_samples.id", ondelete="SET NULL"),
+        nullable=True,
+    )
+    generic_plan = Column(Boolean, default=False, nullable=False)
+
+    __table_args__ = (
+        Index("ix_query_analysis_query_id_executed_at", "query_id", "executed_at"),
+        Index("ix_query_analysis_max_estimate_error", "max_estimate_error"),
+        Index(
+            "ix_query_analysis_seq_scan_relations",
+            "seq_scan_relations",
+            postgresql_using="gin",
+        ),
+        # Filter with exactly `sort_spilled OR hash_spilled` to use it
+        Index(
+            "ix_query_analysis_spilled",
+            "query_id",
+            "executed_at",
+            postgresql_where=or_(sort_spilled, hash_spilled),
+        ),
+    )
+
 
 # Conceptual SQL Definition Equivalent:
 """
@@ -45,7 +103,21 @@ CREATE TABLE query_analysis (
     planning_time_ms FLOAT,
     execution_time_ms FLOAT,
     seq_scan_detected BOOLEAN NOT NULL DEFAULT FALSE,
-    index_scan_detected BOOLEAN NOT NULL DEFAULT FALSE
+    index_scan_detected BOOLEAN NOT NULL DEFAULT FALSE,
+    plan_shape_hash VARCHAR(32),
+    node_type_counts JSON,
+    seq_scan_relations TEXT[],
+    plan_depth INTEGER,
+    max_estimate_error FLOAT,
+    shared_hit_blocks BIGINT,
+    shared_read_blocks BIGINT,
+    temp_blocks BIGINT,
+    sort_spilled BOOLEAN NOT NULL DEFAULT FALSE,
+    hash_spilled BOOLEAN NOT NULL DEFAULT FALSE,
+    slowest_node_type TEXT,
+    slowest_node_ms FLOAT,
+    param_sample_id INTEGER REFERENCES query_param_samples(id) ON DELETE SET NULL,
+    generic_plan BOOLEAN NOT NULL DEFAULT FALSE
 );
 """
 
@@ -60,6 +132,16 @@ CREATE TABLE query_analysis (
 | `execution_time_ms`   | Time spent executing             |
 | `seq_scan_detected`   | Full table scan used             |
 | `index_scan_detected` | Index used                       |
+| `plan_shape_hash`     | Plan shape, costs/timings removed|
+| `node_type_counts`    | {"Seq Scan": 2, "Hash Join": 1}  |
+| `seq_scan_relations`  | Tables read by Seq Scan          |
+| `max_estimate_error`  | Worst actual vs estimated rows   |
+| `shared_*_blocks`     | Buffer hits / reads, whole plan  |
+| `temp_blocks`         | Temp file blocks read + written  |
+| `sort/hash_spilled`   | A sort / hash went to disk       |
+| `slowest_node_*`      | Node with most exclusive time    |
+| `param_sample_id`     | Bind values explained, if any    |
+| `generic_plan`        | Planned without values (PG 16+)  |
 
 """
 
@@ -0,0 +1,57 @@
+# This table stores the progress of incremental background jobs.
+"""
+- One row = one job (e.g. "rollup_executions")
+- `position` is the high-water mark: the last query_executions.id folded in
+- `pending_position` is the next high-water mark, taken from the id
+  sequence at `pending_since`; it only becomes `position` once a safety
+  lag has passed, so executions whose transaction was still in flight at
+  that moment are not skipped
+
+Think of it as:
+"How far has this job got, and where will it stop next time?"
+"""
+
+from sqlalchemy import BigInteger, Column, DateTime, Text, func
+
+from app.db.base import Base
+
+
+class JobCheckpoint(Base):
+    __tablename__ = "job_checkpoints"
+
+    name = Column(Text, primary_key=True)
+
+    position = Column(BigInteger, nullable=False, default=0, server_default="0")
+
+    pending_position = Column(BigInteger, nullable=True)
+    pending_since = Column(DateTime(timezone=True), nullable=True)
+
+    updated_at = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False,
+    )
+
+
+# Conceptual SQL Definition Equivalent:
+"""
+CREATE TABLE job_checkpoints (
+    name TEXT PRIMARY KEY,
+    position BIGINT NOT NULL DEFAULT 0,
+    pending_position BIGINT,
+    pending_since TIMESTAMPTZ,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+"""
+
+# Documentation of Columns
+"""
+| Column             | Meaning                                              |
+| ------------------ | ---------------------------------------------------- |
+| `name`             | Which job this checkpoint belongs to                 |
+| `position`         | High-water mark: everything up to here is processed  |
+| `pending_position` | Next high-water mark, once the safety lag has passed |
+| `pending_since`    | When `pending_position` was taken                    |
+| `updated_at`       | Last time the job advanced                           |
+"""
@@ -4,12 +4,23 @@
 - Time-series runtime data here.
 - Grows fast!
 - Immutable after insert.
+- Range-partitioned by day on executed_at: retention drops whole
+  partitions (see app/services/partition_services.py), never DELETEs.
 
 One-line mental model:
 query_executions = “This query ran at this time and took this long.”
 """
 
-from sqlalchemy import Column, Integer, Text, Float, ForeignKey, func, DateTime
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    Integer,
+    Text,
+    Float,
+    ForeignKey,
+    func,
+    DateTime,
+)
 
 from app.db.base import Base
 
@@ -17,14 +28,20 @@ from app.db.base import Base
 class QueryExecution(Base):
     __tablename__ = "query_executions"
 
-    id = Column(Integer, primary_key=True)
+    # The partition key must be part of the primary key
+    __table_args__ = {"postgresql_partition_by": "RANGE (executed_at)"}
+
+    id = Column(BigInteger, primary_key=True)
 
     query_id = Column(
         Integer, ForeignKey("queries.id", ondelete="CASCADE"), nullable=False
     )
 
     executed_at = Column(
-        DateTime(timezone=True), server_default=func.now(), nullable=False
+        DateTime(timezone=True),
+        primary_key=True,
+        server_default=func.now(),
+        nullable=False,
     )
 
     duration_ms = Column(Float, nullable=False)
@@ -34,6 +51,13 @@ class QueryExecution(Base):
 
     error = Column(Text, nullable=True)
 
+    # 1 / sampling rate at capture time; weighted sums stay unbiased
+    sample_weight = Column(Float, nullable=False, default=1.0, server_default="1")
+
+    # Parameter sets sent in one executemany() call (1 = single statement);
+    # per-row latency is duration_ms / batch_size
+    batch_size = Column(Integer, nullable=False, default=1, server_default="1")
+
 
 # Onle Line Meaning of Each Column:
 """
@@ -46,20 +70,30 @@ class QueryExecution(Base):
 | `rows_returned` | Number of rows returned (SELECT queries)          |
 | `rows_affected` | Number of rows changed (INSERT/UPDATE/DELETE)     |
 | `error`         | Error message if execution failed, otherwise NULL |
+| `sample_weight` | How many executions this sampled row stands for   |
+| `batch_size`    | Parameter sets in this executemany batch (1 = one)|
 
 """
 
 # COnceptual SQL Definition Equivalent:
 """ 
 CREATE TABLE query_executions (
-    id SERIAL PRIMARY KEY,
+    id BIGINT NOT NULL DEFAULT nextval('query_executions_id_seq'),
     query_id INTEGER NOT NULL REFERENCES queries(id) ON DELETE CASCADE,
     executed_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
     duration_ms FLOAT NOT NULL,
     rows_returned INTEGER,
     rows_affected INTEGER,
-    error TEXT
-);
+    error TEXT,
+    sample_weight FLOAT NOT NULL DEFAULT 1,
+    batch_size INTEGER NOT NULL DEFAULT 1,
+    PRIMARY KEY (id, executed_at)
+) PARTITION BY RANGE (executed_at);
+
+-- one partition per UTC day, plus a default catch-all:
+CREATE TABLE query_executions_p20260102 PARTITION OF query_executions
+    FOR VALUES FROM ('2026-01-02 00:00:00+00') TO ('2026-01-03 00:00:00+00');
+CREATE TABLE query_executions_default PARTITION OF query_executions DEFAULT;
 
 """
 
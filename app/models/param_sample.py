@@ -0,0 +1,72 @@
+# This table stores bind-parameter samples of a query's slowest executions.
+"""
+- One row = the parameters of one slow execution (opt-in capture,
+  PROFILER_CAPTURE_PARAMS=1, see app/instrumentation/param_samples.py)
+- Kept per query: the PARAM_SAMPLES_PER_FINGERPRINT slowest of the last
+  PARAM_SAMPLE_MAX_AGE (trimmed by param_sample_services)
+- Values pass the redaction hooks before they are stored; samples with
+  redacted values are never used to run EXPLAIN
+
+Think of it as:
+"This is the statement, with these values, that took 4 seconds."
+"""
+
+from sqlalchemy import (
+    JSON,
+    Boolean,
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    Text,
+)
+
+from app.db.base import Base
+
+
+class QueryParamSample(Base):
+    __tablename__ = "query_param_samples"
+
+    id = Column(Integer, primary_key=True)
+
+    query_id = Column(
+        Integer, ForeignKey("queries.id", ondelete="CASCADE"), nullable=False
+    )
+
+    captured_at = Column(DateTime(timezone=True), nullable=False)
+    duration_ms = Column(Float, nullable=False)
+
+    statement = Column(Text, nullable=False)  # as sent to the driver: placeholders
+    parameters = Column(JSON, nullable=False)  # dict (named) or list (positional)
+    redacted = Column(Boolean, default=False, nullable=False)
+
+    __table_args__ = (
+        Index("ix_query_param_samples_query_id_duration", "query_id", "duration_ms"),
+    )
+
+
+# Conceptual SQL Definition Equivalent:
+"""
+CREATE TABLE query_param_samples (
+    id SERIAL PRIMARY KEY,
+    query_id INTEGER NOT NULL REFERENCES queries(id) ON DELETE CASCADE,
+    captured_at TIMESTAMPTZ NOT NULL,
+    duration_ms FLOAT NOT NULL,
+    statement TEXT NOT NULL,
+    parameters JSON NOT NULL,
+    redacted BOOLEAN NOT NULL DEFAULT FALSE
+);
+"""
+
+# Documentation of Columns
+"""
+| Column        | Meaning                                                  |
+| ------------- | -------------------------------------------------------- |
+| `captured_at` | When the execution ran                                   |
+| `duration_ms` | How long it took                                         |
+| `statement`   | SQL with driver placeholders, e.g. `WHERE id = %(id)s`   |
+| `parameters`  | The bound values (JSON), after redaction                 |
+| `redacted`    | A redaction hook replaced at least one value             |
+"""
@@ -0,0 +1,101 @@
+# This table stores what changed between two analyses of the same query.
+"""
+- One row = one new analysis compared with the one before it
+- Written when an analysis is stored (app/analysis/plan_diff.py)
+- Compact: flags and up to PLAN_DIFF_MAX_CHANGES node changes, not plans
+
+Think of it as:
+"Since last time, the planner switched orders to a Seq Scan (+800 ms)."
+"""
+
+from sqlalchemy import (
+    JSON,
+    Boolean,
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    Text,
+    func,
+)
+
+from app.db.base import Base
+
+
+class QueryPlanDiff(Base):
+    __tablename__ = "query_plan_diffs"
+
+    id = Column(Integer, primary_key=True)
+
+    query_id = Column(
+        Integer, ForeignKey("queries.id", ondelete="CASCADE"), nullable=False
+    )
+    before_analysis_id = Column(
+        Integer, ForeignKey("query_analysis.id", ondelete="CASCADE"), nullable=False
+    )
+    after_analysis_id = Column(
+        Integer,
+        ForeignKey("query_analysis.id", ondelete="CASCADE"),
+        nullable=False,
+        unique=True,  # an analysis is diffed once, against its predecessor
+    )
+
+    created_at = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+    shape_changed = Column(Boolean, nullable=False)
+    join_strategy_changed = Column(Boolean, nullable=False)
+    index_to_seq_scan = Column(Boolean, nullable=False)
+    execution_time_delta_ms = Column(Float, nullable=True)
+
+    summary = Column(Text, nullable=False)
+    changes = Column(JSON, nullable=False)  # list of PlanChange dicts
+
+    __table_args__ = (
+        Index("ix_query_plan_diffs_query_id_created_at", "query_id", "created_at"),
+    )
+
+
+# Conceptual SQL Definition Equivalent:
+"""
+CREATE TABLE query_plan_diffs (
+    id SERIAL PRIMARY KEY,
+    query_id INTEGER NOT NULL REFERENCES queries(id) ON DELETE CASCADE,
+    before_analysis_id INTEGER NOT NULL
+        REFERENCES query_analysis(id) ON DELETE CASCADE,
+    after_analysis_id INTEGER NOT NULL UNIQUE
+        REFERENCES query_analysis(id) ON DELETE CASCADE,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    shape_changed BOOLEAN NOT NULL,
+    join_strategy_changed BOOLEAN NOT NULL,
+    index_to_seq_scan BOOLEAN NOT NULL,
+    execution_time_delta_ms FLOAT,
+    summary TEXT NOT NULL,
+    changes JSON NOT NULL
+);
+"""
+
+# Documentation of Columns
+"""
+| Column                    | Meaning                                          |
+| ------------------------- | ------------------------------------------------ |
+| `before_analysis_id`      | The earlier analysis                             |
+| `after_analysis_id`       | The new analysis                                 |
+| `shape_changed`           | Planner chose a different plan                   |
+| `join_strategy_changed`   | A join switched Nested Loop / Hash / Merge       |
+| `index_to_seq_scan`       | A relation went from an index scan to Seq Scan   |
+| `execution_time_delta_ms` | Execution Time after minus before                |
+| `summary`                 | One-line description of the top changes          |
+| `changes`                 | Node changes: kind, relations, types, time, rows |
+"""
+
+# Example `changes` entry:
+"""
+{"kind": "scan_method", "relations": ["orders"],
+ "before": "Index Scan", "after": "Seq Scan",
+ "time_before_ms": 0.8, "time_after_ms": 812.4,
+ "rows_before": 12, "rows_after": 118900}
+"""
@@ -4,7 +4,7 @@ One row = one normalized SQL fingerprint
 
 Everything here is metadata, not runtime data."""
 
-from sqlalchemy import Column, Integer, Text, DateTime, func
+from sqlalchemy import BigInteger, Column, Integer, Index, Text, DateTime, func
 from app.db.base import Base
 
 
@@ -12,7 +12,8 @@ class Query(Base):
     __tablename__ = "queries"
 
     id = Column(Integer, primary_key=True)
-    normalized_sql = Column(Text, nullable=False, unique=True)
+    normalized_sql = Column(Text, nullable=False)
+    fingerprint_hash = Column(BigInteger, nullable=False)
     raw_example_sql = Column(Text, nullable=False)
     total_executions = Column(Integer, nullable=False, default=0)
     first_seen_at = Column(
@@ -25,12 +26,24 @@ class Query(Base):
         nullable=False,
     )
 
+    __table_args__ = (
+        # Fixed-width uniqueness: lookups hit the 8-byte hash, md5() only
+        # disambiguates the (astronomically rare) 64-bit collision.
+        Index(
+            "uq_queries_fingerprint_hash_md5",
+            fingerprint_hash,
+            func.md5(normalized_sql),
+            unique=True,
+        ),
+    )
+
 
 """
 | Column name        | One-line meaning                                      |
 | ------------------ | ----------------------------------------------------- |
 | `id`               | Unique identifier for a query pattern                 |
 | `normalized_sql`   | Canonical SQL shape (same pattern, no literal values) |
+| `fingerprint_hash` | 64-bit hash of normalized_sql, used for all lookups   |
 | `raw_example_sql`  | One real example of how this query actually looked    |
 | `total_executions` | How many times this query pattern has run             |
 | `first_seen_at`    | When this query pattern was seen for the first time   |
@@ -42,12 +55,16 @@ class Query(Base):
 """ 
 CREATE TABLE queries (
     id SERIAL PRIMARY KEY,
-    normalized_sql TEXT NOT NULL UNIQUE,
+    normalized_sql TEXT NOT NULL,
+    fingerprint_hash BIGINT NOT NULL,
     raw_example_sql TEXT NOT NULL,
     total_executions INTEGER NOT NULL DEFAULT 0,
     first_seen_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
     last_seen_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
 );
+
+CREATE UNIQUE INDEX uq_queries_fingerprint_hash_md5
+    ON queries (fingerprint_hash, md5(normalized_sql));
 """
 
 # Example Data:
@@ -0,0 +1,72 @@
+# This table stores latency regressions detected per query pattern.
+"""
+- One row = one detected step change in a fingerprint's latency
+- Written by the regression detector (app/analysis/regression.py)
+- Each new regression triggers an EXPLAIN of the query
+
+Think of it as:
+"This query got slower at this moment — from X ms to Y ms."
+"""
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Integer,
+    UniqueConstraint,
+    func,
+)
+
+from app.db.base import Base
+
+
+class QueryRegression(Base):
+    __tablename__ = "query_regressions"
+
+    id = Column(Integer, primary_key=True)
+
+    query_id = Column(
+        Integer, ForeignKey("queries.id", ondelete="CASCADE"), nullable=False
+    )
+
+    detected_at = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    changed_at = Column(DateTime(timezone=True), nullable=False)
+
+    before_ms = Column(Float, nullable=False)
+    after_ms = Column(Float, nullable=False)
+    score = Column(Float, nullable=False)  # t-statistic of the step (log scale)
+
+    __table_args__ = (
+        # The same step is flagged once, however often the detector runs
+        UniqueConstraint("query_id", "changed_at", name="uq_query_regressions_change"),
+    )
+
+
+# Conceptual SQL Definition Equivalent:
+"""
+CREATE TABLE query_regressions (
+    id SERIAL PRIMARY KEY,
+    query_id INTEGER NOT NULL REFERENCES queries(id) ON DELETE CASCADE,
+    detected_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    changed_at TIMESTAMPTZ NOT NULL,
+    before_ms FLOAT NOT NULL,
+    after_ms FLOAT NOT NULL,
+    score FLOAT NOT NULL,
+    UNIQUE (query_id, changed_at)
+);
+"""
+
+# Documentation of Columns
+"""
+| Column        | Meaning                                                |
+| ------------- | ------------------------------------------------------ |
+| `query_id`    | Which query pattern got slower                         |
+| `detected_at` | When the detector flagged it                           |
+| `changed_at`  | Start of the first hour at the new latency level       |
+| `before_ms`   | Average latency before the change                      |
+| `after_ms`    | Average latency after the change                       |
+| `score`       | How clear the step is (t-statistic, higher = clearer)  |
+"""
@@ -0,0 +1,93 @@
+# This table stores pre-aggregated execution statistics per query pattern and time bucket.
+"""
+- One row = one query pattern × one time bucket (e.g. one minute)
+- Written by the in-process aggregator instead of one row per execution
+- Counts are weighted by sample_weight, so they estimate real executions
+- `histogram` is a mergeable log-bucketed latency histogram (p95/p99 source)
+
+Think of it as:
+"How did this query behave during this minute?"
+"""
+
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    UniqueConstraint,
+)
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app.db.base import Base
+
+
+class QueryStatsRollup(Base):
+    __tablename__ = "query_stats_rollups"
+
+    id = Column(BigInteger, primary_key=True)
+
+    query_id = Column(
+        Integer, ForeignKey("queries.id", ondelete="CASCADE"), nullable=False
+    )
+
+    bucket_start = Column(DateTime(timezone=True), nullable=False)
+    bucket_seconds = Column(Integer, nullable=False)  # 60 = minute, 3600 = hour
+
+    exec_count = Column(Float, nullable=False)
+    sum_ms = Column(Float, nullable=False)
+    sumsq_ms = Column(Float, nullable=False)
+    min_ms = Column(Float, nullable=False)
+    max_ms = Column(Float, nullable=False)
+    rows_returned = Column(BigInteger, nullable=False, default=0)
+
+    histogram = Column(JSONB, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint(
+            "query_id",
+            "bucket_seconds",
+            "bucket_start",
+            name="uq_query_stats_rollups_bucket",
+        ),
+        Index(
+            "ix_query_stats_rollups_bucket_start", "bucket_seconds", "bucket_start"
+        ),
+    )
+
+
+# Conceptual SQL Definition Equivalent:
+"""
+CREATE TABLE query_stats_rollups (
+    id BIGSERIAL PRIMARY KEY,
+    query_id INTEGER NOT NULL REFERENCES queries(id) ON DELETE CASCADE,
+    bucket_start TIMESTAMPTZ NOT NULL,
+    bucket_seconds INTEGER NOT NULL,
+    exec_count FLOAT NOT NULL,
+    sum_ms FLOAT NOT NULL,
+    sumsq_ms FLOAT NOT NULL,
+    min_ms FLOAT NOT NULL,
+    max_ms FLOAT NOT NULL,
+    rows_returned BIGINT NOT NULL DEFAULT 0,
+    histogram JSONB NOT NULL,
+    UNIQUE (query_id, bucket_seconds, bucket_start)
+);
+"""
+
+# Documentation of Columns
+"""
+| Column           | Meaning                                              |
+| ---------------- | ---------------------------------------------------- |
+| `query_id`       | Which query pattern these statistics are for         |
+| `bucket_start`   | Start of the time bucket                             |
+| `bucket_seconds` | Bucket width (60 = minute, 3600 = hour)              |
+| `exec_count`     | Executions in the bucket (sample-weighted)           |
+| `sum_ms`         | Sum of durations — avg = sum_ms / exec_count         |
+| `sumsq_ms`       | Sum of squared durations — for stddev                |
+| `min_ms`         | Fastest execution in the bucket                      |
+| `max_ms`         | Slowest execution in the bucket                      |
+| `rows_returned`  | Total rows returned                                  |
+| `histogram`      | {"<log bucket>": count} — mergeable, gives p50/p95/p99 |
+"""
@@ -1,18 +1,112 @@
 """
 This function finds the most important slow queries to focus on:
 and runs EXPLAIN ANALYZE on each of them to understand why they're slow.
+
+The EXPLAINs run concurrently under per-statement and overall time
+limits, and queries whose plan hasn't changed since their last analysis
+are not re-run (see app/analysis/explain_runner.py).
 """
 
+import logging
+from datetime import timedelta
+from typing import Optional
+
+from sqlalchemy import select, update
+
 from app.analysis.candidates import get_slow_query_candidates
-from app.analysis.explain import run_explain_analyze
+from app.analysis.explain import ANALYSIS_STATEMENT_TIMEOUT_MS, PLAN_SHAPE_TTL
+from app.analysis.explain_runner import (
+    ANALYSIS_BUDGET_S,
+    AnalysisSummary,
+    run_explain_batch,
+)
+from app.analysis.plan_features import extract_plan_features
+from app.db.session import ANALYSIS_WORKERS, get_session
+from app.models import QueryAnalysis
+
+logger = logging.getLogger(__name__)
+
 
+BACKFILL_BATCH_ROWS = 500  # analyses re-parsed per transaction
 
-def analyze_slow_queries(limit: int = 5):
+
+def analyze_slow_queries(
+    limit: int = 5,
+    metric: str = "avg",
+    window: Optional[timedelta] = None,
+    workers: int = ANALYSIS_WORKERS,
+    statement_timeout_ms: int = ANALYSIS_STATEMENT_TIMEOUT_MS,
+    budget_s: float = ANALYSIS_BUDGET_S,
+    plan_shape_ttl: Optional[timedelta] = PLAN_SHAPE_TTL,
+) -> AnalysisSummary:
     """
     Entry point to analyze slow query candidates.
+
+    `metric` / `window` choose how candidates are ranked
+    (see get_slow_query_candidates), e.g. metric="p99", window=timedelta(hours=1).
+    The slowest candidates start first, so a spent budget drops the least
+    important ones. Pass plan_shape_ttl=None to re-analyze every
+    candidate even if its plan is unchanged.
+    """
+
+    candidates = get_slow_query_candidates(limit, metric=metric, window=window)
+
+    return run_explain_batch(
+        [(query.id, query.raw_example_sql) for query, _, _ in candidates],
+        workers=workers,
+        statement_timeout_ms=statement_timeout_ms,
+        budget_s=budget_s,
+        plan_shape_ttl=plan_shape_ttl,
+    )
+
+
+def backfill_plan_features(batch_rows: int = BACKFILL_BATCH_ROWS) -> int:
     """
+    Extract plan features for analyses stored before they were recorded.
+
+    Rows are parsed from plan_json in id order, one transaction per batch,
+    so an interrupted run resumes where it stopped.
+
+    Returns:
+        int: Analyses updated.
+    """
+    updated = 0
+    last_id = 0
+    session = get_session()
+    try:
+        while True:
+            rows = session.execute(
+                select(QueryAnalysis.id, QueryAnalysis.plan_json)
+                .where(
+                    QueryAnalysis.node_type_counts.is_(None),
+                    QueryAnalysis.id > last_id,
+                )
+                .order_by(QueryAnalysis.id)
+                .limit(batch_rows)
+            ).all()
+            if not rows:
+                break
+
+            # ORM bulk UPDATE by primary key: one executemany per batch
+            session.execute(
+                update(QueryAnalysis),
+                [
+                    {"id": row.id, **extract_plan_features(row.plan_json)._asdict()}
+                    for row in rows
+                ],
+            )
+            session.commit()
+
+            updated += len(rows)
+            last_id = rows[-1].id
+
+        if updated:
+            logger.info("Backfilled plan features for %d analyses", updated)
+        return updated
 
-    candidates = get_slow_query_candidates(limit)
+    except Exception:
+        session.rollback()
+        raise
 
-    for query, avg_duration, exec_count in candidates:
-        run_explain_analyze(query_id=query.id, sql_stmt=query.raw_example_sql)
+    finally:
+        session.close()
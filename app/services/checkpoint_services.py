@@ -0,0 +1,80 @@
+"""
+High-water marks for incremental jobs over query_executions.
+
+Jobs process executions by id range: (checkpoint.position, target].
+Ids come from a sequence and are handed out before the inserting
+transaction commits, so "the largest id visible right now" is not safe —
+a smaller id may still be in flight. Instead the target is a sequence
+snapshot taken on an earlier run (pending_position) that is at least
+`safety_lag` old; by then every transaction that drew an id below it has
+committed or rolled back.
+
+What bounds those transactions: profiler and shipper connections cap
+every statement (statement_timeout) and every pause between statements
+(idle_in_transaction_session_timeout), see app/db/session.py. A write
+transaction runs a handful of statements, so it ends within a few times
+(statement + idle timeout); the safety lag must stay above that. Rows
+inserted through other connections (by hand, other tools) are not
+bounded and can be missed if their transaction outlives the lag.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+
+from app.models import JobCheckpoint
+
+
+EXECUTION_ID_SEQUENCE = "query_executions_id_seq"
+
+
+def claim_checkpoint(session, name: str) -> JobCheckpoint:
+    """
+    Load (creating if needed) and row-lock a job's checkpoint.
+
+    The lock is held until the caller commits, so two runs of the same job
+    never process the same range concurrently.
+    """
+    session.execute(
+        insert(JobCheckpoint)
+        .values(name=name, position=0)
+        .on_conflict_do_nothing(index_elements=["name"])
+    )
+    return (
+        session.query(JobCheckpoint)
+        .filter(JobCheckpoint.name == name)
+        .with_for_update()
+        .one()
+    )
+
+
+def ready_position(session, checkpoint: JobCheckpoint, safety_lag: timedelta) -> int:
+    """
+    Return the id up to which the job may process now (>= checkpoint.position).
+
+    Takes a new sequence snapshot once the previous one has been reached;
+    a snapshot becomes usable after `safety_lag`. Caller commits.
+    """
+    now = datetime.now(timezone.utc)
+    pending = checkpoint.pending_position
+
+    if pending is None or (
+        checkpoint.pending_since <= now - safety_lag and checkpoint.position >= pending
+    ):
+        checkpoint.pending_position = _last_issued_id(session)
+        checkpoint.pending_since = now
+        pending = checkpoint.pending_position
+
+    if checkpoint.pending_since <= now - safety_lag:
+        return max(checkpoint.position, pending)
+    return checkpoint.position
+
+
+def _last_issued_id(session) -> int:
+    return session.execute(
+        text(
+            "SELECT CASE WHEN is_called THEN last_value ELSE last_value - 1 END "
+            f"FROM {EXECUTION_ID_SEQUENCE}"
+        )
+    ).scalar()
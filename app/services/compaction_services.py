@@ -0,0 +1,153 @@
+"""
+Downsampling compactor for old raw executions.
+
+Raw query_executions rows older than COMPACT_AFTER_DAYS are deleted
+once their statistics live on in query_stats_rollups (minute and hour
+rows: count, sum, min, max, histogram), so trend history survives while
+the raw table stays small.
+
+How it stays correct:
+- rows are folded into rollups by the incremental rollup job
+  (rollup_services.run_rollups), which the compactor runs first; the
+  compactor only ever deletes ids at or below that job's high-water
+  mark, so every deleted row is already counted — exactly once
+- it walks the table in primary-key order, one chunk per transaction,
+  and stores the last compacted id in job_checkpoints: an interrupted
+  run resumes where it stopped
+- a chunk ends just before the first row that is not old enough yet
+  (late-arriving or backfilled rows can be younger than ids after them),
+  so the checkpoint never moves past a row that still needs compacting
+- it sleeps between chunks so it uses at most COMPACT_DUTY_CYCLE of the
+  store's time
+
+executemany batches are not rolled up (see rollup_services), so they are
+left to partition retention (partition_services).
+"""
+
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import text
+
+from app.db.session import get_session
+from app.models import JobCheckpoint
+from app.services.checkpoint_services import claim_checkpoint
+from app.services.rollup_services import ROLLUP_JOB, run_rollups
+
+logger = logging.getLogger(__name__)
+
+
+COMPACT_JOB = "compact_executions"
+COMPACT_AFTER_DAYS = 3  # raw rows older than this are compacted
+COMPACT_CHUNK_ROWS = 10_000  # rows deleted per transaction
+COMPACT_DUTY_CYCLE = 0.25  # share of wall time spent working; rest is sleep
+COMPACT_MAX_SECONDS = 300.0  # stop (and resume next run) after this long
+
+
+# Upper id of the next chunk: the next COMPACT_CHUNK_ROWS rows past the
+# checkpoint, never beyond what the rollup job has already folded in, cut
+# short before the first one younger than the cutoff
+_CHUNK_END_SQL = text(
+    """
+    SELECT coalesce(min(id) FILTER (WHERE executed_at >= :cutoff) - 1, max(id))
+    FROM (
+        SELECT id, executed_at FROM query_executions
+        WHERE id > :position AND id <= :rolled_up
+        ORDER BY id
+        LIMIT :chunk_rows
+    ) AS chunk
+    """
+)
+
+_DELETE_CHUNK_SQL = text(
+    """
+    DELETE FROM query_executions
+    WHERE id > :position AND id <= :end_id
+      AND executed_at < :cutoff
+      AND batch_size = 1
+    """
+)
+
+
+def compact_chunk(session, cutoff: datetime, chunk_rows: int) -> Optional[int]:
+    """
+    Delete the next chunk of old, already rolled-up executions.
+
+    Args:
+        session: Active SQLAlchemy session (caller commits).
+    Returns:
+        Optional[int]: Rows deleted, or None when there is nothing left.
+    """
+    checkpoint = claim_checkpoint(session, COMPACT_JOB)
+    rolled_up = (
+        session.query(JobCheckpoint.position)
+        .filter(JobCheckpoint.name == ROLLUP_JOB)
+        .scalar()
+    ) or 0
+
+    end_id = session.execute(
+        _CHUNK_END_SQL,
+        {
+            "position": checkpoint.position,
+            "rolled_up": rolled_up,
+            "cutoff": cutoff,
+            "chunk_rows": chunk_rows,
+        },
+    ).scalar()
+    if end_id is None or end_id <= checkpoint.position:
+        return None  # nothing rolled up yet, or the next row is still too young
+
+    deleted = session.execute(
+        _DELETE_CHUNK_SQL,
+        {"position": checkpoint.position, "end_id": end_id, "cutoff": cutoff},
+    ).rowcount
+
+    checkpoint.position = end_id
+    return deleted
+
+
+def run_compaction(
+    after_days: int = COMPACT_AFTER_DAYS,
+    chunk_rows: int = COMPACT_CHUNK_ROWS,
+    duty_cycle: float = COMPACT_DUTY_CYCLE,
+    max_seconds: float = COMPACT_MAX_SECONDS,
+) -> int:
+    """
+    Entry point: fold pending executions into rollups, then delete old raw rows.
+
+    Returns:
+        int: Number of raw execution rows deleted.
+    """
+    run_rollups()
+
+    cutoff = datetime.now(timezone.utc) - timedelta(days=after_days)
+    deadline = time.monotonic() + max_seconds
+    total = 0
+
+    session = get_session()
+    try:
+        while time.monotonic() < deadline:
+            started = time.monotonic()
+            deleted = compact_chunk(session, cutoff, chunk_rows)
+            session.commit()
+            if deleted is None:
+                break
+
+            total += deleted
+
+            # Throttle: work for `elapsed`, then rest so work is duty_cycle of the time
+            elapsed = time.monotonic() - started
+            time.sleep(elapsed * (1 - duty_cycle) / duty_cycle)
+
+        if total:
+            logger.info("Compacted %d raw executions older than %s", total, cutoff)
+        return total
+
+    except Exception:
+        session.rollback()
+        raise
+
+    finally:
+        session.close()
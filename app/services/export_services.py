@@ -0,0 +1,159 @@
+"""
+Columnar (Parquet) export of query_executions for offline analysis.
+
+Heavy offline work — trend fits, cross-fingerprint correlation, capacity
+planning — should not run against the live table. export_executions()
+streams executions out of Postgres in time-bounded chunks and writes one
+Parquet file per UTC day:
+
+    <root>/date=2026-01-02/executions.parquet
+
+Each chunk becomes one row group, so memory stays bounded by the chunk
+size whatever the day's volume. Files are written to a temporary name and
+renamed, so readers never see a half-written day and re-exporting a day
+replaces it. Read them back with app/analysis/offline.py.
+
+Requires the optional `pyarrow` package.
+"""
+
+import logging
+import os
+from datetime import date, datetime, time, timedelta, timezone
+from typing import List, Optional
+
+from sqlalchemy import text
+
+from app.db.session import get_session
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency: pip install pyarrow
+    pa = pq = None
+
+logger = logging.getLogger(__name__)
+
+
+EXPORT_CHUNK = timedelta(hours=1)  # executions fetched (and row group) per query
+EXPORT_FETCH_ROWS = 50_000  # rows per fetchmany() from the server-side cursor
+
+# Missing row counts are exported as -1 so every column is null-free and
+# can be memory-mapped straight into NumPy without a copy.
+UNKNOWN_ROWS = -1
+
+
+def _schema():
+    return pa.schema(
+        [
+            ("query_id", pa.int32()),
+            ("executed_at", pa.timestamp("us", tz="UTC")),
+            ("duration_ms", pa.float64()),
+            ("rows_returned", pa.int64()),
+            ("rows_affected", pa.int64()),
+            ("sample_weight", pa.float64()),
+            ("batch_size", pa.int32()),
+        ]
+    )
+
+
+_CHUNK_SQL = text(
+    f"""
+    SELECT
+        query_id,
+        executed_at,
+        duration_ms,
+        coalesce(rows_returned, {UNKNOWN_ROWS}) AS rows_returned,
+        coalesce(rows_affected, {UNKNOWN_ROWS}) AS rows_affected,
+        sample_weight,
+        batch_size
+    FROM query_executions
+    WHERE executed_at >= :start AND executed_at < :end
+    ORDER BY executed_at
+    """
+)
+
+
+def day_path(root: str, day: date) -> str:
+    return os.path.join(root, f"date={day.isoformat()}", "executions.parquet")
+
+
+def export_executions(
+    root: str,
+    since: date,
+    until: Optional[date] = None,
+    chunk: timedelta = EXPORT_CHUNK,
+) -> List[str]:
+    """
+    Export executions for every UTC day in [since, until) to Parquet.
+
+    Args:
+        root (str): Output directory (created if needed).
+        since (date): First day to export.
+        until (Optional[date]): Day after the last one; defaults to today,
+            so the still-growing current day is never exported.
+        chunk (timedelta): Time span fetched per query / written per row group.
+    Returns:
+        List[str]: Paths of the files written.
+    """
+    if pq is None:
+        raise ImportError("Parquet export requires pyarrow: pip install pyarrow")
+
+    until = until or datetime.now(timezone.utc).date()
+    written = []
+
+    session = get_session()
+    try:
+        day = since
+        while day < until:
+            rows = _export_day(session, root, day, chunk)
+            if rows:
+                written.append(day_path(root, day))
+                logger.info("Exported %d executions for %s", rows, day)
+            day += timedelta(days=1)
+
+        return written
+
+    finally:
+        session.close()
+
+
+def _export_day(session, root: str, day: date, chunk: timedelta) -> int:
+    path = day_path(root, day)
+    tmp_path = path + ".tmp"
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    schema = _schema()
+    names = schema.names
+    start = datetime.combine(day, time.min, tzinfo=timezone.utc)
+    day_end = start + timedelta(days=1)
+    total = 0
+
+    with pq.ParquetWriter(tmp_path, schema, compression="zstd") as writer:
+        while start < day_end:
+            end = min(start + chunk, day_end)
+            result = session.execute(
+                _CHUNK_SQL,
+                {"start": start, "end": end},
+                execution_options={"stream_results": True},
+            )
+
+            columns = {name: [] for name in names}
+            while True:
+                batch = result.fetchmany(EXPORT_FETCH_ROWS)
+                if not batch:
+                    break
+                for row in batch:
+                    for name, value in zip(names, row):
+                        columns[name].append(value)
+
+            rows = len(columns["query_id"])
+            if rows:
+                writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+                total += rows
+            start = end
+
+    if total:
+        os.replace(tmp_path, path)
+    else:
+        os.remove(tmp_path)
+    return total
@@ -0,0 +1,79 @@
+"""
+Retention for captured bind-parameter samples.
+
+The writer appends the slowest executions' parameters every flush
+interval (app/instrumentation/param_samples.py); only a few per query are
+ever used. trim_param_samples() deletes samples older than
+PARAM_SAMPLE_MAX_AGE and, per query, all but the
+PARAM_SAMPLES_PER_FINGERPRINT slowest. Run it with the other maintenance
+jobs (scripts/run_maintenance.py).
+"""
+
+import logging
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, func, select
+
+from app.db.session import get_session
+from app.instrumentation.param_samples import (
+    PARAM_SAMPLE_MAX_AGE,
+    PARAM_SAMPLES_PER_FINGERPRINT,
+)
+from app.models import QueryParamSample
+
+logger = logging.getLogger(__name__)
+
+
+def trim_param_samples(
+    keep_per_query: int = PARAM_SAMPLES_PER_FINGERPRINT,
+    max_age: timedelta = PARAM_SAMPLE_MAX_AGE,
+) -> int:
+    """
+    Entry point: delete expired samples and all but the slowest per query.
+
+    Returns:
+        int: Samples deleted.
+    """
+    session = get_session()
+    try:
+        cutoff = datetime.now(timezone.utc) - max_age
+        expired = session.execute(
+            delete(QueryParamSample).where(QueryParamSample.captured_at < cutoff)
+        ).rowcount
+
+        ranked = select(
+            QueryParamSample.id,
+            func.row_number()
+            .over(
+                partition_by=QueryParamSample.query_id,
+                order_by=(
+                    QueryParamSample.duration_ms.desc(),
+                    QueryParamSample.id.desc(),
+                ),
+            )
+            .label("rank"),
+        ).subquery()
+        surplus = session.execute(
+            delete(QueryParamSample).where(
+                QueryParamSample.id.in_(
+                    select(ranked.c.id).where(ranked.c.rank > keep_per_query)
+                )
+            )
+        ).rowcount
+
+        session.commit()
+
+        if expired or surplus:
+            logger.info(
+                "Trimmed %d expired and %d surplus parameter samples",
+                expired,
+                surplus,
+            )
+        return expired + surplus
+
+    except Exception:
+        session.rollback()
+        raise
+
+    finally:
+        session.close()
@@ -0,0 +1,311 @@
+"""
+Partition maintenance for query_executions.
+
+query_executions is range-partitioned on executed_at, one partition per
+UTC day, named query_executions_pYYYYMMDD, plus a DEFAULT partition that
+catches anything no daily partition covers.
+
+- ensure_partitions() creates the next few days ahead of time, so writes
+  never land in the default partition
+- split_default_partition() moves rows of past days that did land there
+  (late or backfilled executions) into daily partitions of their own
+- drop_expired_partitions() drops (or detaches) whole days past the
+  retention window: retention is a metadata operation, not a DELETE.
+  Expired rows still sitting in the default partition are deleted (or,
+  when detaching, moved into that day's detached table)
+
+A detached day keeps its query_executions_pYYYYMMDD name, so expired days
+are never split out again: their late rows go through retention instead.
+
+Run periodically, e.g. from scripts/run_maintenance.py.
+"""
+
+import logging
+import os
+import re
+from datetime import date, datetime, time, timedelta, timezone
+from typing import List
+
+from sqlalchemy import text
+
+from app.db.session import get_session
+
+logger = logging.getLogger(__name__)
+
+
+PARENT_TABLE = "query_executions"
+DEFAULT_PARTITION = "query_executions_default"
+PARTITION_PREMAKE_DAYS = 3  # daily partitions kept ready ahead of today
+PARTITION_RETENTION_DAYS = int(os.getenv("PROFILER_RETENTION_DAYS", "14"))
+
+_PARTITION_NAME = re.compile(r"^query_executions_p(\d{8})$")
+
+
+def partition_name(day: date) -> str:
+    return f"{PARENT_TABLE}_p{day:%Y%m%d}"
+
+
+def _day_bounds(day: date):
+    start = datetime.combine(day, time.min, tzinfo=timezone.utc)
+    return start, start + timedelta(days=1)
+
+
+def list_partitions(session) -> List[date]:
+    """Days that currently have a daily partition, oldest first."""
+    names = session.execute(
+        text(
+            """
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = :parent
+            """
+        ),
+        {"parent": PARENT_TABLE},
+    ).scalars()
+
+    days = []
+    for name in names:
+        match = _PARTITION_NAME.match(name)
+        if match:
+            days.append(datetime.strptime(match.group(1), "%Y%m%d").date())
+    return sorted(days)
+
+
+def ensure_partitions(session, days_ahead: int = PARTITION_PREMAKE_DAYS) -> List[str]:
+    """
+    Create missing daily partitions from today to `days_ahead` days ahead.
+
+    Rows that already landed in the default partition for a day being
+    created are moved into the new partition (Postgres refuses to create
+    a partition whose range overlaps rows in DEFAULT).
+
+    Args:
+        session: Active SQLAlchemy session (caller commits).
+    Returns:
+        List[str]: Names of the partitions created.
+    """
+    existing = set(list_partitions(session))
+    today = datetime.now(timezone.utc).date()
+
+    created = []
+    for offset in range(days_ahead + 1):
+        day = today + timedelta(days=offset)
+        if day in existing:
+            continue
+        _create_partition(session, day)
+        created.append(partition_name(day))
+
+    return created
+
+
+def _create_partition(session, day: date) -> None:
+    name = partition_name(day)
+    start, end = _day_bounds(day)
+    bounds = {"start": start, "end": end}
+
+    stray = session.execute(
+        text(
+            f"SELECT count(*) FROM {DEFAULT_PARTITION} "
+            "WHERE executed_at >= :start AND executed_at < :end"
+        ),
+        bounds,
+    ).scalar()
+
+    if not stray:
+        session.execute(
+            text(
+                f"CREATE TABLE {name} PARTITION OF {PARENT_TABLE} "
+                f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+            )
+        )
+        return
+
+    # Build the partition standalone, move the stray rows in, then attach
+    logger.warning("Moving %d rows for %s out of the default partition", stray, day)
+    session.execute(
+        text(
+            f"CREATE TABLE {name} "
+            f"(LIKE {PARENT_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        )
+    )
+    session.execute(
+        text(
+            f"WITH moved AS ("
+            f"  DELETE FROM {DEFAULT_PARTITION} "
+            f"  WHERE executed_at >= :start AND executed_at < :end RETURNING *"
+            f") INSERT INTO {name} SELECT * FROM moved"
+        ),
+        bounds,
+    )
+    session.execute(
+        text(
+            f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {name} "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        )
+    )
+
+
+def split_default_partition(
+    session, retention_days: int = PARTITION_RETENTION_DAYS
+) -> List[str]:
+    """
+    Move rows of past days out of the default partition into daily ones.
+
+    Without this, the default partition keeps every late or backfilled
+    row forever: retention only drops daily partitions. Today and later
+    are left to ensure_partitions(), expired days to
+    drop_expired_partitions(). A day whose table name is already taken
+    (a partition detached earlier, before retention_days was raised) is
+    skipped; its rows stay in the default partition until they expire.
+
+    Args:
+        session: Active SQLAlchemy session (caller commits).
+    Returns:
+        List[str]: Names of the partitions created.
+    """
+    today_start, _ = _day_bounds(datetime.now(timezone.utc).date())
+    days = session.execute(
+        text(
+            f"SELECT DISTINCT (executed_at AT TIME ZONE 'UTC')::date "
+            f"FROM {DEFAULT_PARTITION} "
+            f"WHERE executed_at >= :expired_before AND executed_at < :today_start"
+        ),
+        {"expired_before": _expired_before(retention_days), "today_start": today_start},
+    ).scalars()
+
+    created = []
+    for day in sorted(days):
+        name = partition_name(day)
+        if _table_exists(session, name):
+            logger.warning(
+                "Leaving %s rows in the default partition: %s already exists", day, name
+            )
+            continue
+        _create_partition(session, day)
+        created.append(name)
+    return created
+
+
+def drop_expired_partitions(
+    session, retention_days: int = PARTITION_RETENTION_DAYS, detach_only: bool = False
+) -> List[str]:
+    """
+    Drop daily partitions that end before now - retention_days, and
+    expire rows of those days left in the default partition.
+
+    Args:
+        session: Active SQLAlchemy session (caller commits).
+        detach_only (bool): Detach instead of dropping, leaving the tables
+            in place for archiving.
+    Returns:
+        List[str]: Names of the partitions dropped (or detached).
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+
+    expired = []
+    for day in list_partitions(session):
+        _, end = _day_bounds(day)
+        if end > cutoff:
+            break  # sorted: everything after is newer
+
+        name = partition_name(day)
+        if detach_only:
+            session.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+        else:
+            session.execute(text(f"DROP TABLE {name}"))
+        expired.append(name)
+
+    _expire_default_rows(session, retention_days, detach_only)
+    return expired
+
+
+def _expired_before(retention_days: int) -> datetime:
+    """Start of the oldest day still inside the retention window."""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+    start, _ = _day_bounds(cutoff.date())
+    return start
+
+
+def _table_exists(session, name: str) -> bool:
+    return session.execute(
+        text("SELECT to_regclass(:name) IS NOT NULL"), {"name": name}
+    ).scalar()
+
+
+def _expire_default_rows(session, retention_days: int, detach_only: bool) -> None:
+    expired_before = _expired_before(retention_days)
+
+    if not detach_only:
+        deleted = session.execute(
+            text(f"DELETE FROM {DEFAULT_PARTITION} WHERE executed_at < :expired_before"),
+            {"expired_before": expired_before},
+        ).rowcount
+        if deleted:
+            logger.info("Deleted %d expired rows from the default partition", deleted)
+        return
+
+    # Detaching: archive each day's rows next to its detached partition
+    days = session.execute(
+        text(
+            f"SELECT DISTINCT (executed_at AT TIME ZONE 'UTC')::date "
+            f"FROM {DEFAULT_PARTITION} WHERE executed_at < :expired_before"
+        ),
+        {"expired_before": expired_before},
+    ).scalars()
+
+    for day in sorted(days):
+        name = partition_name(day)
+        start, end = _day_bounds(day)
+        session.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS {name} "
+                f"(LIKE {PARENT_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+            )
+        )
+        session.execute(
+            text(
+                f"WITH moved AS ("
+                f"  DELETE FROM {DEFAULT_PARTITION} "
+                f"  WHERE executed_at >= :start AND executed_at < :end RETURNING *"
+                f") INSERT INTO {name} SELECT * FROM moved"
+            ),
+            {"start": start, "end": end},
+        )
+
+
+def run_partition_maintenance(
+    days_ahead: int = PARTITION_PREMAKE_DAYS,
+    retention_days: int = PARTITION_RETENTION_DAYS,
+    detach_only: bool = False,
+):
+    """
+    Entry point: create upcoming partitions, split past days out of the
+    default partition, and expire old ones.
+
+    Each step commits on its own, so a failure further down (e.g. while
+    splitting the default partition) never undoes the partitions
+    ensure_partitions() created for upcoming writes.
+
+    Returns:
+        Tuple[List[str], List[str]]: (created, expired) partition names.
+    """
+    session = get_session()
+    try:
+        created = ensure_partitions(session, days_ahead)
+        session.commit()
+
+        created += split_default_partition(session, retention_days)
+        session.commit()
+
+        expired = drop_expired_partitions(session, retention_days, detach_only)
+        session.commit()
+        return created, expired
+
+    except Exception:
+        session.rollback()
+        raise
+
+    finally:
+        session.close()
@@ -0,0 +1,119 @@
+"""
+Fingerprint lookups on the `queries` table.
+
+Every lookup goes through the fixed-width `fingerprint_hash` index;
+the normalized text is compared only to rule out a hash collision.
+
+New fingerprints are registered with INSERT ... ON CONFLICT DO NOTHING,
+so two writers that meet the same new fingerprint at the same moment
+both end up with its id — neither sees a unique violation.
+"""
+
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.instrumentation.cardinality import OVERFLOW_PREFIX
+from app.instrumentation.profiler import fingerprint_hash
+from app.models import Query
+
+
+def find_query_by_fingerprint(session, normalized_sql: str) -> Optional[Query]:
+    """
+    Resolve a normalized SQL fingerprint to its Query row (or None).
+
+    Args:
+        session: Active SQLAlchemy session.
+        normalized_sql (str): Output of normalize_sql().
+    """
+    return (
+        session.query(Query)
+        .filter(Query.fingerprint_hash == fingerprint_hash(normalized_sql))
+        .filter(Query.normalized_sql == normalized_sql)  # collision check only
+        .one_or_none()
+    )
+
+
+def register_fingerprints(session, examples: Dict[str, str]) -> Dict[str, int]:
+    """
+    Return the query_id of every fingerprint, creating the missing ones.
+
+    One multi-row upsert inserts the new fingerprints; rows another
+    writer created first are skipped by ON CONFLICT and read back by a
+    plain SELECT. Existing rows are never locked. The caller owns the
+    transaction (nothing is committed here).
+
+    Args:
+        examples (Dict[str, str]): normalized_sql → one raw example statement.
+    """
+    if not examples:
+        return {}
+
+    hashes = {sql: fingerprint_hash(sql) for sql in examples}
+    rows = [
+        {
+            "normalized_sql": normalized_sql,
+            "fingerprint_hash": hashes[normalized_sql],
+            "raw_example_sql": raw_sql,
+            "total_executions": 0,
+        }
+        # Hash order: concurrent registrations wait on each other in one order
+        for normalized_sql, raw_sql in sorted(
+            examples.items(), key=lambda item: hashes[item[0]]
+        )
+    ]
+
+    # Same upsert on the central store and the local one (local_store.py)
+    dialect = sqlite if session.get_bind().dialect.name == "sqlite" else postgresql
+    stmt = (
+        dialect.insert(Query)
+        .values(rows)
+        .on_conflict_do_nothing(
+            index_elements=[Query.fingerprint_hash, func.md5(Query.normalized_sql)]
+        )
+        .returning(Query.normalized_sql, Query.id)
+    )
+    query_ids = {
+        normalized_sql: query_id for normalized_sql, query_id in session.execute(stmt)
+    }
+
+    missing = [sql for sql in examples if sql not in query_ids]
+    if missing:
+        existing = session.execute(
+            select(Query.normalized_sql, Query.id).where(
+                Query.fingerprint_hash.in_({hashes[sql] for sql in missing})
+            )
+        )
+        query_ids.update(
+            (normalized_sql, query_id)
+            for normalized_sql, query_id in existing
+            if normalized_sql in examples  # collision check only
+        )
+
+    return query_ids
+
+
+def get_or_create_query_id(session, normalized_sql: str, raw_sql: str) -> int:
+    """
+    Return the id of the Query for this fingerprint, creating it if new.
+
+    The caller owns the transaction; a new row is inserted, not committed.
+    """
+    return register_fingerprints(session, {normalized_sql: raw_sql})[normalized_sql]
+
+
+def find_overflow_queries(session, limit: int = 20) -> List[Query]:
+    """
+    Overflow fingerprints written by the cardinality governor, busiest first.
+
+    Each stands for many distinct fingerprints of one shape that arrived
+    past their source's budget; raw_example_sql shows one of them.
+    """
+    return (
+        session.query(Query)
+        .filter(Query.normalized_sql.startswith(OVERFLOW_PREFIX))
+        .order_by(Query.total_executions.desc())
+        .limit(limit)
+        .all()
+    )
@@ -0,0 +1,95 @@
+"""
+Regression detection service.
+
+Runs the vectorized change-point detector over every fingerprint's hourly
+latency, records new regressions in query_regressions and immediately
+runs EXPLAIN on the regressed queries — they don't have to climb the
+average-latency ranking (analyze_slow_queries) to get looked at.
+"""
+
+import logging
+from datetime import timedelta
+from typing import List
+
+from sqlalchemy.dialects.postgresql import insert
+
+from app.analysis.explain_runner import run_explain_batch
+from app.analysis.regression import (
+    REGRESSION_LOOKBACK,
+    Regression,
+    detect_regressions,
+    load_hourly_series,
+)
+from app.db.session import get_session
+from app.models import Query, QueryRegression
+
+logger = logging.getLogger(__name__)
+
+
+def record_regressions(session, regressions: List[Regression]) -> List[int]:
+    """
+    Insert regressions, skipping steps that were already recorded.
+
+    Args:
+        session: Active SQLAlchemy session (caller commits).
+    Returns:
+        List[int]: query_ids of the newly recorded regressions.
+    """
+    if not regressions:
+        return []
+
+    stmt = (
+        insert(QueryRegression)
+        .values([regression._asdict() for regression in regressions])
+        .on_conflict_do_nothing(constraint="uq_query_regressions_change")
+        .returning(QueryRegression.query_id)
+    )
+    return list(session.execute(stmt).scalars())
+
+
+def detect_and_explain_regressions(
+    lookback: timedelta = REGRESSION_LOOKBACK,
+) -> List[Regression]:
+    """
+    Entry point: detect latency regressions and EXPLAIN the new ones.
+
+    Returns:
+        List[Regression]: Regressions recorded by this run.
+    """
+    session = get_session()
+    try:
+        regressions = detect_regressions(load_hourly_series(session, lookback))
+        new_ids = set(record_regressions(session, regressions))
+        session.commit()
+
+        recorded = [r for r in regressions if r.query_id in new_ids]
+        queries = (
+            session.query(Query).filter(Query.id.in_(new_ids)).all() if new_ids else []
+        )
+
+    except Exception:
+        session.rollback()
+        raise
+
+    finally:
+        session.close()
+
+    for regression in recorded:
+        logger.info(
+            "Latency regression: query_id=%s %.1f ms → %.1f ms at %s (score %.1f)",
+            regression.query_id,
+            regression.before_ms,
+            regression.after_ms,
+            regression.changed_at,
+            regression.score,
+        )
+
+    if queries:
+        # Always re-run: the latency moved, so a same-shaped plan still has
+        # new timings (and no shape change is itself a finding)
+        run_explain_batch(
+            [(query.id, query.raw_example_sql) for query in queries],
+            plan_shape_ttl=None,
+        )
+
+    return recorded
@@ -0,0 +1,253 @@
+"""
+Writes execution statistics into query_stats_rollups.
+
+Rollup rows are merged, never overwritten: counts and sums add up,
+min/max take the extremes, and histograms are summed bucket by bucket
+inside Postgres. Any number of processes can flush the same
+(query_id, bucket) concurrently without a read-modify-write cycle.
+
+Rollups are kept at two granularities, minute and hour. They come from:
+- the in-process aggregator (aggregate capture mode), and
+- run_rollups(), an incremental job that folds raw query_executions
+  newer than its high-water mark (see checkpoint_services)
+
+Only single-statement executions are rolled up; executemany batches
+are ranked from raw executions (see candidates.get_batch_query_candidates).
+"""
+
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+from sqlalchemy import func, literal_column, text
+from sqlalchemy.dialects.postgresql import insert
+
+from app.analysis.histogram import (
+    LOG_GAMMA,
+    MIN_TRACKED_MS,
+    ZERO_BUCKET,
+    LatencyHistogram,
+)
+from app.db.session import get_session
+from app.models import QueryStatsRollup
+from app.services.checkpoint_services import claim_checkpoint, ready_position
+
+logger = logging.getLogger(__name__)
+
+
+MINUTE = 60
+HOUR = 3600
+ROLLUP_GRANULARITIES = (MINUTE, HOUR)
+
+ROLLUP_JOB = "rollup_executions"
+ROLLUP_CHUNK_IDS = 200_000  # execution ids folded per transaction
+ROLLUP_SAFETY_LAG = timedelta(seconds=60)  # see checkpoint_services
+
+
+# Sum two flat {"bucket": count} JSONB histograms key by key
+_MERGED_HISTOGRAM = literal_column(
+    """(
+        SELECT coalesce(jsonb_object_agg(key, total), '{}'::jsonb)
+        FROM (
+            SELECT key, sum(value::float8) AS total
+            FROM (
+                SELECT * FROM jsonb_each_text(query_stats_rollups.histogram)
+                UNION ALL
+                SELECT * FROM jsonb_each_text(excluded.histogram)
+            ) AS both_sides
+            GROUP BY key
+        ) AS merged
+    )"""
+)
+
+
+def merge_rollups(session, rows: List[Dict]) -> None:
+    """
+    Upsert rollup rows, merging with whatever is already stored.
+
+    Args:
+        session: Active SQLAlchemy session (caller commits).
+        rows (List[Dict]): Column values for QueryStatsRollup, with
+            `histogram` already serialized via LatencyHistogram.to_dict().
+            (query_id, bucket_seconds, bucket_start) must be unique in `rows`.
+    """
+    if not rows:
+        return
+
+    stmt = insert(QueryStatsRollup).values(rows)
+    excluded = stmt.excluded
+    table = QueryStatsRollup.__table__.c
+
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_query_stats_rollups_bucket",
+        set_={
+            "exec_count": table.exec_count + excluded.exec_count,
+            "sum_ms": table.sum_ms + excluded.sum_ms,
+            "sumsq_ms": table.sumsq_ms + excluded.sumsq_ms,
+            "min_ms": func.least(table.min_ms, excluded.min_ms),
+            "max_ms": func.greatest(table.max_ms, excluded.max_ms),
+            "rows_returned": table.rows_returned + excluded.rows_returned,
+            "histogram": _MERGED_HISTOGRAM,
+        },
+    )
+    session.execute(stmt)
+
+
+def coarsen_rollups(rows: List[Dict], bucket_seconds: int = HOUR) -> List[Dict]:
+    """
+    Combine finer rollup rows into `bucket_seconds` rows (e.g. minutes → hour).
+
+    Returns one row per (query_id, coarse bucket), ready for merge_rollups().
+    """
+    coarse: Dict[tuple, Dict] = {}
+    histograms: Dict[tuple, LatencyHistogram] = {}
+
+    for row in rows:
+        epoch = int(row["bucket_start"].timestamp())
+        bucket_start = datetime.fromtimestamp(
+            epoch - epoch % bucket_seconds, tz=timezone.utc
+        )
+        key = (row["query_id"], bucket_start)
+
+        target = coarse.get(key)
+        if target is None:
+            coarse[key] = dict(
+                row, bucket_start=bucket_start, bucket_seconds=bucket_seconds
+            )
+            histograms[key] = LatencyHistogram.from_dict(row["histogram"])
+            continue
+
+        target["exec_count"] += row["exec_count"]
+        target["sum_ms"] += row["sum_ms"]
+        target["sumsq_ms"] += row["sumsq_ms"]
+        target["min_ms"] = min(target["min_ms"], row["min_ms"])
+        target["max_ms"] = max(target["max_ms"], row["max_ms"])
+        target["rows_returned"] += row["rows_returned"]
+        histograms[key].merge(LatencyHistogram.from_dict(row["histogram"]))
+
+    for key, target in coarse.items():
+        target["histogram"] = histograms[key].to_dict()
+
+    return list(coarse.values())
+
+
+# ---------------------------------------------------------------------
+# Incremental rollup job over raw executions
+# ---------------------------------------------------------------------
+# Pre-aggregated in Postgres down to (query, minute, histogram bucket):
+# Python only sees a few rows per fingerprint and minute, never executions
+_MINUTE_BUCKETS_SQL = text(
+    f"""
+    SELECT
+        query_id,
+        floor(extract(epoch FROM executed_at) / {MINUTE})::bigint * {MINUTE} AS bucket_epoch,
+        CASE
+            WHEN duration_ms <= :min_tracked_ms THEN '{ZERO_BUCKET}'
+            ELSE ceil(ln(duration_ms) / :log_gamma)::int::text
+        END AS histogram_key,
+        sum(sample_weight) AS exec_count,
+        sum(duration_ms * sample_weight) AS sum_ms,
+        sum(duration_ms * duration_ms * sample_weight) AS sumsq_ms,
+        min(duration_ms) AS min_ms,
+        max(duration_ms) AS max_ms,
+        coalesce(sum(rows_returned * sample_weight), 0) AS rows_returned
+    FROM query_executions
+    WHERE id > :start_id AND id <= :end_id AND batch_size = 1
+    GROUP BY 1, 2, 3
+    """
+)
+
+
+def rollup_execution_range(session, start_id: int, end_id: int) -> int:
+    """
+    Fold executions with start_id < id <= end_id into minute and hour rollups.
+
+    Args:
+        session: Active SQLAlchemy session (caller commits).
+    Returns:
+        int: Number of minute rollup rows written.
+    """
+    result = session.execute(
+        _MINUTE_BUCKETS_SQL,
+        {
+            "start_id": start_id,
+            "end_id": end_id,
+            "min_tracked_ms": MIN_TRACKED_MS,
+            "log_gamma": LOG_GAMMA,
+        },
+    )
+
+    minutes: Dict[tuple, Dict] = {}
+    histograms: Dict[tuple, LatencyHistogram] = defaultdict(LatencyHistogram)
+
+    for row in result:
+        key = (row.query_id, row.bucket_epoch)
+        histograms[key].add_bucket(row.histogram_key, row.exec_count)
+
+        minute = minutes.get(key)
+        if minute is None:
+            minutes[key] = {
+                "query_id": row.query_id,
+                "bucket_start": datetime.fromtimestamp(
+                    row.bucket_epoch, tz=timezone.utc
+                ),
+                "bucket_seconds": MINUTE,
+                "exec_count": row.exec_count,
+                "sum_ms": row.sum_ms,
+                "sumsq_ms": row.sumsq_ms,
+                "min_ms": row.min_ms,
+                "max_ms": row.max_ms,
+                "rows_returned": int(row.rows_returned),
+            }
+            continue
+
+        minute["exec_count"] += row.exec_count
+        minute["sum_ms"] += row.sum_ms
+        minute["sumsq_ms"] += row.sumsq_ms
+        minute["min_ms"] = min(minute["min_ms"], row.min_ms)
+        minute["max_ms"] = max(minute["max_ms"], row.max_ms)
+        minute["rows_returned"] += int(row.rows_returned)
+
+    for key, minute in minutes.items():
+        minute["histogram"] = histograms[key].to_dict()
+
+    rows = list(minutes.values())
+    merge_rollups(session, rows)
+    merge_rollups(session, coarsen_rollups(rows, HOUR))
+    return len(rows)
+
+
+def run_rollups(
+    safety_lag: timedelta = ROLLUP_SAFETY_LAG, chunk_ids: int = ROLLUP_CHUNK_IDS
+) -> int:
+    """
+    Entry point: fold every execution past the high-water mark into rollups.
+
+    Each chunk is merged and the checkpoint advanced in one transaction,
+    so an interrupted run resumes exactly where it stopped.
+
+    Returns:
+        int: Number of minute rollup rows written.
+    """
+    session = get_session()
+    written = 0
+    try:
+        while True:
+            checkpoint = claim_checkpoint(session, ROLLUP_JOB)
+            target = ready_position(session, checkpoint, safety_lag)
+            if target <= checkpoint.position:
+                session.commit()  # persist a fresh snapshot, release the lock
+                return written
+
+            end_id = min(target, checkpoint.position + chunk_ids)
+            written += rollup_execution_range(session, checkpoint.position, end_id)
+            checkpoint.position = end_id
+            session.commit()
+
+    except Exception:
+        session.rollback()
+        raise
+
+    finally:
+        session.close()
@@ -0,0 +1,223 @@
+"""
+Shipper: local capture store → central Postgres store.
+
+With PROFILER_BACKEND=sqlite the capture layer writes to a local SQLite
+file (app/db/local_store.py). ship_local_store() moves its contents to
+the central store in bulk and truncates what was sent:
+
+- counters: each fingerprint's local total_executions is added centrally,
+  then subtracted locally once that commit succeeded. At-least-once: a
+  crash between the two commits counts them again on the next run (the
+  same trade-off as the spool, see app/instrumentation/spool.py)
+- executions: shipped in id order, SHIP_BATCH_ROWS per central
+  transaction, through the same path as the writer (COPY by default);
+  local query ids are mapped to central ones by normalized SQL
+  (register_fingerprints)
+
+Exactly-once for executions: the last shipped local id is a checkpoint in
+the central job_checkpoints, committed together with the rows. Local rows
+are deleted only after that commit, and anything at or below the
+checkpoint is deleted before shipping resumes — a crash in between never
+sends a row twice. SQLite serializes writers, so local ids become visible
+in order and no safety lag is needed (compare checkpoint_services).
+"""
+
+import logging
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from sqlalchemy import bindparam, delete, select, text, update
+
+from app.db.local_store import local_executions, local_queries, local_store_id
+from app.db.session import PROFILER_BACKEND, get_profiler_session, get_shipper_session
+from app.instrumentation.counters import CounterDelta
+from app.instrumentation.writer import (
+    INGEST_METHOD,
+    ExecutionEvent,
+    apply_execution_counts,
+    insert_executions,
+)
+from app.services.checkpoint_services import claim_checkpoint
+from app.services.query_services import register_fingerprints
+
+logger = logging.getLogger(__name__)
+
+
+SHIP_JOB_PREFIX = "ship_local_store:"  # + local store id
+SHIP_BATCH_ROWS = 10_000  # executions per central transaction
+
+
+def _utc(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes; everything captured is UTC
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _add_local_counts(local, counts: Dict[int, int], sign: int) -> None:
+    local.execute(
+        update(local_queries)
+        .where(local_queries.c.id == bindparam("local_id"))
+        .values(
+            total_executions=local_queries.c.total_executions + bindparam("delta")
+        ),
+        [{"local_id": query_id, "delta": sign * n} for query_id, n in counts.items()],
+    )
+
+
+def ship_counters(local, central) -> int:
+    """
+    Move local total_executions / last_seen_at into the central `queries`.
+
+    Commits both sessions.
+
+    Returns:
+        int: Executions counted.
+    """
+    rows = local.execute(
+        select(
+            local_queries.c.id,
+            local_queries.c.normalized_sql,
+            local_queries.c.raw_example_sql,
+            local_queries.c.total_executions,
+            local_queries.c.last_seen_at,
+        ).where(local_queries.c.total_executions > 0)
+    ).all()
+    local.commit()  # don't hold a SQLite read snapshot over the central write
+    if not rows:
+        return 0
+
+    counts = {row.id: row.total_executions for row in rows}
+    try:
+        query_ids = register_fingerprints(
+            central, {row.normalized_sql: row.raw_example_sql for row in rows}
+        )
+        deltas = {
+            query_ids[row.normalized_sql]: CounterDelta(
+                row.total_executions, _utc(row.last_seen_at)
+            )
+            for row in rows
+        }
+        apply_execution_counts(central, deltas, skip_locked=False)
+        central.commit()
+
+    except Exception:
+        central.rollback()
+        raise
+
+    # Only now take them off locally; subtract rather than zero, so
+    # increments landing meanwhile are kept
+    _add_local_counts(local, counts, -1)
+    local.commit()
+
+    return sum(counts.values())
+
+
+def ship_execution_batch(local, central, job: str, batch_rows: int) -> Optional[int]:
+    """
+    Copy the next batch of local executions to the central store.
+
+    Advances the central checkpoint in the same transaction (caller commits
+    `central`, then calls truncate_shipped()).
+
+    Returns:
+        Optional[int]: Last local id shipped, or None when the local store
+        is drained.
+    """
+    checkpoint = claim_checkpoint(central, job)
+
+    rows = local.execute(
+        select(
+            local_executions,
+            local_queries.c.normalized_sql,
+            local_queries.c.raw_example_sql,
+        )
+        .join(local_queries, local_queries.c.id == local_executions.c.query_id)
+        .where(local_executions.c.id > checkpoint.position)
+        .order_by(local_executions.c.id)
+        .limit(batch_rows)
+    ).all()
+    if not rows:
+        return None
+
+    query_ids = register_fingerprints(
+        central, {row.normalized_sql: row.raw_example_sql for row in rows}
+    )
+    events = [
+        ExecutionEvent(
+            normalized_sql=row.normalized_sql,
+            raw_sql=row.raw_example_sql,
+            executed_at=_utc(row.executed_at),
+            duration_ms=row.duration_ms,
+            rows_returned=row.rows_returned,
+            error=row.error,
+            sample_weight=row.sample_weight,
+            rows_affected=row.rows_affected,
+            batch_size=row.batch_size,
+        )
+        for row in rows
+    ]
+    insert_executions(central, query_ids, events, INGEST_METHOD)
+
+    checkpoint.position = rows[-1].id
+    return checkpoint.position
+
+
+def truncate_shipped(local, position: int) -> int:
+    """Delete local executions the central store has confirmed (id <= position)."""
+    deleted = local.execute(
+        delete(local_executions).where(local_executions.c.id <= position)
+    ).rowcount
+    local.commit()
+    return deleted
+
+
+def ship_local_store(batch_rows: int = SHIP_BATCH_ROWS) -> Dict[str, int]:
+    """
+    Entry point: move everything captured locally to the central store.
+
+    Returns:
+        Dict[str, int]: {"executions": rows shipped, "counted": executions
+        added to central total_executions}.
+    """
+    if PROFILER_BACKEND != "sqlite":
+        raise RuntimeError("Nothing to ship: PROFILER_BACKEND is not 'sqlite'")
+
+    shipped = Counter()
+    local = get_profiler_session()
+    central = get_shipper_session()
+    try:
+        job = SHIP_JOB_PREFIX + local_store_id(local)
+
+        # Rows a previous run shipped but did not get to delete
+        position = claim_checkpoint(central, job).position
+        central.commit()
+        truncate_shipped(local, position)
+
+        shipped["counted"] = ship_counters(local, central)
+
+        while True:
+            position = ship_execution_batch(local, central, job, batch_rows)
+            central.commit()
+            if position is None:
+                break
+            shipped["executions"] += truncate_shipped(local, position)
+
+        # Fold the WAL back into the database file so it stays small
+        local.execute(text("PRAGMA wal_checkpoint(TRUNCATE)"))
+
+        if shipped:
+            logger.info(
+                "Shipped %d executions (%d counted) from the local store",
+                shipped["executions"],
+                shipped["counted"],
+            )
+        return dict(shipped)
+
+    except Exception:
+        central.rollback()
+        local.rollback()
+        raise
+
+    finally:
+        central.close()
+        local.close()
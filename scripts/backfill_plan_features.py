@@ -0,0 +1,13 @@
+import sys
+import os
+
+# Add the root directory to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+from app.services.analysis_services import backfill_plan_features
+
+
+if __name__ == "__main__":
+    updated = backfill_plan_features()
+    print(f"Backfilled plan features for {updated} analyses")
@@ -0,0 +1,88 @@
+# '''Throughput benchmark for execution ingestion (needs the Postgres store).
+# Compares rows/second for:
+# - per-event ORM writes (what the listener did before the buffered writer,
+#   and still does with PROFILER_CAPTURE_MODE=sync)
+# - batched ORM writes (session.add_all → row-by-row INSERTs)
+# - batched COPY FROM STDIN (the default ingest path)
+
+# Benchmark fingerprints are tagged `bench_ingest` and deleted afterwards.
+# '''
+
+import sys
+import os
+
+# Add the root directory to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+import random
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+
+from app.db.session import get_profiler_session
+from app.instrumentation.fingerprint_cache import fingerprint_cache
+from app.instrumentation.writer import BATCH_SIZE, ExecutionEvent, persist_events
+
+
+FINGERPRINTS = 50
+
+
+def build_events(size: int, seed: int = 7):
+    rng = random.Random(seed)
+    events = []
+    for _ in range(size):
+        table = rng.randrange(FINGERPRINTS)
+        sql = f"SELECT * FROM bench_ingest_{table} WHERE id = ?"
+        events.append(
+            ExecutionEvent(
+                normalized_sql=sql,
+                raw_sql=sql.replace("?", str(rng.randint(1, 10_000))),
+                executed_at=datetime.now(timezone.utc),
+                duration_ms=rng.lognormvariate(1.0, 1.0),
+                rows_returned=rng.randint(0, 5),
+            )
+        )
+    return events
+
+
+def cleanup():
+    session = get_profiler_session()
+    try:
+        session.execute(
+            text("DELETE FROM queries WHERE normalized_sql LIKE '%bench_ingest_%'")
+        )
+        session.commit()
+    finally:
+        session.close()
+    fingerprint_cache.clear()
+
+
+def bench(label: str, events, batch_size: int, method: str) -> float:
+    cleanup()
+    start = time.perf_counter()
+    for i in range(0, len(events), batch_size):
+        persist_events(events[i : i + batch_size], method=method)
+    elapsed = time.perf_counter() - start
+
+    rate = len(events) / elapsed
+    print(f"{label:<30} {rate:>12,.0f} rows/s   {elapsed:>7.2f} s")
+    return rate
+
+
+if __name__ == "__main__":
+    events = build_events(size=50_000)
+    per_event = build_events(size=2_000)  # row-at-a-time is too slow for 50k
+
+    print(f"{len(events):,} events, {FINGERPRINTS} fingerprints, batch {BATCH_SIZE}\n")
+
+    try:
+        single_rate = bench("ORM, one event per commit", per_event, 1, "orm")
+        orm_rate = bench("ORM, batched", events, BATCH_SIZE, "orm")
+        copy_rate = bench("COPY, batched", events, BATCH_SIZE, "copy")
+    finally:
+        cleanup()
+
+    print(f"\nCOPY vs batched ORM:     {copy_rate / orm_rate:.2f}x")
+    print(f"COPY vs per-event ORM:   {copy_rate / single_rate:.2f}x")
@@ -0,0 +1,121 @@
+# '''Throughput benchmark for SQL normalization.
+# Compares:
+# - the old regex normalizer (LITERAL_REGEX, `= 'x'` / `= 123` only)
+# - the new tokenizer, cold (memoization bypassed)
+# - normalize_sql as capture calls it: raw-text cache, then literal-shape
+#   cache, from empty caches (1st pass) and warm (steady)
+
+# over two statement mixes:
+# - ORM-heavy: mostly ORM statements with bound parameters (stable text),
+#   10% literal-inlined statements
+# - literal-heavy: 90% literal-inlined statements with values drawn from a
+#   wide range, so nearly every statement text is new
+
+# Trade-off: on literal-heavy traffic normalize_sql stays several times
+# slower than the old regex (a few µs per statement: two C-level passes
+# build the literal shape, then a cache hit), against ~25-40 µs for the
+# tokenizer alone. The old regex only rewrote `= literal`; IN lists, LIMIT,
+# VALUES rows, casts and comments each made a new fingerprint.
+# '''
+
+import sys
+import os
+
+# Add the root directory to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+import random
+import re
+import time
+
+from app.instrumentation.profiler import _normalize_shape, literal_shape, normalize_sql
+
+
+LITERAL_REGEX = re.compile(r"=\s*('[^']*'|\d+)")
+
+
+def regex_normalize_sql(sql: str) -> str:
+    """The normalizer this tokenizer replaced."""
+    return LITERAL_REGEX.sub("= ?", sql)
+
+
+ORM_STATEMENTS = [
+    "SELECT users.id AS users_id, users.email AS users_email, users.created_at "
+    "AS users_created_at \nFROM users \nWHERE users.id = %(pk_1)s",
+    "SELECT orders.id, orders.user_id, orders.total, orders.status \nFROM orders "
+    "\nWHERE orders.user_id = %(user_id_1)s AND orders.status IN "
+    "(%(status_1_1)s, %(status_1_2)s) ORDER BY orders.created_at DESC \n LIMIT %(param_1)s",
+    "INSERT INTO audit_log (user_id, action, payload, created_at) VALUES "
+    "(%(user_id)s, %(action)s, %(payload)s, now()) RETURNING audit_log.id",
+    "UPDATE carts SET updated_at=%(updated_at)s, item_count=%(item_count)s "
+    "WHERE carts.id = %(carts_id)s",
+    "SELECT count(*) AS count_1 \nFROM (SELECT products.id AS products_id "
+    "\nFROM products \nWHERE products.price BETWEEN %(price_1)s AND %(price_2)s) AS anon_1",
+    "DELETE FROM sessions WHERE sessions.expires_at < %(expires_at_1)s",
+]
+
+LITERAL_TEMPLATES = [
+    "SELECT * FROM users WHERE id = {n}",
+    "SELECT * FROM orders WHERE user_id = {n} AND status = 'paid' LIMIT {m}",
+    "SELECT * FROM products WHERE id IN ({n}, {m}, {k}) -- catalog page",
+    "SELECT name FROM tags WHERE slug = 'tag-{n}'",
+]
+
+
+def build_mix(size: int, literal_share: float, max_value: int = 500, seed: int = 7):
+    rng = random.Random(seed)
+    mix = []
+    for _ in range(size):
+        if rng.random() < literal_share:
+            template = rng.choice(LITERAL_TEMPLATES)
+            mix.append(
+                template.format(
+                    n=rng.randint(1, max_value),
+                    m=rng.randint(1, 50),
+                    k=rng.randint(1, 9),
+                )
+            )
+        else:
+            mix.append(rng.choice(ORM_STATEMENTS))
+    return mix
+
+
+def bench(label: str, fn, mix, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for stmt in mix:
+            fn(stmt)
+        best = min(best, time.perf_counter() - start)
+
+    rate = len(mix) / best
+    print(f"{label:<30} {rate:>12,.0f} stmt/s   {best / len(mix) * 1e6:>7.2f} µs/stmt")
+    return rate
+
+
+def run(label: str, mix) -> None:
+    print(f"{label}: {len(mix):,} statements, {len(set(mix)):,} distinct\n")
+
+    regex_rate = bench("regex (old)", regex_normalize_sql, mix)
+    bench("tokenizer, cold", _normalize_shape.__wrapped__, mix)
+
+    normalize_sql.cache_clear()
+    literal_shape.cache_clear()
+    _normalize_shape.cache_clear()
+    first_rate = bench("normalize_sql, 1st pass", normalize_sql, mix, repeat=1)
+    steady_rate = bench("normalize_sql, steady", normalize_sql, mix)
+    print(f"\nshape cache: {_normalize_shape.cache_info()}")
+
+    for name, rate in (("1st pass", first_rate), ("steady", steady_rate)):
+        verdict = "OK" if rate >= regex_rate else "SLOWER"
+        print(f"normalize_sql {name} vs regex: {rate / regex_rate:.2f}x  [{verdict}]")
+    print()
+
+
+if __name__ == "__main__":
+    run("ORM-heavy mix", build_mix(size=50_000, literal_share=0.1))
+    run(
+        "Literal-heavy mix",
+        build_mix(size=50_000, literal_share=0.9, max_value=10_000_000),
+    )
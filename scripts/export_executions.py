@@ -0,0 +1,22 @@
+import sys
+import os
+
+# Add the root directory to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+from datetime import datetime, timedelta, timezone
+
+from app.services.export_services import export_executions
+
+
+if __name__ == "__main__":
+    # usage: python scripts/export_executions.py <output dir> [days back]
+    root = sys.argv[1] if len(sys.argv) > 1 else "exports/executions"
+    days_back = int(sys.argv[2]) if len(sys.argv) > 2 else 7
+
+    today = datetime.now(timezone.utc).date()
+    since = today - timedelta(days=days_back)
+
+    written = export_executions(root, since=since, until=today)
+    print(f"Exported {len(written)} day(s) since {since.isoformat()} to {root}")
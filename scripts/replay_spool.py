@@ -0,0 +1,15 @@
+import sys
+import os
+
+# Add the root directory to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+from app.instrumentation.spool import event_spool
+from app.instrumentation.writer import persist_events
+
+
+if __name__ == "__main__":
+    # Load events spooled while the store was unavailable (resumable)
+    replayed = event_spool.replay(persist_events)
+    print(f"Replayed {replayed} spooled events from {event_spool.path}")
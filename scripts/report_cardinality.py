@@ -0,0 +1,26 @@
+import sys
+import os
+
+# Add the root directory to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+from app.db.session import get_session
+from app.services.query_services import find_overflow_queries
+
+
+if __name__ == "__main__":
+    # Shapes whose sources created new fingerprints faster than the budget
+    # (see app/instrumentation/cardinality.py): fix the client's SQL
+    session = get_session()
+    try:
+        overflows = find_overflow_queries(session)
+    finally:
+        session.close()
+
+    if not overflows:
+        print("No fingerprint overflow recorded")
+
+    for query in overflows:
+        print(f"{query.normalized_sql}  ({query.total_executions} executions)")
+        print(f"    e.g. {query.raw_example_sql[:200]}")
@@ -9,4 +9,9 @@ from app.services.analysis_services import analyze_slow_queries
 
 
 if __name__ == "__main__":
-    analyze_slow_queries(limit=3)
+    summary = analyze_slow_queries(limit=3)
+
+    print(f"Analyzed {len(summary.outcomes)} queries in {summary.elapsed_s:.1f} s")
+    for outcome in summary.outcomes:
+        detail = f" — {outcome.error}" if outcome.error else ""
+        print(f"  query_id={outcome.query_id}: {outcome.status}{detail}")
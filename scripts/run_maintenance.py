@@ -0,0 +1,29 @@
+import sys
+import os
+
+# Add the root directory to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+from app.services.compaction_services import run_compaction
+from app.services.param_sample_services import trim_param_samples
+from app.services.partition_services import run_partition_maintenance
+from app.services.rollup_services import run_rollups
+
+
+if __name__ == "__main__":
+    # Run every few minutes (cron / scheduler): fold new executions into
+    # rollups, compact old raw rows, premake partitions, expire old ones,
+    # trim captured parameter samples
+    rolled_up = run_rollups()
+    print(f"Rollup rows written: {rolled_up}")
+
+    compacted = run_compaction()
+    print(f"Raw executions compacted: {compacted}")
+
+    created, expired = run_partition_maintenance()
+    print(f"Created partitions: {created or 'none'}")
+    print(f"Expired partitions: {expired or 'none'}")
+
+    trimmed = trim_param_samples()
+    print(f"Parameter samples trimmed: {trimmed}")
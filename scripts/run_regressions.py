@@ -0,0 +1,19 @@
+import sys
+import os
+
+# Add the root directory to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+from app.services.regression_services import detect_and_explain_regressions
+
+
+if __name__ == "__main__":
+    # Run hourly, after the rollup job: flags fingerprints whose latency
+    # stepped up over the last week and EXPLAINs them right away
+    for regression in detect_and_explain_regressions():
+        print(
+            f"query_id={regression.query_id}: "
+            f"{regression.before_ms:.1f} ms → {regression.after_ms:.1f} ms "
+            f"at {regression.changed_at:%Y-%m-%d %H:%M} (score {regression.score:.1f})"
+        )
@@ -0,0 +1,16 @@
+import sys
+import os
+
+# Add the root directory to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+from app.services.shipper_services import ship_local_store
+
+
+if __name__ == "__main__":
+    # Run every minute or so on hosts with PROFILER_BACKEND=sqlite: moves the
+    # local capture store to the central one and truncates what was sent
+    shipped = ship_local_store()
+    print(f"Executions shipped: {shipped.get('executions', 0)}")
+    print(f"Executions counted: {shipped.get('counted', 0)}")
@@ -0,0 +1,249 @@
+# '''Concurrency stress test for fingerprint registration and counters (needs the Postgres store).
+# Many threads call persist_events() at once, the way several writer
+# processes would:
+# 1. "new fingerprints": every round, all threads register the same
+#    brand-new fingerprints at the same instant (barrier) — each must
+#    end up as exactly one `queries` row, with no unique violations
+# 2. "hot fingerprints": all threads hammer the same few fingerprints —
+#    no thread may wait on a row lock of `queries`
+# Afterwards every fingerprint's total_executions must equal the number
+# of executions written for it, and the executions table must hold every
+# event: nothing lost.
+
+# Lock waits are sampled from pg_stat_activity while the threads run.
+# Stress fingerprints are tagged `stress_upserts` and deleted afterwards.
+# '''
+
+import sys
+import os
+
+# Add the root directory to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+import random
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+from sqlalchemy import create_engine, text
+
+from app.db import session as db_session
+from app.db.session import DATABASE_URL, get_session
+from app.instrumentation.counters import counter_deltas
+from app.instrumentation.fingerprint_cache import fingerprint_cache
+from app.instrumentation.writer import ExecutionEvent, flush_counter_deltas, persist_events
+
+
+THREADS = 8
+NEW_FINGERPRINT_ROUNDS = 20
+NEW_FINGERPRINTS_PER_ROUND = 10
+HOT_FINGERPRINTS = 3
+HOT_BATCHES_PER_THREAD = 50
+BATCH_EVENTS = 200
+LOCK_SAMPLE_INTERVAL_S = 0.002
+
+APPLICATION_NAME = "query-profiler-stress"
+
+
+def use_stress_pool():
+    # The real profiler pool is capped at PROFILER_POOL_SIZE connections;
+    # give each thread its own so they really run concurrently
+    stress_engine = create_engine(
+        DATABASE_URL,
+        pool_size=THREADS,
+        max_overflow=0,
+        connect_args={"application_name": APPLICATION_NAME},
+    )
+    db_session.ProfilerSessionLocal.configure(bind=stress_engine)
+
+
+def event(sql: str, rng: random.Random) -> ExecutionEvent:
+    return ExecutionEvent(
+        normalized_sql=sql,
+        raw_sql=sql.replace("?", str(rng.randint(1, 10_000))),
+        executed_at=datetime.now(timezone.utc),
+        duration_ms=rng.lognormvariate(1.0, 1.0),
+        rows_returned=1,
+    )
+
+
+class LockMonitor(threading.Thread):
+    """Samples pg_stat_activity for stress connections waiting on a lock."""
+
+    SQL = text(
+        """
+        SELECT wait_event, left(query, 60)
+        FROM pg_stat_activity
+        WHERE application_name = :app AND wait_event_type = 'Lock'
+        """
+    )
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.stop_event = threading.Event()
+        self.waits = Counter()
+        self.samples = 0
+
+    def run(self):
+        session = get_session()
+        try:
+            while not self.stop_event.is_set():
+                for wait_event, query in session.execute(
+                    self.SQL, {"app": APPLICATION_NAME}
+                ):
+                    self.waits[(wait_event, query)] += 1
+                session.rollback()  # fresh snapshot for the next sample
+                self.samples += 1
+                time.sleep(LOCK_SAMPLE_INTERVAL_S)
+        finally:
+            session.close()
+
+    def stop(self) -> Counter:
+        self.stop_event.set()
+        self.join()
+        return self.waits
+
+
+def run_threads(target, written: Counter, errors: list) -> Counter:
+    monitor = LockMonitor()
+    monitor.start()
+
+    def worker(index):
+        try:
+            target(index, written)
+        except Exception as exc:
+            errors.append(repr(exc))
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return monitor.stop()
+
+
+def new_fingerprints_phase(written: Counter, errors: list) -> Counter:
+    barrier = threading.Barrier(THREADS)
+    lock = threading.Lock()
+
+    def target(index, written):
+        rng = random.Random(index)
+        for round_ in range(NEW_FINGERPRINT_ROUNDS):
+            events = [
+                event(f"SELECT * FROM stress_upserts_new_{round_}_{i} WHERE id = ?", rng)
+                for i in range(NEW_FINGERPRINTS_PER_ROUND)
+            ]
+            barrier.wait()  # everyone meets the new fingerprints at once
+            persist_events(events)
+            with lock:
+                written.update(e.normalized_sql for e in events)
+
+    return run_threads(target, written, errors)
+
+
+def hot_fingerprints_phase(written: Counter, errors: list) -> Counter:
+    lock = threading.Lock()
+    hot = [
+        f"SELECT * FROM stress_upserts_hot_{i} WHERE id = ?"
+        for i in range(HOT_FINGERPRINTS)
+    ]
+
+    def target(index, written):
+        rng = random.Random(1000 + index)
+        for _ in range(HOT_BATCHES_PER_THREAD):
+            events = [event(rng.choice(hot), rng) for _ in range(BATCH_EVENTS)]
+            persist_events(events)
+            with lock:
+                written.update(e.normalized_sql for e in events)
+
+    return run_threads(target, written, errors)
+
+
+def verify(written: Counter) -> list:
+    problems = []
+    session = get_session()
+    try:
+        rows = session.execute(
+            text(
+                """
+                SELECT q.normalized_sql, q.total_executions,
+                       (SELECT count(*) FROM query_executions e WHERE e.query_id = q.id)
+                FROM queries q
+                WHERE q.normalized_sql LIKE '%stress_upserts_%'
+                """
+            )
+        ).all()
+    finally:
+        session.close()
+
+    per_sql = Counter(sql for sql, _, _ in rows)
+    for sql, copies in per_sql.items():
+        if copies > 1:
+            problems.append(f"{copies} rows for one fingerprint: {sql}")
+
+    for sql, total, stored in rows:
+        expected = written[sql]
+        if total != expected or stored != expected:
+            problems.append(
+                f"{sql}: wrote {expected}, total_executions={total}, rows={stored}"
+            )
+
+    missing = set(written) - set(per_sql)
+    problems.extend(f"fingerprint never registered: {sql}" for sql in missing)
+    return problems
+
+
+def cleanup():
+    session = get_session()
+    try:
+        session.execute(
+            text("DELETE FROM queries WHERE normalized_sql LIKE '%stress_upserts_%'")
+        )
+        session.commit()
+    finally:
+        session.close()
+    fingerprint_cache.clear()
+
+
+if __name__ == "__main__":
+    use_stress_pool()
+    cleanup()
+
+    written: Counter = Counter()
+    errors: list = []
+    try:
+        start = time.perf_counter()
+        new_waits = new_fingerprints_phase(written, errors)
+        hot_waits = hot_fingerprints_phase(written, errors)
+        parked = counter_deltas.pending()
+        flush_counter_deltas()  # what interpreter exit does
+        elapsed = time.perf_counter() - start
+
+        problems = errors + verify(written)
+    finally:
+        cleanup()
+
+    events = sum(written.values())
+    print(f"{THREADS} threads, {events:,} executions, {len(written)} fingerprints")
+    print(f"{events / elapsed:,.0f} executions/s; {parked:,} counts parked at the end")
+    print(f"Lock waits while registering new fingerprints: {sum(new_waits.values())}")
+    print(f"Lock waits on hot fingerprints:                {sum(hot_waits.values())}")
+    for (wait_event, query), samples in (new_waits + hot_waits).most_common(5):
+        print(f"  {samples:>5} × {wait_event}: {query}")
+
+    # Registration may briefly wait on another writer's uncommitted insert
+    # of the same new key (that is how ON CONFLICT serializes); hot rows
+    # must never be waited for
+    if hot_waits:
+        problems.append("writers waited on locks of hot fingerprints")
+
+    if problems:
+        print("\nFAILED")
+        for problem in problems[:20]:
+            print(f"  {problem}")
+        sys.exit(1)
+
+    print("\nOK: no lost executions, no duplicate fingerprints, no hot-row lock waits")